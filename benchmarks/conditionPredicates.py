@@ -0,0 +1,109 @@
+"""
+Throughput benchmark of the compiled condition predicates.
+
+Filters synthetic cached rows with a condition list mixing comparisons, `in`,
+`like` and null checks, and reports rows per second for:
+
+- row-by-row interpretation: every condition dispatched on its operator, for every row,
+- the fused predicate,
+- the mask over columnar batches, when NumPy is installed: object columns, and
+  typed masked arrays as returned by `RowDecoder.decode_columns`.
+
+    python -m benchmarks.conditionPredicates [--rows 200000] [--repeat 3]
+"""
+import argparse
+import operator
+import random
+import re
+
+from pydantic_models.conditionPredicates import compile_conditions, masked_values
+from pydantic_models.queryBuilderObjModel import Condition
+
+from .validateModel import best_of
+
+CONDITIONS = [
+    {"column": "fill_number", "operator": "gte", "value": 1000},
+    {"column": "stable_beams", "operator": "eq", "value": 1},
+    {"column": "end_time", "operator": "isnot", "value": "null"},
+    {"column": "beam_mode", "operator": "in", "value": ["STABLE", "ADJUST", "SQUEEZE", "RAMP"]},
+    {"column": "name", "operator": "like", "value": "fill_%"},
+    {"column": "comment", "operator": "like", "value": "%beam_dump%"},
+]
+
+MODES = ["STABLE", "ADJUST", "SQUEEZE", "RAMP", "INJECTION", "SETUP", "NO BEAM"]
+
+_OPERATORS = {
+    "eq": operator.eq, "ne": operator.ne, "lt": operator.lt,
+    "lte": operator.le, "gt": operator.gt, "gte": operator.ge,
+}
+
+
+def cached_rows(n: int):
+    rng = random.Random(0)
+    return [{
+        "runs.fill_number": i,
+        "runs.stable_beams": rng.choice((0, 1)),
+        "runs.end_time": None if i % 10 == 0 else i + 3600,
+        "runs.beam_mode": rng.choice(MODES),
+        "runs.name": rng.choice(("fill_", "run_")) + str(i),
+        "runs.comment": None if i % 3 else rng.choice(("ok", "after beam_dump", "beam_dump at ramp")),
+    } for i in range(n)]
+
+
+def interpret(conditions, row) -> bool:
+    """The filtering a service does by hand: every condition is dispatched on its operator."""
+    for condition in conditions:
+        value = row[f"runs.{condition['column']}"]
+        op = condition["operator"]
+        if op == "is":
+            matched = value is None
+        elif op == "isnot":
+            matched = value is not None
+        elif value is None:
+            matched = False
+        elif op == "in":
+            matched = value in condition["value"]
+        elif op == "like":
+            pattern = "".join(".*" if c == "%" else "." if c == "_" else re.escape(c) for c in condition["value"])
+            matched = re.fullmatch(pattern, str(value), re.DOTALL) is not None
+        else:
+            matched = _OPERATORS[op](value, condition["value"])
+        if not matched:
+            return False
+    return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    predicate = compile_conditions([Condition(**condition) for condition in CONDITIONS], "runs")
+    rows = cached_rows(args.rows)
+    expected = [row for row in rows if interpret(CONDITIONS, row)]
+    assert predicate.filter(rows) == expected
+
+    runs = [
+        ("row-by-row", lambda: [row for row in rows if interpret(CONDITIONS, row)]),
+        ("fused predicate", lambda: predicate.filter(rows)),
+    ]
+    try:
+        import numpy
+        columns = {key: numpy.array([row[key] for row in rows], dtype=object) for key in rows[0]}
+        typed = {key: masked_values(numpy, values) for key, values in columns.items()}
+        assert predicate.mask(columns).sum() == predicate.mask(typed).sum() == len(expected)
+        runs.append(("mask, object columns", lambda: predicate.mask(columns)))
+        runs.append(("mask, typed columns", lambda: predicate.mask(typed)))
+    except ImportError:
+        print("numpy is not installed: skipping the mask mode")
+
+    print(f"{args.rows} rows, {len(CONDITIONS)} conditions, {len(expected)} matching")
+    print(f"{'predicate':>22}  {'time':>10}  {'rows/s':>12}")
+    for label, run in runs:
+        elapsed = best_of(args.repeat, run)
+        print(f"{label:>22}  {elapsed * 1e3:>7.0f} ms  {args.rows / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
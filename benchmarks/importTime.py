@@ -0,0 +1,79 @@
+"""
+Import-time benchmark of `pydantic_models`.
+
+Each import is timed in a fresh interpreter, after `pydantic` itself is
+imported, so that only the cost of the package is measured. The median of
+`--repeat` runs is compared to a budget, and the script exits with status 1
+when an import exceeds its budget, e.g. in CI:
+
+    python -m benchmarks.importTime [--repeat 7] [--scale 1.0]
+
+The deferred schema construction is reported too: the first validation of a
+spec builds the schemas of the models it uses.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# label → (statement, budget in ms); about 1.3× the times measured on a developer
+# machine, so that a regression is caught: pass `--scale` on slower machines
+IMPORTS = {
+    "package": ("import pydantic_models", 5),
+    "Resource": ("from pydantic_models import Resource", 65),
+    "all models": ("from pydantic_models import ResourceToDbMappingSpec", 100),
+}
+
+# setup, then the timed statement
+FIRST_VALIDATION = (
+    "from pydantic_models import ResourceToDbMappingSpec\n"
+    "from benchmarks.specFactory import wide_spec\n"
+    "data = wide_spec(20)",
+    "ResourceToDbMappingSpec(**data)",
+)
+
+TIMER = """
+import time
+import pydantic, pydantic.main
+{setup}
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+
+def time_once(statement: str, setup: str = "") -> float:
+    code = TIMER.format(setup=setup, statement=statement)
+    return float(subprocess.check_output([sys.executable, "-c", code], cwd=ROOT))
+
+
+def median_ms(repeat: int, statement: str, setup: str = "") -> float:
+    return statistics.median(time_once(statement, setup) for _ in range(repeat)) * 1e3
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier of the budgets, for slower machines")
+    args = parser.parse_args()
+
+    over = 0
+    print(f"{'import':>12}  {'median':>10}  {'budget':>10}")
+    for label, (statement, budget) in IMPORTS.items():
+        elapsed = median_ms(args.repeat, statement)
+        budget *= args.scale
+        status = "" if elapsed <= budget else "  OVER BUDGET"
+        over += bool(status)
+        print(f"{label:>12}  {elapsed:>7.1f} ms  {budget:>7.0f} ms{status}")
+
+    setup, statement = FIRST_VALIDATION
+    elapsed = median_ms(args.repeat, statement, setup)
+    print(f"first validation of a spec (deferred schema build): {elapsed:.1f} ms")
+    return 1 if over else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
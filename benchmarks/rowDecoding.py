@@ -0,0 +1,102 @@
+"""
+Throughput benchmark of `RowDecoder`.
+
+Decodes synthetic raw rows of a resource mixing every `FieldType`, as a
+driver would return them, and reports rows per second for:
+
+- per-cell dispatch: the converter of each cell looked up from its attribute type,
+- the compiled decoder, to tuples and to records,
+- the columnar decoder, when NumPy is installed.
+
+    python -m benchmarks.rowDecoding [--rows 100000] [--repeat 3]
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from pydantic_models.resourceObjModel import Resource
+from pydantic_models.rowDecoder import converter_for
+
+from .validateModel import best_of
+
+COLUMNS = [
+    ("id", "integer"),
+    ("start_time", "datetime"),
+    ("end_time", "datetime"),
+    ("name", "string"),
+    ("comment", "longstring"),
+    ("stable", "boolean"),
+    ("duration", "timeinterval_int"),
+    ("lumi", "double"),
+    ("ratio", "decimal"),
+    ("energy", "float"),
+]
+
+
+def raw_rows(n: int):
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(n):
+        begin = start + timedelta(minutes=i)
+        rows.append((
+            i,
+            begin.isoformat(),
+            None if i % 10 == 0 else begin + timedelta(hours=1),
+            f"run_{i}",
+            None,
+            rng.choice("YN"),
+            timedelta(seconds=rng.randrange(10000)),
+            rng.random() * 1e3,
+            round(rng.random(), 4),
+            float(rng.randrange(7000)),
+        ))
+    return rows
+
+
+def per_cell(rows):
+    """The decoding a service does by hand: the converter of every cell is looked up from its type."""
+    out = []
+    for row in rows:
+        record = {}
+        for (name, type_name), value in zip(COLUMNS, row):
+            converter = converter_for(type_name)
+            record[name] = value if value is None or converter is None else converter(value)
+        out.append(record)
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    resource = Resource(
+        resource_name="bench", version="1.0.0",
+        fields=[{"name": name, "type": type_name, "isKey": name == "id"} for name, type_name in COLUMNS],
+    )
+    decoder = resource.row_decoder()
+    rows = raw_rows(args.rows)
+    assert per_cell(rows[:100]) == decoder.records(rows[:100])
+
+    runs = [
+        ("per-cell dispatch", lambda: per_cell(rows)),
+        ("compiled, tuples", lambda: decoder.decode(rows)),
+        ("compiled, records", lambda: decoder.records(rows)),
+    ]
+    try:
+        import numpy  # noqa: F401
+        runs.append(("columnar (NumPy)", lambda: decoder.decode_columns(rows)))
+    except ImportError:
+        print("numpy is not installed: skipping the columnar decoder")
+
+    print(f"{args.rows} rows of {len(COLUMNS)} attributes")
+    print(f"{'decoder':>20}  {'time':>10}  {'rows/s':>12}")
+    for label, run in runs:
+        elapsed = best_of(args.repeat, run)
+        print(f"{label:>20}  {elapsed * 1e3:>7.0f} ms  {args.rows / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Memory footprint of validated specs: pydantic tree versus compiled runtime tree.
+
+    python -m benchmarks.runtimeMemory [--attributes 100 1000 10000]
+"""
+import argparse
+
+from pydantic_models.queryBuilderObjModel import ResourceToDbMappingSpec
+from pydantic_models.runtimeModel import memory_report
+
+from .specFactory import wide_spec
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--attributes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    for n in args.attributes:
+        spec = ResourceToDbMappingSpec(**wide_spec(n))
+        print(f"{n} attributes")
+        print(memory_report(spec, spec.compile()))
+
+
+if __name__ == "__main__":
+    main()
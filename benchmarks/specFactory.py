@@ -0,0 +1,82 @@
+"""
+Synthetic specifications for the benchmarks.
+
+`wide_spec(n)` builds the input of a `ResourceToDbMappingSpec` with `n`
+resource attributes, spread over the master table and a few additional
+tables, and mapped through a mix of plain columns, functions, expressions
+and CASE expressions, so that every kind of model node is validated.
+"""
+from typing import Any, Dict, List
+
+
+def attribute_mapping(i: int, table: str) -> Dict[str, Any]:
+    name = f"att_{i}"
+    kind = i % 4
+    if kind == 0:
+        return {"attNamedb": f"col_{i}", "attNameResource": name}
+    if kind == 1:
+        return {
+            "attNameResource": name,
+            "function": {"name": "nvl", "params": [{"table": table, "column": f"col_{i}"}, 0]},
+        }
+    if kind == 2:
+        return {
+            "attNameResource": name,
+            "expression": {
+                "operator": "subtract",
+                "left": {"table": table, "column": f"col_{i}"},
+                "right": {"operator": "multiply", "left": {"table": table, "column": f"col_{i + 1}"}, "right": 2},
+            },
+        }
+    return {
+        "attNameResource": name,
+        "case_expression": [
+            {"when": {"column": f"col_{i}", "operator": "eq", "value": 1}, "then": "yes"},
+            {"when": {"column": f"col_{i}", "operator": "eq", "value": 0}, "then": "no"},
+        ],
+    }
+
+
+def wide_spec(n: int, tables: int = 4) -> Dict[str, Any]:
+    """Input of a `ResourceToDbMappingSpec` with `n` attributes, `tables` of them being additional tables."""
+    fields: List[Dict[str, Any]] = []
+    for i in range(n):
+        field: Dict[str, Any] = {"name": f"att_{i}", "type": "integer"}
+        if i == 0:
+            field["isKey"] = True
+        if i % 3 == 0:
+            field["meta"] = {"description": f"Attribute {i}", "searchable": True, "sortable": True}
+        fields.append(field)
+
+    master = "master"
+    owners = [master] + [f"table_{t}" for t in range(tables)]
+    mapped: Dict[str, List[Dict[str, Any]]] = {owner: [] for owner in owners}
+    for i in range(n):
+        owner = owners[i % len(owners)] if i else master
+        mapped[owner].append(attribute_mapping(i, owner))
+
+    additional = [
+        {
+            "namedb": owner,
+            "dbSchema": "bench",
+            "relation": "leftJoin",
+            "relationTable": master if t == 0 else owners[t],
+            "relationKeys": [{"tableKey": "id"}],
+            "fields": mapped[owner],
+        }
+        for t, owner in enumerate(owners[1:])
+    ]
+    return {
+        "masterTable": master,
+        "resource": {"resource_name": "bench", "version": "1.0.0", "fields": fields},
+        "resourceToDbMapper": {
+            "resource_name": "bench",
+            "masterTable": master,
+            "dbSchema": "bench",
+            "fields": mapped[master],
+            "additionalTables": additional,
+            "defaultSort": {"fields": ["att_0"], "order": "asc"},
+            "pagination": "enabled",
+            "rowCounting": "disabled",
+        },
+    }
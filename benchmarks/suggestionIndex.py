@@ -0,0 +1,58 @@
+"""
+Benchmark of `SuggestionIndex` against `difflib.get_close_matches`.
+
+Looks up misspellings of attribute names in vocabularies of growing size and
+checks that both return the same suggestion.
+
+    python -m benchmarks.suggestionIndex [--lookups 200]
+"""
+import argparse
+import random
+import time
+from difflib import get_close_matches
+
+from pydantic_models.suggestionIndex import SuggestionIndex
+
+WORDS = ("run", "fill", "time", "start", "stop", "lumi", "beam", "energy", "number", "status", "delivered")
+
+
+def vocabulary(size: int, rng: random.Random):
+    names = set()
+    while len(names) < size:
+        names.add("_".join(rng.sample(WORDS, rng.randint(2, 3))) + f"_{rng.randint(0, size)}")
+    return sorted(names)
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    i = rng.randrange(len(word))
+    return word[:i] + word[i + 1:]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    for size in (100, 1000, 10000):
+        words = vocabulary(size, rng)
+        queries = [misspell(rng.choice(words), rng) for _ in range(args.lookups)]
+
+        start = time.perf_counter()
+        expected = [next(iter(get_close_matches(q, words, n=1, cutoff=0.8)), None) for q in queries]
+        linear = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = SuggestionIndex(words)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [index.suggest(q) for q in queries]
+        indexed = time.perf_counter() - start
+
+        assert found == expected, "SuggestionIndex disagrees with get_close_matches"
+        print(f"{size:6d} words  get_close_matches {linear * 1e3 / args.lookups:8.3f} ms/lookup   "
+              f"index {indexed * 1e3 / args.lookups:8.3f} ms/lookup (built in {built * 1e3:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
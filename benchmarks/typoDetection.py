@@ -0,0 +1,133 @@
+"""
+Benchmark of the `TypoDetectingModel` pre-validator.
+
+Runs the pre-validator of every node of a wide synthetic spec, once with the
+previous implementation (field index rebuilt and input copied on every call)
+and once with the current one (per-class index and zero-copy fast path), then
+validates the whole spec end to end.
+
+    python -m benchmarks.typoDetection [--attributes 2000] [--repeat 5]
+"""
+import argparse
+import contextlib
+import io
+import time
+from difflib import get_close_matches
+from typing import Any, Dict, Iterator, List, Tuple
+
+from pydantic_models.queryBuilderObjModel import (
+    AdditionalTable,
+    CaseExpression,
+    Condition,
+    DBColumnReference,
+    Expression,
+    Function,
+    RelationKey,
+    ResourceToDbMapper,
+    ResourceToDbMappingSpec,
+    SortedQuery,
+    TableAttribute
+)
+from pydantic_models.resourceObjModel import Attribute, MetaData, Resource
+
+from .specFactory import wide_spec
+
+
+def legacy_catch_likely_typos(cls, values: Dict[str, Any]) -> Dict[str, Any]:
+    """The pre-validator as it was before the per-class index, kept as the baseline."""
+    if not isinstance(values, dict):
+        return values
+    known_fields = set(cls.model_fields.keys())
+    known_fields_lower = {field.lower(): field for field in known_fields}
+    corrected_values = {}
+    errors = []
+    for input_field, value in values.items():
+        input_field_lower = input_field.lower()
+        if input_field_lower in known_fields_lower:
+            corrected_values[known_fields_lower[input_field_lower]] = value
+        else:
+            close_matches = get_close_matches(input_field.lower(), known_fields_lower.keys(), n=1, cutoff=0.8)
+            if close_matches:
+                errors.append(f"Unexpected field '{input_field}'. Did you mean '{known_fields_lower[close_matches[0]]}' ?")
+            elif input_field not in ('java_type', 'db_type'):
+                errors.append(f"Unexpected field '{input_field}'. No similar field found in the specification.")
+    if errors:
+        raise ValueError("\n".join(errors))
+    return corrected_values
+
+
+def operand_nodes(value) -> Iterator[Tuple[type, Dict[str, Any]]]:
+    if isinstance(value, dict):
+        if "operator" in value:
+            yield Expression, value
+            yield from operand_nodes(value["left"])
+            yield from operand_nodes(value["right"])
+        else:
+            yield DBColumnReference, value
+
+
+def spec_nodes(data: Dict[str, Any]) -> List[Tuple[type, Dict[str, Any]]]:
+    """Every (model class, input dict) pair the validation of `data` pre-validates."""
+    nodes: List[Tuple[type, Dict[str, Any]]] = [(ResourceToDbMappingSpec, data), (Resource, data["resource"])]
+    for field in data["resource"]["fields"]:
+        nodes.append((Attribute, field))
+        if "meta" in field:
+            nodes.append((MetaData, field["meta"]))
+    mapper = data["resourceToDbMapper"]
+    nodes += [(ResourceToDbMapper, mapper), (SortedQuery, mapper["defaultSort"])]
+    mappings = list(mapper["fields"])
+    for table in mapper["additionalTables"]:
+        nodes.append((AdditionalTable, table))
+        nodes += [(RelationKey, key) for key in table["relationKeys"]]
+        mappings += table["fields"]
+    for field in mappings:
+        nodes.append((TableAttribute, field))
+        if "function" in field:
+            nodes.append((Function, field["function"]))
+            for param in field["function"]["params"]:
+                nodes += operand_nodes(param)
+        if "expression" in field:
+            nodes += operand_nodes(field["expression"])
+        for branch in field.get("case_expression", []):
+            nodes += [(CaseExpression, branch), (Condition, branch["when"])]
+    return nodes
+
+
+def best_of(repeat: int, run) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--attributes", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = wide_spec(args.attributes)
+    nodes = spec_nodes(data)
+    mixed_case = [(cls, {key.lower(): value for key, value in values.items()}) for cls, values in nodes]
+
+    def run(validator, corpus):
+        return lambda: [validator(cls, values) for cls, values in corpus]
+
+    def current(cls, values):
+        return cls.catch_likely_typos_and_case_variations(values)
+
+    print(f"{args.attributes} attributes, {len(nodes)} nodes")
+    for label, corpus in (("canonical keys", nodes), ("lowercase keys", mixed_case)):
+        legacy = best_of(args.repeat, run(legacy_catch_likely_typos, corpus))
+        new = best_of(args.repeat, run(current, corpus))
+        print(f"  {label:15s} legacy {legacy * 1e3:8.2f} ms   current {new * 1e3:8.2f} ms   x{legacy / new:.1f}")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        total = best_of(args.repeat, lambda: ResourceToDbMappingSpec(**data))
+    print(f"  full validation {total * 1e3:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
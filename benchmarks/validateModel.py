@@ -0,0 +1,46 @@
+"""
+Scaling benchmark of `ResourceToDbMappingSpec.validate_model`.
+
+Validates synthetic specs of growing width and reports the time of the
+cross-object validator alone and of the whole validation, per attribute.
+Constant per-attribute times mean linear scaling.
+
+    python -m benchmarks.validateModel [--max-attributes 10000] [--repeat 3]
+"""
+import argparse
+import time
+
+from pydantic_models.queryBuilderObjModel import ResourceToDbMappingSpec
+
+from .specFactory import wide_spec
+
+
+def best_of(repeat: int, run) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--max-attributes", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sizes = [n for n in (100, 500, 1000, 5000, 10000, 50000) if n <= args.max_attributes]
+
+    print(f"{'attributes':>10}  {'validate_model':>16}  {'per attribute':>14}  {'full':>10}  {'per attribute':>14}")
+    for n in sizes:
+        data = wide_spec(n)
+        spec = ResourceToDbMappingSpec(**data)
+        cross = best_of(args.repeat, lambda: ResourceToDbMappingSpec.validate_model(spec))
+        full = best_of(args.repeat, lambda: ResourceToDbMappingSpec(**data))
+        print(f"{n:>10}  {cross * 1e3:>13.2f} ms  {cross / n * 1e6:>11.2f} us  "
+              f"{full * 1e3:>7.0f} ms  {full / n * 1e6:>11.2f} us")
+
+
+if __name__ == "__main__":
+    main()
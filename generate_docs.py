@@ -1,30 +1,41 @@
+import argparse
+import ast
+import hashlib
+import json
+import logging
 import os, sys
 import importlib
 import inspect
 import re
-from typing import Type, List, Any, get_origin, get_args, Union, Literal
-from pydantic import BaseModel
+import time
+from concurrent.futures import ThreadPoolExecutor
+import typing
+from typing import TYPE_CHECKING, Type, List, Any, Dict, Optional, get_origin, get_args, Union, Literal
 from jinja2 import Template
 from pathlib import Path
 
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
 # ==== CONFIG ====
 SPEC_SITE_ROOT = Path(__file__).parent
 PROJECT_ROOT = SPEC_SITE_ROOT.parent
-print(SPEC_SITE_ROOT)
 BASE_MODULE = "pydantic_models"             # models folder name
 BASE_PATH = SPEC_SITE_ROOT / "pydantic_models"    # models folder path
 OUTPUT_DIR = "docs"
+# hash of the inputs of every generated page, to skip the unchanged ones on the next run
+MANIFEST_PATH = SPEC_SITE_ROOT / ".docs_manifest.json"
+# classes parsed by the static mode, per model file mtime
+STATIC_CACHE_PATH = SPEC_SITE_ROOT / ".docs_static_cache.json"
 
-print(BASE_PATH)
+logger = logging.getLogger("generate_docs")
 
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
 # ==== TEMPLATES ====
 
-MODEL_TEMPLATE = Template("""
+MODEL_TEMPLATE_SOURCE = """
 ## {{ model_name }}
 
 {{ model_description or '' }}
@@ -47,7 +58,8 @@ MODEL_TEMPLATE = Template("""
 {% endfor %}
 {% endif %}
                         
-""")
+"""
+MODEL_TEMPLATE = Template(MODEL_TEMPLATE_SOURCE)
 
 # {% for field in fields -%}
 # {% set safe = field.type|default('', true) -%}
@@ -162,18 +174,18 @@ def clean_annotation(annotation: Any, required: bool) -> tuple[str, bool, bool]:
     return typename, typename[0].isupper(), required
 
 
-def extract_fields(model: Type[BaseModel]) -> List[dict]:
+def extract_fields(model: Type["BaseModel"]) -> List[dict]:
     fields = []
     for field_name, field_obj in model.model_fields.items():
         # print(f"model_fields{model.model_fields.items()}")
-        print(f"field_name {field_name}, field_obj.annotation{field_obj.annotation}")
+        logger.debug("field_name %s, annotation %s", field_name, field_obj.annotation)
         if "Optional" in str(field_obj.annotation):
             required = False
         else:
             required = True
 
         annotation, is_model, required_field = clean_annotation(field_obj.annotation, required)
-        print(annotation, is_model, required_field)
+        logger.debug("%s %s %s", annotation, is_model, required_field)
         desc = field_obj.description or ""
         extras = []
 
@@ -195,101 +207,338 @@ def extract_fields(model: Type[BaseModel]) -> List[dict]:
         })
     return fields
 
-def extract_validators(model: Type[BaseModel]) -> List[dict]:
+def extract_validators(model: Type["BaseModel"]) -> List[dict]:
+    """The `@model_validator`s defined by `model` itself, as registered by pydantic."""
+    if isinstance(model, StaticModel):
+        return model.validators
     validators = []
-
-    for name, attr in model.__dict__.items():
-        func = None
-        # Unwrap classmethod / staticmethod to their underlying function
-        if isinstance(attr, classmethod):
-            func = attr.__func__
-        elif inspect.isfunction(attr):
-            func = attr
-
-        if func is None:
+    for name, decorator in model.__pydantic_decorators__.model_validators.items():
+        if name not in model.__dict__:  # inherited: documented with the class defining it
             continue
-        
-        try:
-            src = inspect.getsource(func)
-        except OSError:
-            src = ""
-            
-        # Naive but effective flag for Pydantic v2 @model_validator
-        if "@model_validator" in src:
-            doc = inspect.getdoc(func) or "Custom model validation."
-            validators.append({"name": name, "description": doc})
-
-    print(f'validators{validators}')
+        doc = inspect.getdoc(decorator.func) or "Custom model validation."
+        validators.append({"name": name, "description": doc})
+    logger.debug("validators of %s: %s", model.__name__, [v["name"] for v in validators])
     return validators
 
-def render_model(model: Type[BaseModel]) -> dict:
+def page_key(model_name: str, model_description: str, fields: List[dict], validators: List[dict]) -> str:
+    """Hash of everything a model page is rendered from: its fields, validators, docstrings and the template."""
+    digest = hashlib.sha256(MODEL_TEMPLATE_SOURCE.encode())
+    digest.update(json.dumps([model_name, model_description, fields, validators], sort_keys=True).encode())
+    return digest.hexdigest()
+
+def write_if_changed(path: Path, content: str) -> bool:
+    """Write `content` to `path` unless it already holds it, so that `mkdocs serve` only rebuilds changed pages."""
+    try:
+        if path.read_text() == content:
+            return False
+    except FileNotFoundError:
+        pass
+    path.write_text(content)
+    return True
+
+def load_manifest() -> Dict[str, str]:
+    try:
+        return json.loads(MANIFEST_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def save_manifest(manifest: Dict[str, str]) -> None:
+    write_if_changed(MANIFEST_PATH, json.dumps(manifest, indent=1, sort_keys=True) + "\n")
+
+def render_model(model: Type["BaseModel"], output_dir: Path, manifest: Dict[str, str], force: bool = False) -> dict:
+    start = time.perf_counter()
     model_name = model.__name__
     fields = extract_fields(model)
     validators = extract_validators(model)
-
-    markdown = MODEL_TEMPLATE.render(
-        model_name=model_name,
-        model_description=model.__doc__,
-        fields=fields,
-        validators=validators
-    )
-
     filename = f"{model_name}.md"
-    with open(os.path.join(OUTPUT_DIR, filename), "w") as f:
-        f.write(markdown.strip())
-    # print(f"Generated {filename}")
-
-    return {"name": model_name, "filename": filename}
-
-def render_index(models_info: List[dict]):
+    path = output_dir / filename
+    key = page_key(model_name, model.__doc__, fields, validators)
+
+    if not force and manifest.get(str(path)) == key and path.exists():
+        status = "unchanged"
+    else:
+        markdown = MODEL_TEMPLATE.render(
+            model_name=model_name,
+            model_description=model.__doc__,
+            fields=fields,
+            validators=validators
+        )
+        status = "written" if write_if_changed(path, markdown.strip()) else "rendered, identical"
+
+    elapsed = time.perf_counter() - start
+    logger.info("%-28s %-20s %7.1f ms", filename, status, elapsed * 1e3)
+    return {"name": model_name, "filename": filename, "path": str(path), "key": key, "status": status, "seconds": elapsed}
+
+def render_index(models_info: List[dict], output_dir: Path):
     index_md = INDEX_TEMPLATE.render(models=models_info)
-    with open(os.path.join(OUTPUT_DIR, "index.md"), "w") as f:
-        f.write(index_md.strip())
-    print(f"Generated index.md")
+    if write_if_changed(output_dir / "index.md", index_md.strip()):
+        logger.info("Generated index.md")
 
 def discover_modules(base_module: str, base_path: str) -> List[str]:
     """Auto-discover all .py modules inside base_path."""
     modules = []
-    for filename in os.listdir(base_path):
+    for filename in sorted(os.listdir(base_path)):
         if filename.endswith(".py") and filename != "__init__.py":
             module_name = filename[:-3]
             modules.append(f"{base_module}.{module_name}")
     return modules
 
-def find_pydantic_models(module) -> List[Type[BaseModel]]:
+def find_pydantic_models(module) -> List[Type["BaseModel"]]:
+    from pydantic import BaseModel
+
     models = []
     for name, obj in inspect.getmembers(module, inspect.isclass):
         if issubclass(obj, BaseModel) and obj.__module__ == module.__name__:
             models.append(obj)
     return models
 
+# ==== STATIC EXTRACTION ====
+# Reads the models from the source files with `ast`, without importing the package (nor pydantic).
+# The annotations are rebuilt as `typing` objects over placeholder classes, so that the pages
+# are rendered by the same helpers, and identically, as in import mode.
+
+class StaticModel:
+    """A model class as read from its source: what `render_model` needs of a pydantic model."""
+
+    def __init__(self, name: str, module: str, doc: Optional[str], model_fields: Dict[str, Any], validators: List[dict]):
+        self.__name__ = name
+        self.__module__ = module
+        self.__doc__ = doc
+        self.model_fields = model_fields
+        self.validators = validators
+
+
+class StaticField:
+    """The parts of a pydantic `FieldInfo` used by `extract_fields`."""
+
+    def __init__(self, annotation: Any, description: Optional[str], examples: Optional[list]):
+        self.annotation = annotation
+        self.description = description
+        self.examples = examples
+
+
+def _decorator_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return node.id if isinstance(node, ast.Name) else ""
+
+
+def _literal(node: Optional[ast.expr]) -> Any:
+    try:
+        return ast.literal_eval(node) if node is not None else None
+    except ValueError:
+        return None
+
+
+def _bound_names(node: ast.stmt) -> List[str]:
+    if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+        return [node.name]
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return [(alias.asname or alias.name).split(".")[0] for alias in node.names]
+    if isinstance(node, ast.Assign):
+        return [target.id for target in node.targets if isinstance(target, ast.Name)]
+    if isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+        return [node.target.id]
+    return []
+
+
+def parse_model_file(path: Path) -> dict:
+    """The module-level names and the classes of a model file, as JSON-serializable data."""
+    tree = ast.parse(path.read_text(), filename=str(path))
+    names, aliases, classes = [], {}, []
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            aliases[node.targets[0].id] = ast.unparse(node.value)
+        if isinstance(node, ast.ClassDef):
+            fields, validators = [], []
+            for item in node.body:
+                if isinstance(item, ast.AnnAssign) and isinstance(item.target, ast.Name):
+                    keywords = {}
+                    if isinstance(item.value, ast.Call) and _decorator_name(item.value) == "Field":
+                        keywords = {keyword.arg: keyword.value for keyword in item.value.keywords}
+                    fields.append({
+                        "name": item.target.id,
+                        "annotation": ast.unparse(item.annotation),
+                        "description": _literal(keywords.get("description")),
+                        "examples": _literal(keywords.get("examples")),
+                    })
+                elif isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) \
+                        and any(_decorator_name(d) == "model_validator" for d in item.decorator_list):
+                    validators.append({
+                        "name": item.name,
+                        "description": ast.get_docstring(item) or "Custom model validation.",
+                    })
+            classes.append({
+                "name": node.name,
+                "bases": [ast.unparse(base).split(".")[-1] for base in node.bases],
+                "doc": ast.get_docstring(node, clean=False),
+                "defined_before": list(names),
+                "fields": fields,
+                "validators": validators,
+            })
+        names.extend(_bound_names(node))
+    return {"names": names, "aliases": aliases, "classes": classes}
+
+
+def load_static_modules(base_module: str, base_path: Path) -> Dict[str, dict]:
+    """Parse every model file, reusing the parse of the files whose mtime and size did not change."""
+    try:
+        cache = json.loads(STATIC_CACHE_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    modules, updated = {}, {}
+    for filename in sorted(os.listdir(base_path)):
+        if not filename.endswith(".py") or filename == "__init__.py":
+            continue
+        path = Path(base_path) / filename
+        stat = path.stat()
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        entry = cache.get(str(path))
+        if entry is None or entry["stamp"] != stamp:
+            entry = {"stamp": stamp, "module": parse_model_file(path)}
+            logger.debug("parsed %s", path)
+        updated[str(path)] = entry
+        modules[f"{base_module}.{filename[:-3]}"] = entry["module"]
+    if updated != cache:
+        write_if_changed(STATIC_CACHE_PATH, json.dumps(updated))
+    return modules
+
+
+class _AnnotationEvaluator:
+    """Evaluates annotation source into `typing` objects, the classes of the package being placeholders."""
+
+    TYPING_NAMES = {name: getattr(typing, name) for name in typing.__all__}
+    BUILTINS = {"str": str, "int": int, "float": float, "bool": bool, "bytes": bytes,
+                "list": list, "dict": dict, "tuple": tuple, "set": set, "None": None}
+
+    def __init__(self, module: str, parsed: dict):
+        self.module = module
+        self.parsed = parsed
+        self.placeholders: Dict[str, type] = {}
+        self.resolved_aliases: Dict[str, Any] = {}
+        self.defined: set = set()
+
+    def placeholder(self, name: str) -> type:
+        if name not in self.placeholders:
+            self.placeholders[name] = type(name, (), {"__module__": self.module})
+        return self.placeholders[name]
+
+    def field_annotation(self, source: str, defined: set) -> Any:
+        self.defined = defined
+        node = ast.parse(source, mode="eval").body
+        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+            node = ast.parse(node.value, mode="eval").body
+        annotation = self.eval(node)
+        # pydantic keeps the metadata of a top-level Annotated aside from the annotation
+        if get_origin(annotation) is typing.Annotated:
+            annotation = annotation.__origin__
+        return annotation
+
+    def name(self, name: str) -> Any:
+        if name in self.BUILTINS:
+            return self.BUILTINS[name]
+        if name in self.TYPING_NAMES:
+            return self.TYPING_NAMES[name]
+        if name in self.parsed["aliases"] and name not in {c["name"] for c in self.parsed["classes"]}:
+            if name not in self.resolved_aliases:
+                self.resolved_aliases[name] = self.eval(ast.parse(self.parsed["aliases"][name], mode="eval").body)
+            return self.resolved_aliases[name]
+        return self.placeholder(name)
+
+    def eval(self, node: ast.expr, literal: bool = False) -> Any:
+        if isinstance(node, ast.Constant):
+            # a forward reference is resolved by pydantic when its name exists at class creation
+            if isinstance(node.value, str) and not literal and node.value in self.defined:
+                return self.name(node.value)
+            return node.value
+        if isinstance(node, ast.Name):
+            return self.name(node.id)
+        if isinstance(node, ast.Attribute):
+            return self.name(node.attr)
+        if isinstance(node, ast.Tuple):
+            return tuple(self.eval(item, literal) for item in node.elts)
+        if isinstance(node, ast.Subscript):
+            origin = self.eval(node.value)
+            return origin[self.eval(node.slice, literal=origin is typing.Literal)]
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+            return Union[self.eval(node.left), self.eval(node.right)]
+        # e.g. the validators of an Annotated: opaque metadata
+        return ast.unparse(node)
+
+
+def find_static_models(modules: Dict[str, dict]) -> List[StaticModel]:
+    """Every BaseModel subclass of the parsed modules, as `find_pydantic_models` would return them."""
+    classes = {cls["name"]: (module, cls) for module, parsed in modules.items() for cls in parsed["classes"]}
+    model_names = {"BaseModel"}
+    while True:
+        found = {name for name, (_, cls) in classes.items() if model_names.intersection(cls["bases"])}
+        if found <= model_names:
+            break
+        model_names |= found
+    evaluators = {module: _AnnotationEvaluator(module, parsed) for module, parsed in modules.items()}
+
+    def own_fields(module: str, cls: dict) -> Dict[str, Any]:
+        fields = {}
+        for base in cls["bases"]:
+            if base in classes and base in model_names:
+                fields.update(own_fields(*classes[base]))
+        defined = set(cls["defined_before"]) | {cls["name"]}
+        for field in cls["fields"]:
+            if field["name"].startswith("_") or field["name"] == "model_config" or "ClassVar" in field["annotation"]:
+                continue
+            annotation = evaluators[module].field_annotation(field["annotation"], defined)
+            fields[field["name"]] = StaticField(annotation, field["description"], field["examples"])
+        return fields
+
+    models = []
+    for module, parsed in modules.items():
+        for cls in sorted(parsed["classes"], key=lambda cls: cls["name"]):
+            if cls["name"] in model_names and cls["name"] != "BaseModel":
+                models.append(StaticModel(cls["name"], module, cls["doc"], own_fields(module, cls), cls["validators"]))
+    return models
+
 # ==== MAIN ====
 
-def main():
-    module_names = discover_modules(BASE_MODULE, BASE_PATH)
-    print(module_names)
-    
-    models_info = []
-    for module_name in module_names:
-        mod = importlib.import_module(module_name)
-        models = find_pydantic_models(mod)
-        # print(models)
-        
-        for model in models:
-            FULL_NAME = f"{model.__module__}.{model.__name__}"
-            if FULL_NAME not in {
-                # "pydantic_models.queryBuilderObjModel.AdditionalTable",
-                # "pydantic_models.queryBuilderObjModel.Function",
-                # BASE_MODULE + ".resourceObjModel.Resource",
-                # BASE_MODULE + ".resourceObjModel.ResourceMappingSpec"
-                
-            }:
-                print(model)
-                models_info.append(render_model(model))
-            
-    print(models_info)  
-
-    render_index(models_info)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the markdown pages of the Pydantic models.")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR, help="Directory of the generated pages")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Number of pages rendered in parallel")
+    parser.add_argument("-f", "--force", action="store_true", help="Render every page, even the unchanged ones")
+    parser.add_argument("-s", "--static", action="store_true",
+                        help="Read the models from their source files instead of importing them")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log the extracted fields and validators")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(message)s")
+
+    start = time.perf_counter()
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+
+    if args.static:
+        models = find_static_models(load_static_modules(BASE_MODULE, BASE_PATH))
+    else:
+        models = []
+        for module_name in discover_modules(BASE_MODULE, BASE_PATH):
+            mod = importlib.import_module(module_name)
+            models.extend(find_pydantic_models(mod))
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        models_info = list(pool.map(lambda model: render_model(model, output_dir, manifest, args.force), models))
+
+    manifest.update((info["path"], info["key"]) for info in models_info)
+    save_manifest(manifest)
+    render_index(models_info, output_dir)
+
+    written = sum(info["status"] == "written" for info in models_info)
+    slowest = max(models_info, key=lambda info: info["seconds"], default=None)
+    logger.info(
+        "%d page(s) in %.2f s: %d written, %d unchanged%s",
+        len(models_info), time.perf_counter() - start, written, len(models_info) - written,
+        f" (slowest: {slowest['filename']}, {slowest['seconds'] * 1e3:.1f} ms)" if slowest else ""
+    )
 
 if __name__ == "__main__":
     main()
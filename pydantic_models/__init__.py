@@ -0,0 +1,36 @@
+"""
+Pydantic object models of the RESTful Resource Mapping Specification.
+
+The models are exposed lazily: `from pydantic_models import Resource` only
+imports `resourceObjModel`, not the query-builder models, so that short-lived
+tools do not pay for the models they do not use.
+"""
+import importlib
+from typing import List
+
+# public name → module defining it
+_LAZY_ATTRIBUTES = {
+    **dict.fromkeys(("FieldType", "ArithmeticOperator", "ComparisonOperator"), "enum"),
+    **dict.fromkeys(("MetaData", "Attribute", "Resource", "ResourceMappingSpec"), "resourceObjModel"),
+    **dict.fromkeys((
+        "SortingSubSelect", "SortedQuery", "DBColumnReference", "Condition", "CaseExpression", "Regex",
+        "RelationKey", "Function", "FunctionCall", "Expression", "TableAttribute", "AdditionalTable",
+        "RowCountingOptions", "ResourceToDbMapper", "ResourceToDbMappingSpec",
+    ), "queryBuilderObjModel"),
+    "TypoDetectingModel": "typoDetectingModel",
+}
+
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # later lookups bypass __getattr__
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,291 @@
+"""
+asyncio execution of resource queries.
+
+`AsyncQueryExecutor` runs the statements compiled by a `QueryCompiler` on
+connections borrowed from a bounded `ConnectionPool`:
+
+- `fetch_page` runs the page statement and, when the `rowCounting` mode of the
+  spec needs one, the row-count statement at the same time, each on its own
+  pooled connection.
+- `stream` yields the rows of a statement as they are fetched. Batches go
+  through a bounded queue: when the consumer is slower than the database, the
+  fetching pauses until it catches up.
+
+Connections are adapters exposing three coroutines: `fetch_all(sql, params)`,
+`fetch_batches(sql, params, size)` (an async iterator of row lists) and
+`close()`. `ThreadedConnection` adapts any blocking DB-API connection by
+running its calls on a dedicated thread; `sqlite_connection_factory` builds
+such connections to a local SQLite database, to be used with the `SQLITE`
+dialect in tests and local runs.
+"""
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, asynccontextmanager, nullcontext
+from dataclasses import dataclass
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .rowCounting import (
+    CountCache,
+    RowCount,
+    count_from_window,
+    count_key,
+    count_ttl,
+    make_row_count,
+    needs_count_query
+)
+from .sqlCompiler import CompiledQuery, QueryCompiler, QueryRequest
+
+# Rows fetched per round trip when streaming
+DEFAULT_BATCH_SIZE = 500
+
+# Fetched batches held in memory while the consumer is busy
+DEFAULT_MAX_BUFFERED = 4
+
+
+class ThreadedConnection:
+    """Async adapter of a blocking DB-API connection; every call runs on the connection's own thread."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rrml-db")
+
+    async def _run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, function, *args)
+
+    async def fetch_all(self, sql: str, params: Mapping[str, Any]) -> List[Tuple]:
+        def run():
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(sql, params)
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+        return await self._run(run)
+
+    async def fetch_batches(self, sql: str, params: Mapping[str, Any],
+                            size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[List[Tuple]]:
+        def open_cursor():
+            cursor = self.connection.cursor()
+            cursor.execute(sql, params)
+            return cursor
+
+        cursor = await self._run(open_cursor)
+        try:
+            while True:
+                batch = await self._run(cursor.fetchmany, size)
+                if not batch:
+                    return
+                yield batch
+        finally:
+            await self._run(cursor.close)
+
+    async def close(self) -> None:
+        await self._run(self.connection.close)
+        self._thread.shutdown(wait=False)
+
+
+def sqlite_connection_factory(database: str, setup: Optional[Callable[[sqlite3.Connection], None]] = None
+                              ) -> Callable[[], Awaitable[ThreadedConnection]]:
+    """
+    Factory of connections to a SQLite database, e.g. for `ConnectionPool(sqlite_connection_factory("test.db"))`.
+    `setup(connection)` runs on each new connection, e.g. to `ATTACH` the databases standing in for the schemas.
+    """
+    async def connect() -> ThreadedConnection:
+        connection = ThreadedConnection(None)
+
+        def open_connection():
+            db = sqlite3.connect(database, check_same_thread=False)
+            if setup is not None:
+                setup(db)
+            return db
+
+        connection.connection = await connection._run(open_connection)
+        return connection
+    return connect
+
+
+class ConnectionPool:
+    """
+    At most `maxsize` connections created by the async `factory`, reused across queries.
+    Borrowers wait when every connection is in use.
+    """
+
+    def __init__(self, factory: Callable[[], Awaitable[Any]], maxsize: int = 10):
+        if maxsize < 1:
+            raise ValueError("The pool needs at least one connection")
+        self.factory = factory
+        self.maxsize = maxsize
+        self._idle: List[Any] = []
+        self._slots = asyncio.Semaphore(maxsize)
+        self._closed = False
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Any]:
+        if self._closed:
+            raise RuntimeError("The connection pool is closed")
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else await self.factory()
+            try:
+                yield connection
+            except BaseException:
+                # the connection may be in the middle of a statement: do not reuse it
+                await connection.close()
+                raise
+            else:
+                if self._closed:
+                    await connection.close()
+                else:
+                    self._idle.append(connection)
+
+    async def close(self) -> None:
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for connection in idle:
+            await connection.close()
+
+    async def __aenter__(self) -> "ConnectionPool":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+
+@dataclass(frozen=True)
+class Page:
+    """
+    One page of a resource query.
+
+    - `columns`: the resource attributes of each row, in order.
+    - `count`: the total row count, None when `rowCounting` is disabled.
+    - `cursor`: with keyset pagination, the token of the next page when this one is full.
+    """
+    columns: Tuple[str, ...]
+    rows: List[Tuple]
+    count: Optional[RowCount] = None
+    cursor: Optional[str] = None
+
+
+class AsyncQueryExecutor:
+    """
+    Runs resource queries on a `ConnectionPool`.
+
+    **Example**
+
+    ```python
+    pool = ConnectionPool(sqlite_connection_factory("test.db"), maxsize=4)
+    executor = AsyncQueryExecutor(pool, QueryCompiler(SQLITE), CountCache())
+    page = await executor.fetch_page(spec, QueryRequest(limit=50))
+    async for row in executor.stream(spec, QueryRequest()):
+        ...
+    ```
+
+    When a `gate` (e.g. an `asyncio.Semaphore`) is given, every statement waits for a
+    slot of it before borrowing a connection, which bounds the statements of one batch
+    below the size of the shared pool.
+    """
+
+    def __init__(self, pool: ConnectionPool, compiler: QueryCompiler, count_cache: Optional[CountCache] = None,
+                 gate: Optional[asyncio.Semaphore] = None):
+        self.pool = pool
+        self.compiler = compiler
+        self.count_cache = count_cache
+        self.gate = gate
+
+    def _slot(self):
+        return self.gate if self.gate is not None else nullcontext()
+
+    async def execute(self, compiled: CompiledQuery, params: Mapping[str, Any]) -> List[Tuple]:
+        async with self._slot(), self.pool.acquire() as connection:
+            return await connection.fetch_all(compiled.sql, params)
+
+    async def count(self, spec: ResourceToDbMappingSpec, request: QueryRequest) -> Optional[RowCount]:
+        """Row count of `request` with a separate statement, None when the `rowCounting` mode needs none."""
+        if not needs_count_query(spec, request):
+            return None
+        mode = spec.resourceToDbMapper.rowCounting
+        compiled = self.compiler.compile_count(spec, request)
+        params = compiled.bind(request)
+        key = None
+        if mode == "cached" and self.count_cache is not None:
+            key = count_key(compiled, params)
+            cached = self.count_cache.get(key)
+            if cached is not None:
+                return cached
+        rows = await self.execute(compiled, params)
+        count = make_row_count(compiled, int(rows[0][0]))
+        if key is not None:
+            self.count_cache.put(key, count, count_ttl(spec))
+        return count
+
+    async def fetch_page(self, spec: ResourceToDbMappingSpec, request: QueryRequest) -> Page:
+        """The page of `request` and its row count, queried concurrently."""
+        compiled = self.compiler.compile(spec, request)
+        rows, count = await asyncio.gather(
+            self.execute(compiled, compiled.bind(request)),
+            self.count(spec, request),
+        )
+        if compiled.window_count:
+            count = count_from_window(compiled, rows, request)
+            rows = [row[:-1] for row in rows]
+        cursor = None
+        if compiled.keyset and rows and request.limit is not None and len(rows) >= request.limit:
+            cursor = compiled.next_cursor(dict(zip(compiled.columns, rows[-1])))
+        return Page(compiled.columns, rows, count, cursor)
+
+    async def stream(self, spec: ResourceToDbMappingSpec, request: QueryRequest,
+                     batch_size: int = DEFAULT_BATCH_SIZE,
+                     max_buffered: int = DEFAULT_MAX_BUFFERED) -> AsyncIterator[Sequence[Any]]:
+        """
+        Yield the rows of `request` as they are fetched, holding at most
+        `max_buffered` batches of `batch_size` rows ahead of the consumer.
+        Closing the iterator early stops the query; its connection is then closed rather than reused.
+        """
+        compiled = self.compiler.compile(spec, request)
+        params = compiled.bind(request)
+        queue: "asyncio.Queue[Optional[List[Tuple]]]" = asyncio.Queue(maxsize=max_buffered)
+
+        async def produce():
+            async with self._slot(), self.pool.acquire() as connection:
+                async with aclosing(connection.fetch_batches(compiled.sql, params, batch_size)) as batches:
+                    async for batch in batches:
+                        await queue.put(batch)
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                if producer.done():
+                    producer.result()  # raise the error of a failed producer
+                    batch = await queue.get()  # otherwise the end marker is queued
+                else:
+                    getter = asyncio.ensure_future(queue.get())
+                    await asyncio.wait((getter, producer), return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        getter.cancel()
+                        continue
+                    batch = getter.result()
+                if batch is None:
+                    break
+                if compiled.window_count:
+                    batch = [row[:-1] for row in batch]
+                for row in batch:
+                    yield row
+        finally:
+            if not producer.done():
+                producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
@@ -0,0 +1,186 @@
+"""
+Batched fetch of several resource queries.
+
+A dashboard loading many resources sends them as one batch of `BatchQuery`s.
+`BatchFetcher` runs them concurrently on an `AsyncQueryExecutor`, at most
+`max_concurrency` statements at a time per batch (a page and its row count
+are two statements), and yields each result as soon as it is ready, with the
+latency of its query. The `id`s of the queries of a batch must be unique.
+
+Queries of the same resource that only differ by their fieldset (same
+filters, sort and page) are merged: one statement selects the union of their
+attributes, and each query receives its own columns from the shared rows.
+"""
+import asyncio
+import time
+from collections import Counter
+from dataclasses import dataclass, replace
+from typing import (
+    AsyncIterator,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from .asyncExecutor import AsyncQueryExecutor, Page
+from .projection import FieldSelectionError, expand_fieldset
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .sqlCompiler import QueryRequest
+
+# Statements run at the same time by one batch when no limit is given
+DEFAULT_BATCH_CONCURRENCY = 8
+
+
+@dataclass(frozen=True)
+class BatchQuery:
+    """One query of a batch; `id` identifies its result in the response."""
+    id: Hashable
+    resource_name: str
+    request: QueryRequest = QueryRequest()
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    """
+    The outcome of one `BatchQuery`: its `page`, or the `error` that prevented it.
+
+    - `latency`: seconds spent running its statements, waiting for a concurrency slot included.
+    - `ready_after`: seconds from the start of the batch until the result was ready,
+      waiting for a concurrency slot included.
+    - `merged`: the number of queries of the batch answered by the same statements.
+    """
+    id: Hashable
+    resource_name: str
+    page: Optional[Page] = None
+    error: Optional[str] = None
+    latency: float = 0.0
+    ready_after: float = 0.0
+    merged: int = 1
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class BatchResponse:
+    results: Tuple[BatchResult, ...]
+    elapsed: float
+
+    def __getitem__(self, query_id: Hashable) -> BatchResult:
+        for result in self.results:
+            if result.id == query_id:
+                return result
+        raise KeyError(query_id)
+
+
+def _merge_key(query: BatchQuery) -> Tuple[str, str]:
+    # filter values may be lists, so the request is keyed by its representation
+    return query.resource_name, repr(replace(query.request, fields=None))
+
+
+def _merged_fields(queries: Sequence[BatchQuery]) -> Optional[Tuple[str, ...]]:
+    """The union of the fieldsets of `queries`, None (every attribute) when one of them selects all."""
+    if any(query.request.fields is None for query in queries):
+        return None
+    return tuple(dict.fromkeys(name for query in queries for name in query.request.fields))
+
+
+def _project(spec: ResourceToDbMappingSpec, page: Page, fields: Optional[Sequence[str]]) -> Page:
+    """The part of a merged `page` answering a query on `fields`."""
+    columns = expand_fieldset(spec, fields)
+    if columns == page.columns:
+        return page
+    positions = [page.columns.index(name) for name in columns]
+    rows = [tuple(row[i] for i in positions) for row in page.rows]
+    return replace(page, columns=columns, rows=rows)
+
+
+class BatchFetcher:
+    """
+    Runs batches of resource queries against the specs of `registry`.
+
+    **Example**
+
+    ```python
+    fetcher = BatchFetcher(registry, executor, max_concurrency=4)
+    async for result in fetcher.stream([
+        BatchQuery("eras", "era", QueryRequest(limit=20)),
+        BatchQuery("fills", "fill", QueryRequest(limit=20)),
+    ]):
+        send(result)
+    ```
+    """
+
+    def __init__(self, registry: Mapping[str, ResourceToDbMappingSpec], executor: AsyncQueryExecutor,
+                 max_concurrency: int = DEFAULT_BATCH_CONCURRENCY):
+        self.registry = registry
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+
+    async def stream(self, queries: Sequence[BatchQuery]) -> AsyncIterator[BatchResult]:
+        """
+        Yield the result of every query of the batch as soon as its statements complete.
+        Raises ValueError, before running anything, when two queries share an `id`.
+        """
+        duplicates = [query_id for query_id, count in Counter(query.id for query in queries).items() if count > 1]
+        if duplicates:
+            raise ValueError(f"Duplicate query ids in batch: {', '.join(map(repr, duplicates))}")
+        start = time.perf_counter()
+        groups: Dict[Tuple[str, str], List[BatchQuery]] = {}
+        for query in queries:
+            spec = self.registry.get(query.resource_name)
+            if spec is None:
+                yield BatchResult(query.id, query.resource_name, error=f"Unknown resource '{query.resource_name}'")
+                continue
+            try:
+                expand_fieldset(spec, query.request.fields)
+            except FieldSelectionError as exc:
+                # rejected on its own, so that it does not fail the queries it would be merged with
+                yield BatchResult(query.id, query.resource_name, error=str(exc))
+                continue
+            groups.setdefault(_merge_key(query), []).append(query)
+
+        # the slots are taken by each statement, not by each group: a page and its count are two statements
+        executor = AsyncQueryExecutor(self.executor.pool, self.executor.compiler, self.executor.count_cache,
+                                      gate=asyncio.Semaphore(self.max_concurrency))
+        tasks = [asyncio.ensure_future(self._run_group(executor, members, start)) for members in groups.values()]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                for result in await finished:
+                    yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def fetch(self, queries: Sequence[BatchQuery]) -> BatchResponse:
+        """Run the whole batch and return every result, in the order of `queries`; see `stream`."""
+        start = time.perf_counter()
+        results = {result.id: result async for result in self.stream(queries)}
+        ordered = tuple(results[query.id] for query in queries if query.id in results)
+        return BatchResponse(ordered, time.perf_counter() - start)
+
+    async def _run_group(self, executor: AsyncQueryExecutor, members: List[BatchQuery],
+                         start: float) -> List[BatchResult]:
+        resource_name = members[0].resource_name
+        spec = self.registry[resource_name]
+        request = replace(members[0].request, fields=_merged_fields(members))
+        began = time.perf_counter()
+        try:
+            page = await executor.fetch_page(spec, request)
+            error = None
+        except Exception as exc:
+            page, error = None, str(exc)
+        finished = time.perf_counter()
+        timing = dict(latency=finished - began, ready_after=finished - start, merged=len(members))
+
+        if error is not None:
+            return [BatchResult(member.id, resource_name, error=error, **timing) for member in members]
+        return [
+            BatchResult(member.id, resource_name, page=_project(spec, page, member.request.fields), **timing)
+            for member in members
+        ]
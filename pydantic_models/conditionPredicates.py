@@ -0,0 +1,363 @@
+"""
+In-memory evaluation of `Condition` lists and REST filters.
+
+The conditions of an `AdditionalTable` and the `Filter`s of a `QueryRequest`
+are combined with AND by the SQL compiler. For rows served from an
+in-process cache, `compile_conditions` and `compile_filters` compile the same
+lists into a `Predicate`:
+
+- called on a row, it runs a single generated function testing every term
+  inline, cheapest terms first, with no per-row dispatch on the operators;
+- `mask` evaluates the terms over columnar batches and returns a NumPy boolean
+  mask (NumPy is only imported when it is used).
+
+Rows are mappings: `{"table.column": value}` for conditions, the table being
+the condition's `table` or the owner table of the list, and
+`{attribute: value}` for REST filters.
+
+The terms follow SQL semantics: a comparison, `in` or `like` on NULL (None)
+is unknown, so the row does not match; only `is` / `isnot` null test NULL.
+`in` lists are hashed into sets, and `like` patterns are compiled once, to
+plain string tests when they only use `%` at their ends.
+"""
+import operator
+import re
+from dataclasses import dataclass
+from functools import reduce
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union
+)
+
+from .enum import ArithmeticOperator, ComparisonOperator
+from .queryBuilderObjModel import Condition, Regex
+
+Row = Mapping[str, Any]
+
+# pseudo-operator of the `Regex` conditions: REGEXP_SUBSTR(...) IS NOT NULL
+REGEX = "regex"
+
+
+class PredicateError(ValueError):
+    """Raised when a condition or a filter cannot be compiled, e.g. it has an invalid operator."""
+
+
+@dataclass(frozen=True)
+class Term:
+    """One test of a predicate: `key operator value`."""
+    key: str
+    operator: Union[ComparisonOperator, str]
+    value: Any = None
+
+
+def _is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.lower() == "null")
+
+
+def _as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+def _operator(value: Any, key: str) -> ComparisonOperator:
+    if isinstance(value, ArithmeticOperator):
+        raise PredicateError(
+            f"Operator '{value}' cannot be used in a condition on '{key}', a comparison operator is expected"
+        )
+    try:
+        return ComparisonOperator(value)
+    except ValueError:
+        raise PredicateError(f"Invalid operator '{value}' on '{key}'") from None
+
+
+def condition_terms(conditions: Iterable[Union[Condition, Regex]], owner: str) -> List[Term]:
+    """The terms of `AdditionalTable.conditions`-like lists, whose unqualified columns belong to `owner`."""
+    terms = []
+    for condition in conditions:
+        if isinstance(condition, Regex):
+            terms.append(Term(f"{owner}.{condition.column}", REGEX, condition))
+            continue
+        terms.append(_term(f"{condition.table or owner}.{condition.column}", condition.operator, condition.value))
+    return terms
+
+
+def filter_terms(filters: Iterable[Any]) -> List[Term]:
+    """The terms of REST `Filter`s, on rows keyed by resource attribute."""
+    return [_term(f.attribute, f.operator, f.value) for f in filters]
+
+
+def _term(key: str, operator_value: Any, value: Any) -> Term:
+    op = _operator(operator_value, key)
+    if op in (ComparisonOperator.IS, ComparisonOperator.ISNOT) and not _is_null(value):
+        raise PredicateError(f"Operator '{op}' on '{key}' only accepts the value null")
+    return Term(key, op, value)
+
+
+# ---- LIKE ----
+
+@dataclass(frozen=True)
+class LikePattern:
+    """
+    A SQL LIKE pattern compiled once: `kind` is `equal`, `prefix`, `suffix` or `contains`
+    when the pattern only has `%` at its ends (`text` being the literal part), `regex` otherwise.
+    """
+    kind: str
+    text: str
+    regex: "re.Pattern[str]"
+
+    @classmethod
+    def compile(cls, pattern: str) -> "LikePattern":
+        regex = re.compile("".join(
+            ".*" if char == "%" else "." if char == "_" else re.escape(char) for char in pattern
+        ), re.DOTALL)
+        core = pattern.strip("%")
+        if "%" in core or "_" in core or not core:
+            return cls("regex", pattern, regex)
+        starts, ends = pattern.startswith("%"), pattern.endswith("%")
+        kind = "contains" if starts and ends else "suffix" if starts else "prefix" if ends else "equal"
+        return cls(kind, core, regex)
+
+    def matches(self, value: str) -> bool:
+        if self.kind == "equal":
+            return value == self.text
+        if self.kind == "prefix":
+            return value.startswith(self.text)
+        if self.kind == "suffix":
+            return value.endswith(self.text)
+        if self.kind == "contains":
+            return self.text in value
+        return self.regex.fullmatch(value) is not None
+
+
+# ---- REGEXP_SUBSTR ----
+
+def regex_matcher(regex: Regex) -> Callable[[str], bool]:
+    """True when REGEXP_SUBSTR(value, pattern, position, occurrence) is not NULL (nor empty)."""
+    pattern = re.compile(regex.pattern)
+    position = regex.groups[0] if regex.groups else 1
+    occurrence = regex.groups[1] if len(regex.groups) > 1 else 1
+
+    def matches(value: str) -> bool:
+        for count, match in enumerate(pattern.finditer(value, max(position - 1, 0)), start=1):
+            if count == occurrence:
+                return match.end() > match.start()
+        return False
+    return matches
+
+
+# ---- fused row predicate ----
+
+# cheapest tests first: AND does not depend on the order of its terms
+_COST = {
+    ComparisonOperator.IS: 0, ComparisonOperator.ISNOT: 0,
+    ComparisonOperator.EQUAL: 1, ComparisonOperator.IN: 1,
+    ComparisonOperator.NOEQUAL: 2, ComparisonOperator.LESS_THAN: 2, ComparisonOperator.LESS_THAN_EQUAL: 2,
+    ComparisonOperator.GREATER_THAN: 2, ComparisonOperator.GREAT_THAN_EQUAL: 2,
+    ComparisonOperator.LIKE: 3,
+    REGEX: 4,
+}
+
+_SOURCE_OPERATORS = {
+    ComparisonOperator.EQUAL: "==",
+    ComparisonOperator.NOEQUAL: "!=",
+    ComparisonOperator.LESS_THAN: "<",
+    ComparisonOperator.LESS_THAN_EQUAL: "<=",
+    ComparisonOperator.GREATER_THAN: ">",
+    ComparisonOperator.GREAT_THAN_EQUAL: ">=",
+}
+
+_LIKE_SOURCE = {
+    "equal": "v{i} == t{i}",
+    "prefix": "v{i}.startswith(t{i})",
+    "suffix": "v{i}.endswith(t{i})",
+    "contains": "t{i} in v{i}",
+    "regex": "m{i}(v{i}) is not None",
+}
+
+
+def _term_source(i: int, term: Term, namespace: Dict[str, Any]) -> str:
+    """Inline test of one term on `row`; its constants are bound in `namespace`."""
+    namespace[f"k{i}"] = term.key
+    op = term.operator
+    if op is ComparisonOperator.IS:
+        return f"row[k{i}] is None"
+    if op is ComparisonOperator.ISNOT:
+        return f"row[k{i}] is not None"
+    if op is ComparisonOperator.IN:
+        # None never matches: x IN (NULL) is unknown
+        namespace[f"s{i}"] = frozenset(value for value in _as_list(term.value) if value is not None)
+        return f"row[k{i}] in s{i}"
+    if op is ComparisonOperator.LIKE:
+        like = LikePattern.compile(str(term.value))
+        namespace[f"t{i}"] = like.text
+        namespace[f"m{i}"] = like.regex.fullmatch
+        test = _LIKE_SOURCE[like.kind].format(i=i)
+        return f"((v{i} := row[k{i}]) is not None and (v{i} := str(v{i})) is not None and {test})"
+    if op == REGEX:
+        namespace[f"r{i}"] = regex_matcher(term.value)
+        return f"((v{i} := row[k{i}]) is not None and r{i}(str(v{i})))"
+    namespace[f"c{i}"] = term.value
+    return f"((v{i} := row[k{i}]) is not None and v{i} {_SOURCE_OPERATORS[op]} c{i})"
+
+
+def _fuse(terms: Sequence[Term]) -> Callable[[Row], bool]:
+    namespace: Dict[str, Any] = {}
+    tests = [_term_source(i, term, namespace) for i, term in enumerate(terms)]
+    source = f"def predicate(row):\n    return {' and '.join(tests) if tests else 'True'}\n"
+    exec(compile(source, "<fused predicate>", "exec"), namespace)
+    return namespace["predicate"]
+
+
+# ---- columnar masks ----
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError("Predicate masks require the `numpy` package") from exc
+    return numpy
+
+
+def masked_values(np, values):
+    """Masked array of a column `values`, None being masked."""
+    if isinstance(values, np.ma.MaskedArray):
+        return values
+    if isinstance(values, np.ndarray) and values.dtype != object:
+        return np.ma.asarray(values)
+    values = list(values)
+    mask = [value is None for value in values]
+    if not any(mask):
+        return np.ma.asarray(np.array(values))
+    present = next((value for value in values if value is not None), None)
+    if present is None:
+        return np.ma.masked_all(len(values), dtype=float)
+    return np.ma.array(np.array([present if value is None else value for value in values]), mask=mask)
+
+
+_MASK_COMPARISONS = {
+    ComparisonOperator.EQUAL: operator.eq,
+    ComparisonOperator.NOEQUAL: operator.ne,
+    ComparisonOperator.LESS_THAN: operator.lt,
+    ComparisonOperator.LESS_THAN_EQUAL: operator.le,
+    ComparisonOperator.GREATER_THAN: operator.gt,
+    ComparisonOperator.GREAT_THAN_EQUAL: operator.ge,
+}
+
+
+def _strings(np, column):
+    return np.asarray(np.ma.getdata(column)).astype(str)
+
+
+def _elementwise(np, column, test: Callable[[str], bool]):
+    return np.fromiter(
+        (value is not None and test(str(value)) for value in column.tolist(None)), dtype=bool, count=len(column)
+    )
+
+
+def _term_mask(term: Term) -> Callable[[Any, Any], Any]:
+    """Boolean mask of one term, from `np` and the masked array of its column."""
+    op = term.operator
+    if op is ComparisonOperator.IS:
+        return lambda np, column: np.ma.getmaskarray(column)
+    if op is ComparisonOperator.ISNOT:
+        return lambda np, column: ~np.ma.getmaskarray(column)
+    if op is ComparisonOperator.IN:
+        values = [value for value in _as_list(term.value) if value is not None]
+        return lambda np, column: np.isin(np.ma.getdata(column), values) & ~np.ma.getmaskarray(column)
+    if op is ComparisonOperator.LIKE:
+        like = LikePattern.compile(str(term.value))
+        if like.kind == "regex":
+            return lambda np, column: _elementwise(np, column, like.matches)
+        vector = {
+            "equal": lambda np, strings: strings == like.text,
+            "prefix": lambda np, strings: np.char.startswith(strings, like.text),
+            "suffix": lambda np, strings: np.char.endswith(strings, like.text),
+            "contains": lambda np, strings: np.char.find(strings, like.text) >= 0,
+        }[like.kind]
+        return lambda np, column: vector(np, _strings(np, column)) & ~np.ma.getmaskarray(column)
+    if op == REGEX:
+        matches = regex_matcher(term.value)
+        return lambda np, column: _elementwise(np, column, matches)
+    compare, value = _MASK_COMPARISONS[op], term.value
+    return lambda np, column: np.ma.filled(compare(column, value), False)
+
+
+class Predicate:
+    """
+    Compiled AND of a list of terms.
+
+    **Example**
+
+    ```python
+    predicate = compile_filters(request.filters)
+    rows = [record for record in cached_records if predicate(record)]   # or predicate.filter(cached_records)
+    mask = predicate.mask({"fill_number": numbers, "stable_beams": flags})
+    ```
+    """
+
+    def __init__(self, terms: Sequence[Term]):
+        self.terms: Tuple[Term, ...] = tuple(sorted(terms, key=lambda term: _COST[term.operator]))
+        self._predicate = _fuse(self.terms)
+        self._masks = tuple((term.key, _term_mask(term)) for term in self.terms)
+
+    def __call__(self, row: Row) -> bool:
+        return self._predicate(row)
+
+    def filter(self, rows: Iterable[Row]) -> List[Row]:
+        """The rows matching every term."""
+        return list(filter(self._predicate, rows))
+
+    def mask(self, columns: Mapping[str, Any]):
+        """
+        Boolean mask of the rows of columns `{key: values}` matching every term.
+
+        Each term is only evaluated on the rows matching the previous ones, so the
+        selective cheap terms spare the conversion and the tests of the later columns.
+        """
+        np = _numpy()
+        size = len(next(iter(columns.values()))) if columns else 0
+        selected = None  # indices of the rows matching the terms evaluated so far
+        for key, term_mask in self._masks:
+            values = columns[key]
+            if selected is not None:
+                values = (values if isinstance(values, np.ndarray) else np.asarray(values, dtype=object))[selected]
+            matched = np.asarray(term_mask(np, masked_values(np, values)), dtype=bool)
+            selected = matched.nonzero()[0] if selected is None else selected[matched]
+            if not len(selected):
+                break
+        result = np.ones(size, dtype=bool) if selected is None else np.zeros(size, dtype=bool)
+        if selected is not None:
+            result[selected] = True
+        return result
+
+    def mask_of(self, np, column: Callable[[str], Any], size: int):
+        """Mask over the masked arrays returned by `column(key)`; stops at the first term leaving no row."""
+        result: Optional[Any] = None
+        for key, term_mask in self._masks:
+            mask = term_mask(np, column(key))
+            result = mask if result is None else result & mask
+            if not result.any():
+                break
+        return np.ones(size, dtype=bool) if result is None else np.array(result, dtype=bool)
+
+
+def compile_conditions(conditions: Iterable[Union[Condition, Regex]], owner: str) -> Predicate:
+    """Predicate of a condition list on rows `{"table.column": value}`."""
+    return Predicate(condition_terms(conditions, owner))
+
+
+def compile_filters(filters: Iterable[Any]) -> Predicate:
+    """Predicate of REST `Filter`s on records `{attribute: value}`."""
+    return Predicate(filter_terms(filters))
+
+
+def all_of(predicates: Sequence[Predicate]) -> Predicate:
+    """A single predicate fusing the terms of several ones, e.g. a table's conditions and a request's filters."""
+    return Predicate(reduce(lambda terms, predicate: terms + predicate.terms, predicates, ()))
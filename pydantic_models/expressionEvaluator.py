@@ -0,0 +1,602 @@
+"""
+In-memory evaluation of derived attributes.
+
+A mapped attribute defined by an `Expression`, a `Function` or a
+`CaseExpression` can be computed from rows already fetched (e.g. cached
+results), without sending a new query. The trees are compiled once into
+closures over a row `{"table.column": value}`; nodes are resolved at compile
+time, so evaluating a row is a few nested calls, with no inspection of the
+tree. The batch mode compiles the same trees to NumPy operations over whole
+columns `{"table.column": array}`, evaluated in one pass; NumPy is only
+imported when it is used.
+
+The evaluation follows SQL semantics:
+
+- NULL (None) propagates through arithmetic and functions, except the
+  NULL-handling ones (`nvl`, `coalesce`, `nullif`, `concat`).
+- Division follows the dialect of the compiled SQL, `ORACLE` by default:
+  Oracle NUMBER division is exact (`7 / 2` is `3.5`), while the dialects
+  with `integer_division` (PostgreSQL, SQLite) truncate the division of two
+  integers toward zero (`-7 / 2` is `-3`). Dividing by zero raises
+  `ZeroDivisionError`.
+- A condition comparing NULL is unknown: its `CASE` branch is not taken.
+- `round` rounds half away from zero.
+- `min` / `max` with several arguments are row functions, `least` / `greatest`.
+  Aggregate functions cannot be evaluated on a single row and are rejected at compile time.
+
+Functions are looked up by name in `FUNCTIONS`; `register_function` adds one.
+"""
+import math
+import operator
+from dataclasses import dataclass
+from decimal import ROUND_HALF_UP, Decimal
+from functools import reduce
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Union
+)
+
+from .conditionPredicates import Predicate, PredicateError, compile_conditions, masked_values
+from .enum import ArithmeticOperator
+from .mappingDependencies import AGGREGATE_FUNCTIONS, is_aggregate
+from .queryBuilderObjModel import (
+    CaseExpression,
+    Condition,
+    DBColumnReference,
+    Expression,
+    Function,
+    FunctionCall,
+    ResourceToDbMappingSpec,
+    TableAttribute
+)
+from .sqlCompiler import ORACLE, Dialect
+
+Row = Mapping[str, Any]
+Evaluator = Callable[[Row], Any]
+Operand = Union[int, float, str, bool, None, DBColumnReference, FunctionCall, Expression]
+
+
+class ExpressionError(ValueError):
+    """Raised when a tree cannot be evaluated in memory, e.g. it uses an unknown or an aggregate function."""
+
+
+def column_key(table: str, column: str) -> str:
+    """Key of a column in the evaluated rows."""
+    return f"{table}.{column}"
+
+
+# ---- SQL arithmetic ----
+
+def _divide(left: Any, right: Any) -> Any:
+    # Oracle NUMBER division: exact, integers included
+    if right == 0:
+        raise ZeroDivisionError("division by zero")
+    return left / right
+
+
+def _integer_divide(left: Any, right: Any) -> Any:
+    # dialects with `integer_division`: an integer divided by an integer is truncated toward zero
+    if isinstance(left, int) and isinstance(right, int):
+        if right == 0:
+            raise ZeroDivisionError("division by zero")
+        quotient = abs(left) // abs(right)
+        return quotient if (left < 0) == (right < 0) else -quotient
+    return _divide(left, right)
+
+
+ARITHMETIC: Dict[ArithmeticOperator, Callable[[Any, Any], Any]] = {
+    ArithmeticOperator.ADD: operator.add,
+    ArithmeticOperator.SUBTRACT: operator.sub,
+    ArithmeticOperator.MULTIPLY: operator.mul,
+    ArithmeticOperator.DIVIDE: _divide,
+}
+
+
+def arithmetic(op: ArithmeticOperator, dialect: Dialect = ORACLE) -> Callable[[Any, Any], Any]:
+    """The operation of `op` in `dialect`."""
+    if op is ArithmeticOperator.DIVIDE and dialect.integer_division:
+        return _integer_divide
+    return ARITHMETIC[op]
+
+
+# ---- built-in functions ----
+
+@dataclass(frozen=True)
+class SqlFunction:
+    """
+    A function evaluable in memory.
+
+    - `scalar(*values)`: the function on one row. With `strict`, it is only called on non-NULL
+      values, the result being NULL as soon as an argument is.
+    - `vector(np, *arrays)`: the function on masked arrays of the batch mode; when missing,
+      `scalar` is applied element by element.
+    """
+    name: str
+    scalar: Callable[..., Any]
+    vector: Optional[Callable[..., Any]] = None
+    strict: bool = True
+    min_args: int = 1
+    max_args: Optional[int] = 1
+
+    def check_arity(self, count: int) -> None:
+        if count < self.min_args or (self.max_args is not None and count > self.max_args):
+            expected = str(self.min_args) if self.max_args == self.min_args else \
+                f"{self.min_args} to {self.max_args}" if self.max_args is not None else f"at least {self.min_args}"
+            raise ExpressionError(f"Function '{self.name}' takes {expected} argument(s), {count} given")
+
+
+FUNCTIONS: Dict[str, SqlFunction] = {}
+
+
+def register_function(function: SqlFunction) -> SqlFunction:
+    FUNCTIONS[function.name.lower()] = function
+    return function
+
+
+def _round(value: Any, digits: int = 0) -> Any:
+    if isinstance(value, int) and digits >= 0:
+        return value
+    rounded = Decimal(repr(value) if isinstance(value, float) else value).quantize(
+        Decimal(1).scaleb(-int(digits)), rounding=ROUND_HALF_UP
+    )
+    if isinstance(value, (int, float)):
+        return type(value)(rounded)
+    return rounded
+
+
+def _trunc(value: Any, digits: int = 0) -> Any:
+    if isinstance(value, int) and digits >= 0:
+        return value
+    factor = 10 ** int(digits)
+    return math.trunc(value * factor) / factor if digits else math.trunc(value)
+
+
+def _mod(left: Any, right: Any) -> Any:
+    if right == 0:
+        raise ZeroDivisionError("modulo by zero")
+    if isinstance(left, int) and isinstance(right, int):
+        return left - right * _integer_divide(left, right)
+    return math.fmod(left, right)
+
+
+def _nvl(value: Any, fallback: Any) -> Any:
+    return fallback if value is None else value
+
+
+def _coalesce(*values: Any) -> Any:
+    return next((value for value in values if value is not None), None)
+
+
+def _nullif(value: Any, other: Any) -> Any:
+    return None if value is not None and value == other else value
+
+
+def _concat(*values: Any) -> str:
+    return "".join(str(value) for value in values if value is not None)
+
+
+# vector forms: every argument is a masked array of the batch length
+
+def _vround(np, values, digits=None):
+    # the rule of `_round`, half away from zero on the decimal value: the binary scaled value
+    # is only trusted away from a tie, the rows near one are rounded by `_round` itself
+    digits = np.broadcast_to(np.ma.filled(0 if digits is None else digits, 0).astype(int), values.shape)
+    if values.dtype.kind in "iu" and np.all(digits >= 0):
+        return values
+    data = np.ma.getdata(values).astype(float)
+    scale = np.power(10.0, np.abs(digits))
+    scaled = np.abs(np.where(digits >= 0, data * scale, data / scale))
+    rounded = np.floor(scaled + 0.5)
+    result = np.sign(data) * np.where(digits >= 0, rounded / scale, rounded * scale)
+    fraction = scaled - np.floor(scaled)
+    near_tie = np.abs(fraction - 0.5) <= 1e-9 * np.maximum(scaled, 1.0)
+    if values.dtype.kind in "iu":
+        result = result.astype(values.dtype)
+    mask = np.ma.getmaskarray(values)
+    for i in np.flatnonzero(near_tie & ~mask):
+        result[i] = _round(values[i].item(), int(digits[i]))
+    return np.ma.array(result, mask=mask)
+
+
+def _vtrunc(np, values, digits=None):
+    if digits is None:
+        digits = 0
+    if values.dtype.kind in "iu" and np.all(np.ma.filled(digits, 0) >= 0):
+        return values
+    factor = np.power(10.0, digits)
+    return np.ma.array(np.trunc(np.ma.getdata(values) * factor) / factor, mask=np.ma.getmask(values))
+
+
+def _vmod(np, left, right):
+    if np.any(np.ma.filled(right, 1) == 0):
+        raise ZeroDivisionError("modulo by zero")
+    return np.ma.fmod(left, right)
+
+
+def _vcoalesce(np, *arrays):
+    result = arrays[-1]
+    for array in reversed(arrays[:-1]):
+        result = np.ma.where(np.ma.getmaskarray(array), result, array)
+    return result
+
+
+def _vnullif(np, values, other):
+    equal = np.ma.filled(values == other, False)
+    return np.ma.masked_where(equal, values)
+
+
+def _vleast(np, *arrays):
+    return reduce(np.ma.minimum, arrays)
+
+
+def _vgreatest(np, *arrays):
+    return reduce(np.ma.maximum, arrays)
+
+
+def _strip(value: str) -> str:
+    return value.strip(" ")
+
+
+for _function in (
+    SqlFunction("abs", abs, lambda np, values: np.ma.abs(values)),
+    SqlFunction("round", _round, _vround, max_args=2),
+    SqlFunction("trunc", _trunc, _vtrunc, max_args=2),
+    SqlFunction("floor", math.floor, lambda np, values: np.ma.floor(values)),
+    SqlFunction("ceil", math.ceil, lambda np, values: np.ma.ceil(values)),
+    SqlFunction("mod", _mod, _vmod, min_args=2, max_args=2),
+    SqlFunction("upper", str.upper),
+    SqlFunction("lower", str.lower),
+    SqlFunction("trim", _strip),
+    SqlFunction("ltrim", lambda value: value.lstrip(" ")),
+    SqlFunction("rtrim", lambda value: value.rstrip(" ")),
+    SqlFunction("length", len),
+    SqlFunction("least", lambda *values: min(values), _vleast, max_args=None),
+    SqlFunction("greatest", lambda *values: max(values), _vgreatest, max_args=None),
+    # with a single argument min / max are aggregates, rejected when compiled
+    SqlFunction("min", lambda *values: min(values), _vleast, min_args=2, max_args=None),
+    SqlFunction("max", lambda *values: max(values), _vgreatest, min_args=2, max_args=None),
+    SqlFunction("nvl", _nvl, _vcoalesce, strict=False, min_args=2, max_args=2),
+    SqlFunction("coalesce", _coalesce, _vcoalesce, strict=False, max_args=None),
+    SqlFunction("nullif", _nullif, _vnullif, strict=False, min_args=2, max_args=2),
+    SqlFunction("concat", _concat, strict=False, max_args=None),
+):
+    register_function(_function)
+
+
+def lookup_function(function: Function, count: int) -> SqlFunction:
+    """The built-in called by `function` with `count` arguments."""
+    name = function.name.lower()
+    if function.distinct or (name in AGGREGATE_FUNCTIONS and count <= 1):
+        raise ExpressionError(f"Aggregate function '{function.name}' cannot be evaluated on a single row")
+    sql_function = FUNCTIONS.get(name)
+    if sql_function is None:
+        raise ExpressionError(f"Function '{function.name}' has no in-memory implementation")
+    sql_function.check_arity(count)
+    return sql_function
+
+
+# ---- row evaluation ----
+
+def compile_operand(value: Operand, owner: str, dialect: Dialect = ORACLE) -> Evaluator:
+    """Closure evaluating an operand on a row; `owner` is the table of the mapping."""
+    if isinstance(value, DBColumnReference):
+        return operator.itemgetter(column_key(value.table, value.column))
+    if isinstance(value, FunctionCall):
+        return compile_function(value.function, owner, dialect=dialect)
+    if isinstance(value, Expression):
+        return compile_expression(value, owner, dialect)
+    return lambda row: value
+
+
+def compile_expression(expression: Expression, owner: str, dialect: Dialect = ORACLE) -> Evaluator:
+    apply = arithmetic(expression.operator, dialect)
+    left, right = expression.left, expression.right
+    # the common shapes read their columns directly, without a nested call per operand
+    if isinstance(left, DBColumnReference) and isinstance(right, DBColumnReference):
+        left_key, right_key = column_key(left.table, left.column), column_key(right.table, right.column)
+
+        def columns(row: Row) -> Any:
+            a, b = row[left_key], row[right_key]
+            return None if a is None or b is None else apply(a, b)
+        return columns
+    if isinstance(left, DBColumnReference) and not isinstance(right, (FunctionCall, Expression)):
+        key, constant = column_key(left.table, left.column), right
+
+        def column_constant(row: Row) -> Any:
+            a = row[key]
+            return None if a is None or constant is None else apply(a, constant)
+        return column_constant
+
+    left_value, right_value = compile_operand(left, owner, dialect), compile_operand(right, owner, dialect)
+
+    def operands(row: Row) -> Any:
+        a = left_value(row)
+        if a is None:
+            return None
+        b = right_value(row)
+        return None if b is None else apply(a, b)
+    return operands
+
+
+def _function_arguments(function: Function, owner: str, column: Optional[str]) -> List[Operand]:
+    arguments: List[Operand] = [DBColumnReference(table=owner, column=column)] if column else []
+    arguments.extend(function.params or [])
+    return arguments
+
+
+def compile_function(function: Function, owner: str, column: Optional[str] = None,
+                     dialect: Dialect = ORACLE) -> Evaluator:
+    """Closure of a function call; `column`, the `attNamedb` of the mapping, is its first argument."""
+    arguments = _function_arguments(function, owner, column)
+    sql_function = lookup_function(function, len(arguments))
+    scalar = sql_function.scalar
+    values = [compile_operand(argument, owner, dialect) for argument in arguments]
+
+    if not sql_function.strict:
+        return lambda row: scalar(*[value(row) for value in values])
+    if len(values) == 1:
+        (single,) = values
+
+        def unary(row: Row) -> Any:
+            a = single(row)
+            return None if a is None else scalar(a)
+        return unary
+
+    def call(row: Row) -> Any:
+        evaluated = [value(row) for value in values]
+        return None if None in evaluated else scalar(*evaluated)
+    return call
+
+
+def compile_condition(condition: Condition, owner: str) -> Predicate:
+    """Predicate of a `CASE` condition; unknown (a NULL compared) is False."""
+    try:
+        return compile_conditions([condition], owner)
+    except PredicateError as exc:
+        raise ExpressionError(str(exc)) from None
+
+
+def _case_fallback(branches: Sequence[CaseExpression]) -> Operand:
+    # like the SQL compiler: the last `else` given is the ELSE of the CASE
+    fallback = None
+    for branch in branches:
+        if branch.else_ is not None:
+            fallback = branch.else_
+    return fallback
+
+
+def compile_case(branches: Sequence[CaseExpression], owner: str, dialect: Dialect = ORACLE) -> Evaluator:
+    compiled = tuple(
+        (compile_condition(branch.when, owner), compile_operand(branch.then, owner, dialect)) for branch in branches
+    )
+    fallback = compile_operand(_case_fallback(branches), owner, dialect)
+
+    def case(row: Row) -> Any:
+        for predicate, then in compiled:
+            if predicate(row):
+                return then(row)
+        return fallback(row)
+    return case
+
+
+def compile_attribute(field: TableAttribute, owner: str, dialect: Dialect = ORACLE) -> Evaluator:
+    """Closure of a mapped attribute, evaluated in the scope of the `owner` table, as `SqlBuilder.attribute`."""
+    if field.function:
+        return compile_function(field.function, owner, field.attNamedb, dialect=dialect)
+    if field.expression:
+        return compile_expression(field.expression, owner, dialect)
+    if field.case_expression:
+        return compile_case(field.case_expression, owner, dialect)
+    return operator.itemgetter(column_key(owner, field.attNamedb))
+
+
+# ---- batch evaluation ----
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError("Batch evaluation of expressions requires the `numpy` package") from exc
+    return numpy
+
+
+class ColumnBatch:
+    """The columns `{"table.column": values}` of a batch of rows, converted to masked arrays on first use."""
+
+    def __init__(self, np, columns: Mapping[str, Any]):
+        self.np = np
+        self.columns = columns
+        self.size = len(next(iter(columns.values()))) if columns else 0
+        self._arrays: Dict[str, Any] = {}
+
+    def column(self, key: str):
+        array = self._arrays.get(key)
+        if array is None:
+            array = self._arrays[key] = self.masked(self.columns[key])
+        return array
+
+    def masked(self, values):
+        """Masked array of `values`, None being masked."""
+        return masked_values(self.np, values)
+
+    def constant(self, value):
+        np = self.np
+        if value is None:
+            return np.ma.masked_all(self.size, dtype=float)
+        return np.ma.asarray(np.full(self.size, value))
+
+
+BatchEvaluator = Callable[[ColumnBatch], Any]
+
+
+def _batch_operand(value: Operand, owner: str, dialect: Dialect = ORACLE) -> BatchEvaluator:
+    if isinstance(value, DBColumnReference):
+        key = column_key(value.table, value.column)
+        return lambda batch: batch.column(key)
+    if isinstance(value, FunctionCall):
+        return _batch_function(value.function, owner, dialect=dialect)
+    if isinstance(value, Expression):
+        return _batch_expression(value, owner, dialect)
+    return lambda batch: batch.constant(value)
+
+
+def _batch_divide(np, left, right):
+    if np.any(np.ma.filled(right, 1) == 0):
+        raise ZeroDivisionError("division by zero")
+    return np.ma.true_divide(left, right)
+
+
+def _batch_integer_divide(np, left, right):
+    if left.dtype.kind in "iu" and right.dtype.kind in "iu":
+        if np.any(np.ma.filled(right, 1) == 0):
+            raise ZeroDivisionError("division by zero")
+        quotient = np.ma.floor_divide(np.ma.abs(left), np.ma.abs(right))
+        return np.ma.where((left < 0) != (right < 0), -quotient, quotient)
+    return _batch_divide(np, left, right)
+
+
+_BATCH_ARITHMETIC = {
+    ArithmeticOperator.ADD: lambda np, a, b: a + b,
+    ArithmeticOperator.SUBTRACT: lambda np, a, b: a - b,
+    ArithmeticOperator.MULTIPLY: lambda np, a, b: a * b,
+    ArithmeticOperator.DIVIDE: _batch_divide,
+}
+
+
+def _batch_expression(expression: Expression, owner: str, dialect: Dialect = ORACLE) -> BatchEvaluator:
+    apply = _BATCH_ARITHMETIC[expression.operator]
+    if expression.operator is ArithmeticOperator.DIVIDE and dialect.integer_division:
+        apply = _batch_integer_divide
+    left, right = _batch_operand(expression.left, owner, dialect), _batch_operand(expression.right, owner, dialect)
+    return lambda batch: apply(batch.np, left(batch), right(batch))
+
+
+def _elementwise(sql_function: SqlFunction):
+    """Vector form of a function without one: `scalar` applied to every row of the batch."""
+    scalar, strict = sql_function.scalar, sql_function.strict
+
+    def apply(batch: ColumnBatch, arrays):
+        columns = [array.tolist(None) for array in arrays]  # masked values become None
+        results = []
+        for values in zip(*columns):
+            results.append(None if strict and None in values else scalar(*values))
+        return batch.masked(results)
+    return apply
+
+
+def _batch_function(function: Function, owner: str, column: Optional[str] = None,
+                    dialect: Dialect = ORACLE) -> BatchEvaluator:
+    arguments = _function_arguments(function, owner, column)
+    sql_function = lookup_function(function, len(arguments))
+    values = [_batch_operand(argument, owner, dialect) for argument in arguments]
+    if sql_function.vector is not None:
+        vector = sql_function.vector
+        return lambda batch: vector(batch.np, *[value(batch) for value in values])
+    elementwise = _elementwise(sql_function)
+    return lambda batch: elementwise(batch, [value(batch) for value in values])
+
+
+def _batch_condition(condition: Condition, owner: str) -> Callable[[ColumnBatch], Any]:
+    """Boolean array of a `CASE` condition; unknown (a NULL compared) is False."""
+    predicate = compile_condition(condition, owner)
+    return lambda batch: predicate.mask_of(batch.np, batch.column, batch.size)
+
+
+def _batch_case(branches: Sequence[CaseExpression], owner: str, dialect: Dialect = ORACLE) -> BatchEvaluator:
+    compiled = [
+        (_batch_condition(branch.when, owner), _batch_operand(branch.then, owner, dialect)) for branch in branches
+    ]
+    fallback_value = _case_fallback(branches)
+    fallback = _batch_operand(fallback_value, owner, dialect)
+
+    def case(batch: ColumnBatch):
+        np = batch.np
+        thens = [(predicate(batch), then(batch)) for predicate, then in compiled]
+        result = fallback(batch) if fallback_value is not None else np.ma.masked_all(batch.size, dtype=thens[0][1].dtype)
+        # the first matching branch wins: apply them from the last one
+        for taken, then in reversed(thens):
+            result = np.ma.where(taken, then, result)
+        return result
+    return case
+
+
+def compile_attribute_batch(field: TableAttribute, owner: str,
+                            dialect: Dialect = ORACLE) -> Callable[[Mapping[str, Any]], Any]:
+    """
+    Batch form of `compile_attribute`: evaluates the attribute on columns `{"table.column": values}`
+    and returns a masked array, NULL results being masked.
+    """
+    if field.function:
+        evaluate = _batch_function(field.function, owner, field.attNamedb, dialect=dialect)
+    elif field.expression:
+        evaluate = _batch_expression(field.expression, owner, dialect)
+    elif field.case_expression:
+        evaluate = _batch_case(field.case_expression, owner, dialect)
+    else:
+        evaluate = _batch_operand(DBColumnReference(table=owner, column=field.attNamedb), owner, dialect)
+
+    def run(columns: Union[Mapping[str, Any], ColumnBatch]):
+        batch = columns if isinstance(columns, ColumnBatch) else ColumnBatch(_numpy(), columns)
+        return evaluate(batch)
+    return run
+
+
+class DerivedAttributes:
+    """
+    Evaluators of mapped attributes of a spec, computed from the columns they are derived from.
+
+    **Example**
+
+    ```python
+    derived = DerivedAttributes(spec, ["duration", "stable"])
+    derived.evaluate({"fills.stop_time": stop, "fills.start_time": start, "fills.stable_beams": 1})
+    derived.evaluate_batch({"fills.stop_time": stops, "fills.start_time": starts, "fills.stable_beams": flags})
+    ```
+    """
+
+    def __init__(self, spec: ResourceToDbMappingSpec, names: Optional[Sequence[str]] = None,
+                 dialect: Dialect = ORACLE):
+        """
+        `names` defaults to every attribute that can be evaluated on a row; `dialect`
+        is the one of the `QueryCompiler` serving the same attributes from the database.
+        """
+        self.dialect = dialect
+        index = spec.mapping_index
+        self.fields: Dict[str, Any] = {}
+        for name in index.resource_names if names is None else names:
+            if name not in index.attributes:
+                raise ExpressionError(f"Attribute '{name}' is not mapped")
+            field, table = index.attributes[name]
+            owner = spec.resourceToDbMapper.masterTable if table is None else table.namedb
+            try:
+                if table is not None and table.relation == "asSubselect":
+                    raise ExpressionError(f"Attribute '{name}' is computed by a subselect and cannot be evaluated on a row")
+                if is_aggregate(field):
+                    raise ExpressionError(f"Attribute '{name}' is aggregated and cannot be evaluated on a row")
+                compile_attribute(field, owner, dialect)
+            except ExpressionError:
+                if names is not None:
+                    raise
+                continue
+            self.fields[name] = (field, owner)
+        self._row = {name: compile_attribute(field, owner, dialect) for name, (field, owner) in self.fields.items()}
+        self._batch = None
+
+    def evaluate(self, row: Row) -> Dict[str, Any]:
+        """The attributes computed from one row `{"table.column": value}`."""
+        return {name: evaluate(row) for name, evaluate in self._row.items()}
+
+    def evaluate_batch(self, columns: Mapping[str, Any]) -> Dict[str, Any]:
+        """The attributes computed from columns `{"table.column": values}`, as masked arrays."""
+        if self._batch is None:
+            self._batch = {
+                name: compile_attribute_batch(field, owner, self.dialect) for name, (field, owner) in self.fields.items()
+            }
+        batch = ColumnBatch(_numpy(), columns)
+        return {name: evaluate(batch) for name, evaluate in self._batch.items()}
@@ -0,0 +1,135 @@
+"""
+Join graph of the additional tables of a mapper.
+
+Every `AdditionalTable` is joined to its `relationTable`, the master table or
+another additional table. The `JoinGraph` resolves those references once:
+each table gets its parent and its depth (the master table being at depth 0),
+and the tables are listed in a topological order in which every table comes
+after the table it is joined to. Dangling references, duplicate table names
+and cycles are reported as `JoinGraphError`.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import (
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Sequence,
+    Set,
+    Tuple
+)
+
+
+class JoinGraphError(ValueError):
+    """Raised when the additional tables do not form a tree rooted at the master table."""
+
+    def __init__(self, errors: Sequence[str]):
+        self.errors = list(errors)
+        super().__init__("\n".join(self.errors))
+
+
+@dataclass(frozen=True)
+class JoinGraph:
+    """
+    Resolved join tree of a mapper.
+
+    - `order`: the additional tables, parents before children; tables already
+      declared after their `relationTable` keep their declaration order.
+    - `parents`: the `relationTable` of each additional table.
+    - `depth`: the number of joins between each table and the master table.
+    - `children`: the tables joined to each table, in `order`.
+
+    The graph is shared by every user of the spec: the mappings are read-only views.
+    """
+    master: str
+    order: Tuple[str, ...]
+    parents: Mapping[str, str]
+    depth: Mapping[str, int]
+    children: Mapping[str, Tuple[str, ...]]
+
+    def __post_init__(self):
+        for name in ("parents", "depth", "children"):
+            object.__setattr__(self, name, MappingProxyType(dict(getattr(self, name))))
+
+    def __reduce__(self):
+        # mapping proxies cannot be pickled: the graph is rebuilt from plain dicts
+        return type(self), (self.master, self.order, dict(self.parents), dict(self.depth), dict(self.children))
+
+    @classmethod
+    def build(cls, master: str, tables: Iterable) -> "JoinGraph":
+        """Resolve the `namedb` → `relationTable` links of `tables`, the additional tables of a mapper."""
+        errors: List[str] = []
+        parents: Dict[str, str] = {}
+        for table in tables:
+            if table.namedb == master or table.namedb in parents:
+                errors.append(
+                    f"Duplicate table name '{table.namedb}' in additionalTables: "
+                    f"the `namedb` of a table is its alias and must be unique")
+                continue
+            parents[table.namedb] = table.relationTable
+        for name, parent in parents.items():
+            if parent != master and parent not in parents:
+                errors.append(
+                    f"The relationTable '{parent}' of table '{name}' is neither the masterTable "
+                    f"'{master}' nor the `namedb` of another table in additionalTables")
+        if errors:
+            raise JoinGraphError(errors)
+
+        depth: Dict[str, int] = {master: 0}
+        order: List[str] = []
+        for name in parents:
+            # walk up to the first resolved ancestor, then resolve the path top-down
+            path: List[str] = []
+            on_path: Set[str] = set()
+            node = name
+            while node not in depth:
+                if node in on_path:
+                    cycle = path[path.index(node):] + [node]
+                    errors.append("Cyclic join between additionalTables: " + " -> ".join(cycle))
+                    break
+                path.append(node)
+                on_path.add(node)
+                node = parents[node]
+            else:
+                for node in reversed(path):
+                    depth[node] = depth[parents[node]] + 1
+                    order.append(node)
+                continue
+            # mark the tables of a cycle so they are reported once
+            for node in path:
+                depth.setdefault(node, -1)
+        if errors:
+            raise JoinGraphError(errors)
+
+        children: Dict[str, List[str]] = {master: []}
+        for name in order:
+            children.setdefault(name, [])
+            children[parents[name]].append(name)
+        return cls(
+            master=master,
+            order=tuple(order),
+            parents=parents,
+            depth=depth,
+            children={name: tuple(kids) for name, kids in children.items()},
+        )
+
+    def path(self, name: str) -> Tuple[str, ...]:
+        """The tables `name` is joined through, from the master table down to `name` itself."""
+        path = []
+        while name != self.master:
+            path.append(name)
+            name = self.parents[name]
+        path.append(self.master)
+        return tuple(reversed(path))
+
+    def closure(self, names: Iterable[str]) -> Set[str]:
+        """`names` plus every table they are joined through; each table is visited once."""
+        required: Set[str] = set()
+        for name in names:
+            while name not in required and name in self.depth:
+                required.add(name)
+                if name == self.master:
+                    break
+                name = self.parents[name]
+        return required
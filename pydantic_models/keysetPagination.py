@@ -0,0 +1,183 @@
+"""
+Keyset (seek) pagination.
+
+With `pagination: keyset`, a page is not addressed by an OFFSET but by the
+sort values of the last row of the previous page, carried in an opaque cursor
+token. The next page is then read with a predicate such as
+`WHERE (k1, k2) > (:k0, :k1)`, which the database answers from an index
+instead of scanning and discarding every preceding row.
+
+The sort columns are the `defaultSort.fields` (or the sort of the request)
+followed by the `isKey` attributes of the Resource, which make the order
+total. The predicate honors the `order` and `nulls` of the sort.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import (
+    Any,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from .projection import key_attributes
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+
+
+class KeysetCursorError(ValueError):
+    """Raised when a cursor token is malformed or was issued for another sort."""
+
+
+@dataclass(frozen=True)
+class KeysetColumn:
+    """One column of the keyset order, with its null placement resolved."""
+    attribute: str
+    descending: bool
+    nulls_first: bool
+    nullable: bool = True
+
+    @property
+    def order_by(self) -> str:
+        return f"{'DESC' if self.descending else 'ASC'} NULLS {'FIRST' if self.nulls_first else 'LAST'}"
+
+
+def keyset_columns(spec: ResourceToDbMappingSpec,
+                   sort: Optional[Sequence[Tuple[str, str]]] = None) -> Tuple[KeysetColumn, ...]:
+    """
+    The total order used to paginate `spec`: the sort items followed by the
+    `isKey` attributes not already sorted on.
+
+    The `nulls` of the `defaultSort` only applies to it. Without one, and for
+    the sort of a request, nulls are placed as Oracle and PostgreSQL do by
+    default: last in ascending order, first in descending order.
+    """
+    default = spec.resourceToDbMapper.defaultSort
+    nulls = None
+    if sort is None:
+        sort = [(name, default.order or "asc") for name in default.fields] if default else []
+        nulls = default.nulls if default else None
+    keys = key_attributes(spec)
+    key_order = sort[-1][1] if sort else "asc"
+
+    items = list(sort) + [(name, key_order) for name in keys if name not in dict(sort)]
+    columns = []
+    for name, order in items:
+        descending = order == "desc"
+        nulls_first = nulls == "first" if nulls else descending
+        columns.append(KeysetColumn(name, descending, nulls_first, nullable=name not in keys))
+    return tuple(columns)
+
+
+# ---- cursor tokens ----
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, time):
+        return {"$t": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$dec": str(value)}
+    if isinstance(value, (bytes, bytearray)):
+        return {"$b": base64.b64encode(value).decode("ascii")}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and len(value) == 1:
+        (tag, raw), = value.items()
+        if tag == "$dt":
+            return datetime.fromisoformat(raw)
+        if tag == "$d":
+            return date.fromisoformat(raw)
+        if tag == "$t":
+            return time.fromisoformat(raw)
+        if tag == "$dec":
+            return Decimal(raw)
+        if tag == "$b":
+            return base64.b64decode(raw)
+    return value
+
+
+def encode_cursor(columns: Sequence[KeysetColumn], values: Sequence[Any]) -> str:
+    """Opaque token holding the keyset `values` of the last row of a page."""
+    payload = {"k": [column.attribute for column in columns], "v": [_encode_value(v) for v in values]}
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(columns: Sequence[KeysetColumn], token: str) -> List[Any]:
+    """Keyset values held by `token`; the token must have been issued for the same `columns`."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        attributes, values = payload["k"], payload["v"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as exc:
+        raise KeysetCursorError(f"Malformed cursor token: {exc}") from None
+    if attributes != [column.attribute for column in columns] or len(values) != len(columns):
+        raise KeysetCursorError("The cursor token was issued for a different sort order")
+    return [_decode_value(value) for value in values]
+
+
+def cursor_from_row(columns: Sequence[KeysetColumn], row: Mapping[str, Any]) -> str:
+    """Cursor token pointing after `row`, a record holding every keyset attribute."""
+    return encode_cursor(columns, [row[column.attribute] for column in columns])
+
+
+# ---- predicate ----
+
+def keyset_param(index: int) -> str:
+    return f"rrml_k{index}"
+
+
+def keyset_predicate(columns: Sequence[KeysetColumn], expressions: Sequence[str],
+                     null_mask: Sequence[bool], param, row_values: bool = False) -> str:
+    """
+    Predicate selecting the rows that come after the cursor in the keyset order.
+
+    `null_mask` tells which cursor values are NULL; it is part of the statement
+    shape as NULLs are compared with `IS NULL` rather than bound. `param`
+    renders the placeholder of a bind name. When every column is non-nullable,
+    sorted in the same direction and `row_values` is supported by the dialect,
+    the compact `(k1, k2) > (:k0, :k1)` form is used.
+    """
+    if (row_values and len(columns) > 1 and not any(null_mask)
+            and not any(column.nullable for column in columns)
+            and len({column.descending for column in columns}) == 1):
+        operator = "<" if columns[0].descending else ">"
+        placeholders = ", ".join(param(keyset_param(i)) for i in range(len(columns)))
+        return f"({', '.join(expressions)}) {operator} ({placeholders})"
+
+    def equal(i: int) -> str:
+        if null_mask[i]:
+            return f"{expressions[i]} IS NULL"
+        return f"{expressions[i]} = {param(keyset_param(i))}"
+
+    def after(i: int) -> Optional[str]:
+        column, expression = columns[i], expressions[i]
+        if null_mask[i]:
+            # nothing but non-null values can follow a NULL, and only when nulls come first
+            return f"{expression} IS NOT NULL" if column.nulls_first else None
+        comparison = f"{expression} {'<' if column.descending else '>'} {param(keyset_param(i))}"
+        if column.nullable and not column.nulls_first:
+            return f"({comparison} OR {expression} IS NULL)"
+        return comparison
+
+    branches = []
+    for i in range(len(columns)):
+        tail = after(i)
+        if tail is None:
+            continue
+        branches.append(" AND ".join([equal(j) for j in range(i)] + [tail]))
+    if not branches:
+        return "1 = 0"
+    if len(branches) == 1:
+        return branches[0]
+    return "(" + " OR ".join(f"({branch})" for branch in branches) + ")"
@@ -0,0 +1,220 @@
+"""
+Dependency analysis of a `ResourceToDbMapper`.
+
+Finds which database tables and columns every mapped resource attribute,
+relation key and condition references, including the transitive chain of
+`relationTable`s an additional table is joined through. With it, a query can
+leave out the joins that affect neither the projected columns nor the number
+of rows returned.
+
+A join may only be left out when it cannot change the row cardinality:
+
+- `innerJoin` and `rightJoin` tables are always kept, as they filter or add rows.
+- `leftJoin` tables are dropped only when `uniqueKeys` declares that their
+  relation keys match at most one row.
+- `asSubselect` tables are dropped when their subselect is grouped by the
+  relation keys, or when `uniqueKeys` is set.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union
+)
+
+from .joinGraph import JoinGraph
+from .queryBuilderObjModel import (
+    AdditionalTable,
+    CaseExpression,
+    Condition,
+    DBColumnReference,
+    Expression,
+    Function,
+    FunctionCall,
+    Regex,
+    ResourceToDbMappingSpec,
+    TableAttribute
+)
+
+# Functions that collapse the rows of a group; a subselect using one of them is grouped by its relation keys
+AGGREGATE_FUNCTIONS = frozenset({
+    "avg", "count", "listagg", "max", "median", "min", "stddev", "string_agg", "sum", "variance"
+})
+
+ColumnRef = Tuple[str, str]  # (table, column)
+
+
+def is_aggregate(field: TableAttribute) -> bool:
+    return field.function is not None and field.function.name.lower() in AGGREGATE_FUNCTIONS
+
+
+def is_grouped_subselect(table: AdditionalTable) -> bool:
+    """True when an `asSubselect` table is grouped by its relation keys, i.e. yields one row per key."""
+    return table.relation == "asSubselect" and any(
+        is_aggregate(field) or field.sort is not None for field in table.fields or []
+    )
+
+
+def mapped_attributes(spec: ResourceToDbMappingSpec) -> Mapping[str, Tuple[TableAttribute, Optional[AdditionalTable]]]:
+    """
+    Map every `attNameResource` to its `TableAttribute` and the additional table owning it (None for the master table).
+    The mapping is read-only: it is the index shared by every compile of the spec.
+    """
+    if spec.mapping_index is not None:
+        return spec.mapping_index.attributes
+    mapper = spec.resourceToDbMapper
+    mapping: Dict[str, Tuple[TableAttribute, Optional[AdditionalTable]]] = {}
+    for field in mapper.fields or []:
+        mapping.setdefault(field.attNameResource, (field, None))
+    for table in mapper.additionalTables or []:
+        for field in table.fields or []:
+            mapping.setdefault(field.attNameResource, (field, table))
+    return MappingProxyType(mapping)
+
+
+# ---- column references ----
+
+def operand_refs(value) -> Iterator[ColumnRef]:
+    if isinstance(value, DBColumnReference):
+        yield value.table, value.column
+    elif isinstance(value, FunctionCall):
+        yield from function_refs(value.function)
+    elif isinstance(value, Expression):
+        yield from operand_refs(value.left)
+        yield from operand_refs(value.right)
+
+
+def function_refs(function: Function) -> Iterator[ColumnRef]:
+    for param in function.params or []:
+        yield from operand_refs(param)
+
+
+def condition_refs(condition: Union[Condition, Regex], owner: str) -> Iterator[ColumnRef]:
+    table = getattr(condition, "table", None)
+    yield table or owner, condition.column
+
+
+def case_refs(branches: Iterable[CaseExpression], owner: str) -> Iterator[ColumnRef]:
+    for branch in branches:
+        yield from condition_refs(branch.when, owner)
+        yield from operand_refs(branch.then)
+        yield from operand_refs(branch.else_)
+
+
+def attribute_refs(field: TableAttribute, owner: str) -> Iterator[ColumnRef]:
+    """Every database column a mapped attribute reads, directly or through functions, expressions and CASE operands."""
+    if field.attNamedb:
+        yield owner, field.attNamedb
+    if field.function:
+        yield from function_refs(field.function)
+    if field.expression:
+        yield from operand_refs(field.expression)
+    if field.case_expression:
+        yield from case_refs(field.case_expression, owner)
+    if field.sort:
+        yield owner, field.sort.by
+
+
+def join_refs(table: AdditionalTable) -> Iterator[ColumnRef]:
+    """Every column the join of an additional table reads: its relation keys and its conditions."""
+    for key in table.relationKeys:
+        yield table.relationTable, key.targetKey or key.tableKey
+        yield table.namedb, key.tableKey
+        if key.regex:
+            yield table.namedb, key.regex.column
+    for condition in table.conditions or []:
+        yield from condition_refs(condition, table.namedb)
+
+
+# ---- table dependencies ----
+
+@dataclass(frozen=True)
+class MappingDependencies:
+    """
+    Table-level dependencies of a mapper.
+
+    - `attribute_tables`: the tables each resource attribute reads.
+    - `join_tables`: the tables the join of each additional table reads, its `relationTable` included.
+    - `graph`: the join tree, giving the order in which the tables are joined.
+    """
+    master: str
+    graph: JoinGraph
+    tables: Dict[str, AdditionalTable]
+    attribute_tables: Dict[str, FrozenSet[str]]
+    join_tables: Dict[str, FrozenSet[str]]
+    group_by_tables: FrozenSet[str]
+
+    @classmethod
+    def from_spec(cls, spec: ResourceToDbMappingSpec) -> "MappingDependencies":
+        mapper = spec.resourceToDbMapper
+        master = mapper.masterTable
+        graph = spec.join_graph or JoinGraph.build(master, mapper.additionalTables or [])
+        declared = {table.namedb: table for table in mapper.additionalTables or []}
+        tables = {name: declared[name] for name in graph.order}
+
+        attribute_tables = {}
+        for name, (field, table) in mapped_attributes(spec).items():
+            owner = table.namedb if table else master
+            attribute_tables[name] = frozenset(ref_table for ref_table, _ in attribute_refs(field, owner))
+
+        join_tables = {
+            name: frozenset(ref_table for ref_table, _ in join_refs(table)) - {name}
+            for name, table in tables.items()
+        }
+
+        group_by_tables: Set[str] = set()
+        for item in mapper.groupBy or []:
+            for field in mapper.fields or []:
+                if field.attNamedb == item:
+                    group_by_tables.add(master)
+            for table in tables.values():
+                if table.relation != "asSubselect" and any(f.attNamedb == item for f in table.fields or []):
+                    group_by_tables.add(table.namedb)
+
+        return cls(master, graph, tables, attribute_tables, join_tables, frozenset(group_by_tables))
+
+    def is_prunable(self, name: str) -> bool:
+        """True when leaving the join of `name` out cannot change the rows returned."""
+        table = self.tables[name]
+        if table.relation == "leftJoin":
+            return bool(table.uniqueKeys)
+        if table.relation == "asSubselect":
+            return bool(table.uniqueKeys) or is_grouped_subselect(table)
+        return False
+
+    def closure(self, names: Iterable[str]) -> Set[str]:
+        """`names` plus every table their joins depend on, transitively."""
+        required: Set[str] = set()
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name in required:
+                continue
+            required.add(name)
+            pending.extend(self.join_tables.get(name, ()))
+        return required
+
+    def required_tables(self, attributes: Iterable[str]) -> Set[str]:
+        """Tables needed to evaluate `attributes`, including the chain of tables they are joined through."""
+        direct = set(self.group_by_tables)
+        for attribute in attributes:
+            direct |= self.attribute_tables.get(attribute, frozenset())
+        return self.closure(direct)
+
+    def tables_to_join(self, attributes: Iterable[str]) -> List[str]:
+        """
+        Additional tables to join for a query using `attributes` (projected,
+        filtered or sorted), parents before children. Tables that are not
+        needed are left out, unless dropping them could change the row count.
+        """
+        kept = self.required_tables(attributes)
+        kept |= self.closure(name for name in self.tables if not self.is_prunable(name))
+        return [name for name in self.graph.order if name in kept]
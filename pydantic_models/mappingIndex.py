@@ -0,0 +1,77 @@
+"""
+Hashed indexes of a Resource and its ResourceToDbMapper.
+
+`validate_model` builds a `MappingIndex` in one pass over the resource
+attributes and the mapped fields, and checks every cross reference against it
+with constant-time lookups. The index is kept on the validated spec as
+`mapping_index` so that the SQL compiler, the projection and the keyset
+pagination do not have to search the field lists again.
+"""
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    Mapping,
+    Optional,
+    Tuple
+)
+
+# (TableAttribute, AdditionalTable owning it or None for the master table)
+FieldMapping = Tuple[Any, Optional[Any]]
+
+
+@dataclass(frozen=True)
+class MappingIndex:
+    """
+    - `resource_names`: the resource attribute names, in the order of `Resource.fields`.
+    - `resource_name_set`: the same names, for membership tests.
+    - `keys`: the `isKey` attribute names.
+    - `mappings`: every mapped field with its table, master table fields first.
+    - `attributes`: the first mapping of each `attNameResource`.
+    - `attnamedb_functions`: the function applied to each `attNamedb`, None when it is not aggregated.
+
+    The index is shared by every compile of the spec: the mappings are read-only views.
+    """
+    resource_names: Tuple[str, ...]
+    resource_name_set: FrozenSet[str]
+    keys: Tuple[str, ...]
+    mappings: Tuple[FieldMapping, ...]
+    attributes: Mapping[str, FieldMapping]
+    attnamedb_functions: Mapping[str, Any]
+
+    def __post_init__(self):
+        for name in ("attributes", "attnamedb_functions"):
+            object.__setattr__(self, name, MappingProxyType(dict(getattr(self, name))))
+
+    def __reduce__(self):
+        # mapping proxies cannot be pickled: the index is rebuilt from plain dicts
+        return type(self), (
+            self.resource_names, self.resource_name_set, self.keys, self.mappings,
+            dict(self.attributes), dict(self.attnamedb_functions),
+        )
+
+    @classmethod
+    def build(cls, resource, mapper) -> "MappingIndex":
+        resource_names = tuple(field.name for field in resource.fields)
+        keys = tuple(field.name for field in resource.fields if field.isKey)
+
+        mappings = [(field, None) for field in mapper.fields or []]
+        for table in mapper.additionalTables or []:
+            mappings.extend((field, table) for field in table.fields or [])
+
+        attributes: Dict[str, FieldMapping] = {}
+        attnamedb_functions: Dict[str, Any] = {}
+        for field, table in mappings:
+            attributes.setdefault(field.attNameResource, (field, table))
+            if field.attNamedb:
+                attnamedb_functions[field.attNamedb] = field.function
+        return cls(
+            resource_names=resource_names,
+            resource_name_set=frozenset(resource_names),
+            keys=keys,
+            mappings=tuple(mappings),
+            attributes=attributes,
+            attnamedb_functions=attnamedb_functions,
+        )
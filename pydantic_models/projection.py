@@ -0,0 +1,73 @@
+"""
+Sparse fieldsets: projection of a resource down to the attributes a request asks for.
+
+A REST request may ask for a subset of the attributes of a resource with
+`fields=name,start_run`. `expand_fieldset` gives the attributes answering
+such a fieldset: the requested attributes plus the `isKey` attributes, which
+are always returned so that every record stays identifiable. The SQL
+compiler selects only those and joins only the tables they read, including
+the columns pulled in indirectly through an `Expression`, the `params` of a
+`Function` or the operands of a `CaseExpression` (see `mappingDependencies`).
+"""
+from typing import (
+    Iterable,
+    Optional,
+    Set,
+    Tuple
+)
+
+from .mappingDependencies import attribute_refs, join_refs
+from .queryBuilderObjModel import AdditionalTable, ResourceToDbMappingSpec
+
+
+class FieldSelectionError(ValueError):
+    """Raised when a fieldset references attributes the resource does not define."""
+
+
+def parse_fieldset(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Parse the `fields=a,b,c` query parameter; an empty or missing value selects every attribute."""
+    if value is None:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    return names or None
+
+
+def key_attributes(spec: ResourceToDbMappingSpec) -> Tuple[str, ...]:
+    if spec.mapping_index is not None:
+        return spec.mapping_index.keys
+    return tuple(field.name for field in spec.resource.fields if field.isKey)
+
+
+def expand_fieldset(spec: ResourceToDbMappingSpec, fields: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """
+    Resource attributes to select for `fields`: the requested ones plus the
+    `isKey` attributes, in the order of `Resource.fields`. All of them when
+    `fields` is None.
+    """
+    names = [field.name for field in spec.resource.fields]
+    if fields is None:
+        return tuple(names)
+    requested = set(fields)
+    unknown = sorted(requested.difference(names))
+    if unknown:
+        raise FieldSelectionError(
+            f"Unknown attribute(s) {unknown} in `fields` of resource '{spec.resource.resource_name}'. "
+            f"The existing resource attribute names are: {names}"
+        )
+    requested.update(key_attributes(spec))
+    return tuple(name for name in names if name in requested)
+
+
+def subselect_columns(table: AdditionalTable, attributes: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Columns of an `asSubselect` table its derived table must read to compute
+    `attributes` and to join back: the referenced columns plus the relation keys.
+    """
+    columns: Set[str] = set()
+    selected = set(attributes)
+    for field in table.fields or []:
+        if field.attNameResource in selected:
+            columns.update(column for ref_table, column in attribute_refs(field, table.namedb)
+                           if ref_table == table.namedb)
+    columns.update(column for ref_table, column in join_refs(table) if ref_table == table.namedb)
+    return tuple(sorted(columns))
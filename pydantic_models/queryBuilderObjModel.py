@@ -1,21 +1,29 @@
+import logging
 from typing import (
     Literal,
     Optional,
     List,
     Any,
+    FrozenSet,
     Union
 )
 from pydantic import (
     Field,
+    PrivateAttr,
     model_validator
 )
 from .typoDetectingModel import TypoDetectingModel
+from .joinGraph import JoinGraph, JoinGraphError
+from .mappingIndex import MappingIndex
+from .runtimeModel import Interner, RuntimeNode, compile_model
 from .resourceObjModel import Resource
 from .enum import (
     ArithmeticOperator,
     ComparisonOperator
     )
 
+logger = logging.getLogger(__name__)
+
 class SortingSubSelect(TypoDetectingModel):
     """
     Represents a **window function ordering** applied in a subselect.
@@ -406,6 +414,11 @@ class AdditionalTable(TypoDetectingModel):
     relationKeys: List[RelationKey] = Field(
         description="The names of the relation keys (columns) of the tables related" 
     )
+    uniqueKeys: Optional[bool] = Field(
+        description="Explicitly determine true if the relation keys match at most one row of the additional table. "
+        "A `leftJoin` table is only left out of the queries that do not use its attributes when its keys are unique",
+        default=None
+    )
     conditions: Optional[List[Union[Condition, Regex]]] = Field(
         description="A list of conditions to apply as filters",
         default=None
@@ -415,6 +428,35 @@ class AdditionalTable(TypoDetectingModel):
         default=None
     )
 
+class RowCountingOptions(TypoDetectingModel):
+    """
+    Tunes how the total number of rows of a resource query is counted.
+
+    **Example YAML**
+
+    ```yaml
+    rowCounting: "estimate"
+    rowCountingOptions:
+      limit: 10000
+    ```
+    corresponds to:
+    ```sql
+    SELECT COUNT(*) FROM (SELECT 1 FROM ... FETCH FIRST 10000 ROWS ONLY)
+    ```
+    """
+    ttl: Optional[int] = Field(
+        description="Seconds a count is kept per normalized filter with `rowCounting: cached`",
+        examples=[60],
+        gt=0,
+        default=None
+    )
+    limit: Optional[int] = Field(
+        description="Number of rows after which counting stops with `rowCounting: estimate`",
+        examples=[10000],
+        gt=0,
+        default=None
+    )
+
 class ResourceToDbMapper(TypoDetectingModel):
     resource_name: str = Field(
         description="The name of the resource. Needs to be associated with an existing resource",
@@ -448,11 +490,20 @@ class ResourceToDbMapper(TypoDetectingModel):
         description="Specifies the default sorting to the db resultset",
         default=None
     )
-    pagination: Literal["enabled", "disabled"] = Field(
-        description="Paginate the db resultset"
+    pagination: Literal["enabled", "disabled", "keyset"] = Field(
+        description="Paginate the db resultset. `enabled` pages with OFFSET/LIMIT, "
+        "`keyset` seeks after the last row of the previous page using the `defaultSort` fields and the `isKey` attributes"
+    )
+    rowCounting: Literal["enabled", "disabled", "window", "cached", "estimate"] = Field(
+        description="Counting of the rows from the db resultset. Options:<br>"
+            "- `enabled`: a separate COUNT query<br>"
+            "- `window`: COUNT(*) OVER() returned with the rows of the page (a separate COUNT query for keyset pages after the first)<br>"
+            "- `cached`: a separate COUNT query whose result is kept per filter for `rowCountingOptions.ttl` seconds<br>"
+            "- `estimate`: a separate COUNT query that stops after `rowCountingOptions.limit` rows"
     )
-    rowCounting: Literal["enabled", "disabled"] = Field(
-        description="Counting of the rows from the db resultset"
+    rowCountingOptions: Optional[RowCountingOptions] = Field(
+        description="Options of the `cached` and `estimate` row counting modes",
+        default=None
     )
 
 class ResourceToDbMappingSpec(TypoDetectingModel):
@@ -483,6 +534,34 @@ class ResourceToDbMappingSpec(TypoDetectingModel):
     resource: Resource = Field(
         description="The specification of the resource."
     )
+    _join_graph: Optional[JoinGraph] = PrivateAttr(default=None)
+    _mapping_index: Optional[MappingIndex] = PrivateAttr(default=None)
+    _dependent_tables: Optional[FrozenSet[str]] = PrivateAttr(default=None)
+
+    @property
+    def join_graph(self) -> JoinGraph:
+        """The resolved join tree of the additional tables, built during validation."""
+        return self._join_graph
+
+    @property
+    def mapping_index(self) -> MappingIndex:
+        """The hashed indexes of the resource attributes and mapped fields, built during validation."""
+        return self._mapping_index
+
+    @property
+    def dependent_tables(self) -> FrozenSet[str]:
+        """Every `schema.table` the results of this spec are read from, see `resultCache.dependent_tables`."""
+        if self._dependent_tables is None:
+            from .resultCache import dependent_tables
+            self._dependent_tables = dependent_tables(self)
+        return self._dependent_tables
+
+    def compile(self, interner: Optional[Interner] = None) -> RuntimeNode:
+        """
+        Frozen, `__slots__`-based copy of this spec with interned strings and
+        shared identical sub-trees, for read-only use at runtime. See `runtimeModel`.
+        """
+        return compile_model(self, interner)
 
     @model_validator(mode="after")
     @classmethod
@@ -517,6 +596,19 @@ class ResourceToDbMappingSpec(TypoDetectingModel):
            - If a `defaultSort` is defined, each item must correspond to a valid
              `attNameResource`.
 
+        6. Keyset pagination validation:
+           - With `pagination: keyset`, the `defaultSort` fields followed by the
+             `isKey` attributes must form a total order. The key attributes can
+             therefore not be NULL: they must be mapped to the master table or to
+             an `innerJoin` table, not through a CASE expression, and no table
+             may be joined with `rightJoin`.
+
+        7. Join graph validation:
+           - Every `additionalTables.relationTable` must be the `masterTable` or
+             the `namedb` of another additional table, each `namedb` must be
+             unique, and the joins must not form a cycle. The resolved graph is
+             kept as `join_graph`.
+
         Errors are aggregated and raised as a single ValueError, making it easier
         to spot multiple misconfigurations in one pass.
         """
@@ -534,24 +626,13 @@ class ResourceToDbMappingSpec(TypoDetectingModel):
                 f"does not match resource.resource_name (`{res_resource_name}`)"
             )
         
-        recource_fields = resource.fields
-        resource_field_names = [ field.name for field in recource_fields]
+        index = MappingIndex.build(resource, mapper)
+        resource_field_names = list(index.resource_names)
 
-        mapper_fields = mapper.fields
         additionalTable = mapper.additionalTables
-        
-        addTableFields = [] # Collect fields from additionalTables
-        if additionalTable:
-            for table in additionalTable:
-                addTableFields.extend(table.fields or [])
-
-        allFields = (mapper_fields or []) + addTableFields
-        print(f"all fields {allFields}" )
-        allFields_names = [ field.attNameResource for field in allFields]
-        print(f"allFields_names {allFields_names}" )
-        
-        print(f"mapper_fields {mapper_fields}" )
-        print(f"addTableFields {addTableFields}" )
+        allFields = [field for field, _ in index.mappings]
+        logger.debug("Validating resource '%s': %d attributes, %d mapped fields",
+                     res_resource_name, len(resource_field_names), len(allFields))
 
         if not allFields:
             errors.append(
@@ -561,26 +642,20 @@ class ResourceToDbMappingSpec(TypoDetectingModel):
 
         groupBy = mapper.groupBy
         defaultSort = mapper.defaultSort
-        allowed_fields_attNamedb = {} # Collect all allowed attNamedb from primary fields
-        allowed_fields_attNameResource= [] # Collect all allowed attNameResource from primary fields
 
         for field in allFields:
             # check if attNameResource values match any attributes in the resource file
-            if field.attNameResource not in resource_field_names:
+            if field.attNameResource not in index.resource_name_set:
                 errors.append(
                     f"The '{field.attNameResource}' is not a valid and existing resource attribute name 'attNameResource'. It is not specified in the relative Resource yaml file.\n"
                     + f"The existing resource attribute names are: {resource_field_names}"
                 )
 
             attResource = field.attNameResource
-            allowed_fields_attNameResource.append(attResource)
-
             att = field.attNamedb
             case_expression = field.case_expression
             expression = field.expression
             function = field.function
-            if att:
-                allowed_fields_attNamedb[att] = function # function may be None
             if not att and not case_expression and not expression and not function:
                 errors.append(
                     f"The resource attribute `{attResource}` is not properly mapped to any valid data source\n"
@@ -590,7 +665,7 @@ class ResourceToDbMappingSpec(TypoDetectingModel):
 
          # Validation for proper mapping of all predefined resource attribute names
         for field in resource_field_names:
-            if field not in allFields_names:
+            if field not in index.attributes:
                 errors.append(
                     f"The resource attribute '{field}' is not properly mapped to any valid data source.\n"
                     + f"The existing resource attribute names are: {resource_field_names}\n"
@@ -599,8 +674,9 @@ class ResourceToDbMappingSpec(TypoDetectingModel):
         # Validation for groubBy list. If an item does not exist in select list as attribute(`attNamedb`) or aggregated function, then raise error. 
         # The items of the list need to have the same naming as the `attNamedb`
         if groupBy:
-            for att_name, func in allowed_fields_attNamedb.items():
-                if att_name not in groupBy and func is None:
+            group_by_items = set(groupBy)
+            for att_name, func in index.attnamedb_functions.items():
+                if att_name not in group_by_items and func is None:
                     errors.append(
                         f"Invalid reference of attribute: '{att_name}' in fields: It must be defined either in the `group by` segment or used within an aggregation function.")
         
@@ -608,11 +684,42 @@ class ResourceToDbMappingSpec(TypoDetectingModel):
         # The items of the list need to have the same naming as the `attNameResource`
         if defaultSort:
             for att_name in defaultSort.fields:
-                if att_name not in allowed_fields_attNameResource:
+                if att_name not in index.attributes:
                     errors.append(
                         f"Invalid reference of attribute: '{att_name}' in defaultSort.fields: There is no attribute with this name in the `attNameResource` fields.")
-                        
+
+        # Validation for keyset pagination. The sort columns followed by the `isKey` attributes must form a total order,
+        # which NULL key values would break
+        if mapper.pagination == "keyset":
+            for table in additionalTable or []:
+                if table.relation == "rightJoin":
+                    errors.append(
+                        f"Keyset pagination cannot be used with the `rightJoin` of table '{table.namedb}': "
+                        f"the key attributes of the master table may be NULL")
+            for key_name in index.keys:
+                field, table = index.attributes.get(key_name, (None, None))
+                if field is None:
+                    continue
+                relation = table.relation if table else "masterTable"
+                if relation not in ("masterTable", "innerJoin"):
+                    errors.append(
+                        f"Keyset pagination requires the `isKey` attribute '{key_name}' to be mapped to the master table "
+                        f"or to an `innerJoin` table, not through a `{relation}`: NULL keys cannot form a total order")
+                elif field.case_expression and all(branch.else_ is None for branch in field.case_expression):
+                    errors.append(
+                        f"Keyset pagination requires the `isKey` attribute '{key_name}' to be non-null: "
+                        f"its CASE expression has no `else` branch")
+
+        # Validation of the join graph: every table must be joined, directly or through other tables, to the master table
+        join_graph = None
+        try:
+            join_graph = JoinGraph.build(mapper.masterTable, additionalTable or [])
+        except JoinGraphError as exc:
+            errors.extend(exc.errors)
+
         if errors:
             raise ValueError(f"{len(errors)} errors raised:\n - " + "\n - ".join(errors))
+        model_instance._join_graph = join_graph
+        model_instance._mapping_index = index
 
         return model_instance
\ No newline at end of file
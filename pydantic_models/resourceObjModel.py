@@ -1,20 +1,23 @@
 import re
 from .enum import FieldType
 from .typoDetectingModel import TypoDetectingModel
+from .rowDecoder import DecoderCache, RowDecoder
 
 from typing import (
     Literal,
     Optional,
     List,
     Any,
-    Annotated
+    Annotated,
+    Sequence
 )
 from pydantic import (
     Field,
     field_validator,
     model_validator,
     ValidationInfo,
-    AfterValidator
+    AfterValidator,
+    PrivateAttr
 )
 
 # todo raise error if there not at all in the model instance the isKey field ** done
@@ -105,6 +108,26 @@ class Resource(TypoDetectingModel):
         description="List of the attributes of the resource",
         min_items=1
     )
+    _decoders: DecoderCache = PrivateAttr(default_factory=DecoderCache)
+    _meta_block: Optional[bytes] = PrivateAttr(default=None)
+
+    def row_decoder(self, columns: Optional[Sequence[str]] = None) -> RowDecoder:
+        """Decoder of fetched rows of `columns` (every attribute by default), built once per column layout."""
+        key = None if columns is None else tuple(columns)
+        decoder = self._decoders.get(key)
+        if decoder is None:
+            decoder = self._decoders[key] = RowDecoder(self, key)
+        return decoder
+
+    @property
+    def meta_block(self) -> Optional[bytes]:
+        """The JSON-encoded metadata of the attributes sent with every response, None unless `hasMeta` is true."""
+        if not self.hasMeta:
+            return None
+        if self._meta_block is None:
+            from .responseSerializer import encode_meta
+            self._meta_block = encode_meta(self)
+        return self._meta_block
 
     @model_validator(mode="after")
     @classmethod
@@ -0,0 +1,214 @@
+"""
+Streaming JSON serialization of resource query results.
+
+`ResponseSerializer` encodes rows as a generator of byte chunks, so that a
+large page or an export is written out while it is fetched, with a flat
+memory profile, instead of being buffered and encoded as a whole:
+
+- `ndjson`: one JSON record per line, optionally preceded by a header line
+  `{"resource_name": ..., "meta": ...}`.
+- `json_chunks`: a single JSON document
+  `{"resource_name": ..., "meta": ..., "data": [...], "count": ..., "cursor": ...}`
+  emitted `chunk_size` rows at a time, e.g. as the body of a chunked HTTP response.
+
+Both accept an iterable of rows, and `andjson` / `ajson_chunks` an async one
+such as `AsyncQueryExecutor.stream`. Rows are decoded with the resource's
+`RowDecoder` one chunk at a time.
+
+Decimals (e.g. Oracle NUMBER values) are written as JSON numbers with their
+exact digits, not through `float`, and NaN / infinite values as `null`, so
+that the output is always valid JSON.
+
+For resources with `hasMeta: true`, the `meta` block, i.e. the `MetaData` of
+every attribute, is identical in every response: it is encoded once and
+cached on the resource (`Resource.meta_block`).
+"""
+import base64
+import json
+import math
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence
+)
+
+from .rowCounting import RowCount
+
+# Rows decoded and encoded per chunk
+DEFAULT_CHUNK_ROWS = 1000
+
+
+class _ExactNumbers(Exception):
+    """Raised by the fast encoder on a Decimal: the value is encoded by `_encode_exact` instead."""
+
+
+def _default(value: Any) -> Any:
+    """JSON form of the decoded values the `json` module does not know."""
+    if isinstance(value, date):  # datetime included
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        raise _ExactNumbers
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+_ENCODER = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+
+
+def _encode_exact(value: Any) -> str:
+    """The slow path of `encode_json`: Decimals as exact numbers, NaN and infinities as null."""
+    if isinstance(value, Decimal):
+        return str(value) if value.is_finite() else "null"
+    if isinstance(value, float):
+        return float.__repr__(value) if math.isfinite(value) else "null"
+    if isinstance(value, dict):
+        return "{" + ",".join(
+            _ENCODER.encode(str(key)) + ":" + _encode_exact(item) for key, item in value.items()
+        ) + "}"
+    if isinstance(value, (list, tuple)):
+        return "[" + ",".join(map(_encode_exact, value)) + "]"
+    return _ENCODER.encode(value)
+
+
+def encode_json(value: Any) -> bytes:
+    """Compact UTF-8 JSON of `value`, with the decoded values (datetimes, decimals...) supported."""
+    try:
+        return _ENCODER.encode(value).encode()
+    except (_ExactNumbers, ValueError):  # a Decimal, or a NaN / infinity rejected by `allow_nan=False`
+        return _encode_exact(value).encode()
+
+
+def encode_meta(resource) -> Optional[bytes]:
+    """
+    The encoded `meta` block of `resource`: `{attribute: {title, description, units, searchable, sortable}}`
+    for the attributes that have metadata, None unless the resource has `hasMeta: true`.
+    """
+    if not resource.hasMeta:
+        return None
+    return encode_json({
+        field.name: field.meta.model_dump(exclude_none=True)
+        for field in resource.fields if field.meta is not None
+    })
+
+
+def _count_json(count: Optional[RowCount]) -> Any:
+    if count is None:
+        return None
+    return {"value": count.value, "exact": count.exact}
+
+
+class ResponseSerializer:
+    """
+    Serializer of the rows of `columns` (every attribute by default) of a resource.
+
+    **Example**
+
+    ```python
+    serializer = ResponseSerializer(spec.resource, page.columns)
+    return StreamingResponse(serializer.json_chunks(page.rows, count=page.count, cursor=page.cursor))
+
+    # export of a whole resource, fetched and sent batch by batch
+    rows = executor.stream(spec, QueryRequest())
+    return StreamingResponse(ResponseSerializer(spec.resource).andjson(rows), media_type="application/x-ndjson")
+    ```
+    """
+
+    def __init__(self, resource, columns: Optional[Sequence[str]] = None, chunk_size: int = DEFAULT_CHUNK_ROWS):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
+        self.decoder = resource.row_decoder(columns)
+        self.columns = self.decoder.columns
+        self.chunk_size = chunk_size
+        meta = resource.meta_block
+        head = b'{"resource_name":' + encode_json(resource.resource_name)
+        if meta is not None:
+            head += b',"meta":' + meta
+        self._header_line = head + b"}\n"
+        self._document_head = head + b',"data":['
+
+    # ---- encoding of one chunk of raw rows ----
+
+    def _ndjson_chunk(self, rows: List[Sequence[Any]]) -> bytes:
+        records = self.decoder.records(rows)
+        return b"".join(encode_json(record) + b"\n" for record in records)
+
+    def _array_chunk(self, rows: List[Sequence[Any]], first: bool) -> bytes:
+        # the chunk's records as array items: the brackets of the encoded list are stripped
+        body = encode_json(self.decoder.records(rows))[1:-1]
+        return body if first else b"," + body
+
+    def _document_tail(self, count: Optional[RowCount], cursor: Optional[str]) -> bytes:
+        return b'],"count":' + encode_json(_count_json(count)) + b',"cursor":' + encode_json(cursor) + b"}"
+
+    # ---- synchronous ----
+
+    def _chunks(self, rows: Iterable[Sequence[Any]]) -> Iterator[List[Sequence[Any]]]:
+        iterator = iter(rows)
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def ndjson(self, rows: Iterable[Sequence[Any]], header: bool = False) -> Iterator[bytes]:
+        """NDJSON records of `rows`; with `header`, the first line holds the resource name and meta block."""
+        if header:
+            yield self._header_line
+        for chunk in self._chunks(rows):
+            yield self._ndjson_chunk(chunk)
+
+    def json_chunks(self, rows: Iterable[Sequence[Any]], count: Optional[RowCount] = None,
+                    cursor: Optional[str] = None) -> Iterator[bytes]:
+        """A JSON document of `rows`, in chunks; joined, the chunks form the whole response."""
+        yield self._document_head
+        first = True
+        for chunk in self._chunks(rows):
+            yield self._array_chunk(chunk, first)
+            first = False
+        yield self._document_tail(count, cursor)
+
+    def dumps(self, rows: Sequence[Sequence[Any]], count: Optional[RowCount] = None,
+              cursor: Optional[str] = None) -> bytes:
+        """The whole JSON document of a page at once."""
+        return b"".join(self.json_chunks(rows, count, cursor))
+
+    # ---- asynchronous ----
+
+    async def _achunks(self, rows: AsyncIterable[Sequence[Any]]) -> AsyncIterator[List[Sequence[Any]]]:
+        chunk: List[Sequence[Any]] = []
+        async for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    async def andjson(self, rows: AsyncIterable[Sequence[Any]], header: bool = False) -> AsyncIterator[bytes]:
+        """`ndjson` of rows yielded by an async iterator, e.g. `AsyncQueryExecutor.stream`."""
+        if header:
+            yield self._header_line
+        async for chunk in self._achunks(rows):
+            yield self._ndjson_chunk(chunk)
+
+    async def ajson_chunks(self, rows: AsyncIterable[Sequence[Any]], count: Optional[RowCount] = None,
+                           cursor: Optional[str] = None) -> AsyncIterator[bytes]:
+        """`json_chunks` of rows yielded by an async iterator."""
+        yield self._document_head
+        first = True
+        async for chunk in self._achunks(rows):
+            yield self._array_chunk(chunk, first)
+            first = False
+        yield self._document_tail(count, cursor)
+
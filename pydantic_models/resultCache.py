@@ -0,0 +1,304 @@
+"""
+Result cache of resource queries, invalidated per database table.
+
+An entry is keyed by the normalized query (resource, statement text and bind
+values) and records the tables its result depends on, taken from the mapping
+graph: the `masterTable` and every `AdditionalTable`, qualified by their
+`dbSchema`. When a table changes, `invalidate_table("oms.runs")` evicts
+exactly the entries of the resources reading it.
+
+Every invalidation also bumps a generation of the table (or resource):
+`get_or_execute` takes the generations before running a query and does not
+store its result if one of them changed meanwhile, since the result may
+predate the change.
+
+Two backends are provided:
+
+- `LruResultBackend`: in-process, bounded LRU.
+- `SqliteResultBackend`: a SQLite file shared by the processes of one host.
+  Values are stored pickled, so the file must only be writable by trusted users.
+"""
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    Mapping,
+    Optional,
+    Set,
+    Tuple
+)
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .sqlCompiler import CompiledQuery
+
+
+def qualified_table(schema: str, table: str) -> str:
+    """Normalized `schema.table` name; database identifiers are matched case-insensitively."""
+    return f"{schema}.{table}".lower()
+
+
+def dependent_tables(spec: ResourceToDbMappingSpec) -> FrozenSet[str]:
+    """Every table the results of `spec` are read from."""
+    mapper = spec.resourceToDbMapper
+    tables = {qualified_table(mapper.dbSchema, mapper.masterTable)}
+    tables.update(qualified_table(table.dbSchema, table.namedb) for table in mapper.additionalTables or [])
+    return frozenset(tables)
+
+
+def query_key(compiled: CompiledQuery, params: Mapping[str, Any]) -> str:
+    """Key of a normalized query: its resource, statement text and bind values in a canonical order."""
+    normalized = repr((compiled.resource_name, compiled.sql, sorted(params.items())))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class LruResultBackend:
+    """In-process backend: a bounded LRU with a table → keys index. Thread-safe."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[Any, str, FrozenSet[str]]]" = OrderedDict()
+        self._by_table: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, value: Any, resource_name: str, tables: FrozenSet[str]) -> None:
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (value, resource_name, tables)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for table in entry[2]:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def invalidate_table(self, table: str) -> int:
+        with self._lock:
+            keys = list(self._by_table.get(table, ()))
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def invalidate_resource(self, resource_name: str) -> int:
+        with self._lock:
+            keys = [key for key, entry in self._entries.items() if entry[1] == resource_name]
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteResultBackend:
+    """
+    Backend shared by the processes of one host through a SQLite file.
+    Holds at most `max_entries` entries, the least recently used are evicted first.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS entries ("
+        " key TEXT PRIMARY KEY, resource TEXT NOT NULL, value BLOB NOT NULL, used REAL NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS dependencies ("
+        " key TEXT NOT NULL REFERENCES entries(key) ON DELETE CASCADE, table_name TEXT NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS dependencies_table ON dependencies(table_name)",
+        "CREATE INDEX IF NOT EXISTS dependencies_key ON dependencies(key)",
+        "CREATE INDEX IF NOT EXISTS entries_resource ON entries(resource)",
+        "CREATE INDEX IF NOT EXISTS entries_used ON entries(used)",
+    )
+
+    def __init__(self, path, max_entries: int = 10000, timeout: float = 5.0):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        with self._transaction():
+            for statement in self.SCHEMA:
+                self._db.execute(statement)
+
+    def _transaction(self):
+        return _Transaction(self._db, self._lock)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._transaction():
+            row = self._db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, key: str, value: Any, resource_name: str, tables: FrozenSet[str]) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._transaction():
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.execute("INSERT INTO entries VALUES (?, ?, ?, ?)", (key, resource_name, blob, time.time()))
+            self._db.executemany("INSERT INTO dependencies VALUES (?, ?)", [(key, table) for table in tables])
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def invalidate_table(self, table: str) -> int:
+        with self._transaction():
+            return self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM dependencies WHERE table_name = ?)", (table,)
+            ).rowcount
+
+    def invalidate_resource(self, resource_name: str) -> int:
+        with self._transaction():
+            return self._db.execute("DELETE FROM entries WHERE resource = ?", (resource_name,)).rowcount
+
+    def clear(self) -> None:
+        with self._transaction():
+            self._db.execute("DELETE FROM entries")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+
+class _Transaction:
+    """Serializes the threads of a process and runs the statements in one IMMEDIATE transaction."""
+
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock):
+        self.db = db
+        self.lock = lock
+
+    def __enter__(self):
+        self.lock.acquire()
+        try:
+            self.db.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.lock.release()
+            raise
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.lock.release()
+
+
+class ResultCache:
+    """
+    Caches the results of resource queries in a backend and invalidates them per table.
+
+    The generations count the invalidations made through this object, i.e.
+    within one process: with a shared `SqliteResultBackend`, the other
+    processes must invalidate through their own `ResultCache` as well.
+
+    **Example**
+
+    ```python
+    cache = ResultCache(LruResultBackend(maxsize=512))
+    rows = cache.get_or_execute(spec, compiled, params, lambda: cursor.execute(compiled.sql, params).fetchall())
+    cache.invalidate_table("oms.runs")
+    ```
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LruResultBackend()
+        # ("table", name) / ("resource", name) / ("all",) → invalidations so far
+        self._generations: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tables_of(spec: ResourceToDbMappingSpec) -> FrozenSet[str]:
+        return spec.dependent_tables
+
+    def generation(self, spec: ResourceToDbMappingSpec) -> Hashable:
+        """Invalidation generation of the tables and resource of `spec`; take it before running the query."""
+        with self._lock:
+            return self._generation(spec)
+
+    def _generation(self, spec: ResourceToDbMappingSpec) -> Tuple[int, ...]:
+        keys = [("all",), ("resource", spec.resource.resource_name)]
+        keys.extend(("table", table) for table in sorted(self.tables_of(spec)))
+        return tuple(self._generations.get(key, 0) for key in keys)
+
+    def _invalidate(self, key: Tuple[str, ...], evict: Callable[[], int]) -> int:
+        # under the lock of `_put`: a result stored before is evicted, one stored after sees the new generation
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            return evict()
+
+    def get(self, compiled: CompiledQuery, params: Mapping[str, Any]) -> Optional[Any]:
+        return self.backend.get(query_key(compiled, params))
+
+    def put(self, spec: ResourceToDbMappingSpec, compiled: CompiledQuery,
+            params: Mapping[str, Any], value: Any, generation: Optional[Hashable] = None) -> bool:
+        """
+        Store a result. With the `generation` taken before the query ran, the result is
+        not stored if a table it reads was invalidated meanwhile. Returns whether it was stored.
+        """
+        return self._put(query_key(compiled, params), spec, compiled, value, generation)
+
+    def _put(self, key: str, spec: ResourceToDbMappingSpec, compiled: CompiledQuery,
+             value: Any, generation: Optional[Hashable]) -> bool:
+        with self._lock:
+            if generation is not None and generation != self._generation(spec):
+                return False
+            self.backend.put(key, value, compiled.resource_name, self.tables_of(spec))
+            return True
+
+    def get_or_execute(self, spec: ResourceToDbMappingSpec, compiled: CompiledQuery,
+                       params: Mapping[str, Any], execute: Callable[[], Any]) -> Any:
+        """Cached result of the query, running `execute()` and storing its result on a miss."""
+        key = query_key(compiled, params)
+        value = self.backend.get(key)
+        if value is None:
+            generation = self.generation(spec)
+            value = execute()
+            self._put(key, spec, compiled, value, generation)
+        return value
+
+    def invalidate_table(self, table: str) -> int:
+        """Evict every entry reading `table` (`schema.table`); returns the number of entries evicted."""
+        table = table.lower()
+        return self._invalidate(("table", table), lambda: self.backend.invalidate_table(table))
+
+    def invalidate_tables(self, tables: Iterable[str]) -> int:
+        return sum(self.invalidate_table(table) for table in tables)
+
+    def invalidate_resource(self, resource_name: str) -> int:
+        """Evict every entry of one resource, e.g. after its spec changed."""
+        return self._invalidate(("resource", resource_name), lambda: self.backend.invalidate_resource(resource_name))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generations[("all",)] = self._generations.get(("all",), 0) + 1
+            self.backend.clear()
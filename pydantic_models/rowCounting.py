@@ -0,0 +1,158 @@
+"""
+Row counting of resource queries, following the `rowCounting` mode of the mapper.
+
+- `disabled`: no count.
+- `enabled`: a separate COUNT statement, see `QueryCompiler.compile_count`.
+- `window`: no separate statement; the total comes with every row of the
+  page through `COUNT(*) OVER ()`, see `count_from_window`. Keyset pages
+  after the first only select the rows after their cursor, so their total
+  is counted by a separate statement, see `needs_count_query`.
+- `cached`: a separate COUNT statement whose result is kept in a `CountCache`
+  per normalized filter for `rowCountingOptions.ttl` seconds.
+- `estimate`: a separate COUNT statement that stops after
+  `rowCountingOptions.limit` rows; larger totals are reported as inexact.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .sqlCompiler import CompiledQuery, QueryCompiler, QueryRequest
+
+# Seconds a count is cached when the spec does not set `rowCountingOptions.ttl`
+DEFAULT_COUNT_TTL = 60
+
+# Modes answered by a separate COUNT statement
+COUNT_QUERY_MODES = ("enabled", "cached", "estimate")
+
+
+@dataclass(frozen=True)
+class RowCount:
+    """A total row count; `exact` is False when counting stopped at the `estimate` limit."""
+    value: int
+    exact: bool = True
+
+
+def count_key(compiled: CompiledQuery, params: Mapping[str, Any]) -> Tuple[Hashable, ...]:
+    """Cache key of a count: its statement and its bind values in a canonical order."""
+    values = tuple(sorted((name, _hashable(value)) for name, value in params.items()))
+    return compiled.resource_name, compiled.sql, values
+
+
+def _hashable(value: Any) -> Hashable:
+    if isinstance(value, (list, set, frozenset, tuple)):
+        return tuple(_hashable(item) for item in value)
+    return value
+
+
+class CountCache:
+    """
+    Row counts keyed by normalized filter, each kept for a time-to-live.
+    Bounded to `maxsize` entries, least recently used first out. Thread-safe.
+    """
+
+    def __init__(self, maxsize: int = 4096, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, RowCount]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[RowCount]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, count = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return count
+
+    def put(self, key: Hashable, count: RowCount, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (self.clock() + ttl, count)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, resource_name: Optional[str] = None) -> None:
+        with self._lock:
+            if resource_name is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == resource_name]:
+                    del self._entries[key]
+
+
+def needs_count_query(spec: ResourceToDbMappingSpec, request: QueryRequest) -> bool:
+    """Whether the row count of `request` is answered by a separate COUNT statement."""
+    mapper = spec.resourceToDbMapper
+    if mapper.rowCounting == "window":
+        # COUNT(*) OVER () runs after the keyset predicate: it would miss the rows before the cursor
+        return bool(request.cursor) and mapper.pagination == "keyset"
+    return mapper.rowCounting in COUNT_QUERY_MODES
+
+
+def count_ttl(spec: ResourceToDbMappingSpec) -> int:
+    options = spec.resourceToDbMapper.rowCountingOptions
+    return options.ttl if options and options.ttl else DEFAULT_COUNT_TTL
+
+
+def make_row_count(compiled: CompiledQuery, value: int) -> RowCount:
+    if compiled.count_limit is not None:
+        return RowCount(value, exact=value < compiled.count_limit)
+    return RowCount(value)
+
+
+def count_from_window(compiled: CompiledQuery, rows: Sequence[Sequence[Any]],
+                      request: QueryRequest) -> Optional[RowCount]:
+    """
+    Total of a `window` counted page, taken from the last column of its rows.
+    An empty page only tells the total when it is the first page.
+    """
+    if not compiled.window_count:
+        return None
+    if rows:
+        return RowCount(int(rows[0][-1]))
+    if request.offset == 0 and not request.cursor:
+        return RowCount(0)
+    return None
+
+
+def count_rows(spec: ResourceToDbMappingSpec, request: QueryRequest, compiler: QueryCompiler,
+               execute: Callable[[str, Mapping[str, Any]], int],
+               cache: Optional[CountCache] = None) -> Optional[RowCount]:
+    """
+    Count the rows of `request` with a separate statement, as the `rowCounting`
+    mode of `spec` requires; `execute(sql, params)` runs it and returns the
+    scalar count. Returns None when no statement is needed: the `disabled`
+    mode, and the `window` mode except on keyset pages after the first.
+    """
+    if not needs_count_query(spec, request):
+        return None
+    mode = spec.resourceToDbMapper.rowCounting
+
+    compiled = compiler.compile_count(spec, request)
+    params = compiled.bind(request)
+    key = None
+    if mode == "cached" and cache is not None:
+        key = count_key(compiled, params)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    count = make_row_count(compiled, int(execute(compiled.sql, params)))
+    if key is not None:
+        cache.put(key, count, count_ttl(spec))
+    return count
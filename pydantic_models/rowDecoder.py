@@ -0,0 +1,345 @@
+"""
+Type-driven decoding of fetched rows.
+
+Database drivers return datetimes as strings, booleans as numbers or flags,
+intervals as `timedelta`s, decimals as floats... A `RowDecoder` turns the
+raw rows of a resource query into values of the Python type of each
+attribute, as declared by its `Attribute.type` (see `FieldType`):
+
+| `FieldType` | decoded as |
+| --- | --- |
+| `datetime` | `datetime.datetime` (ISO strings and dates are converted) |
+| `string`, `longstring` | `str` (LOBs are read) |
+| `smallinteger`, `integer`, `biginteger` | `int` |
+| `timeinterval_int`, `timeinterval_double` | seconds, as `int` / `float` (`timedelta`s are converted) |
+| `float`, `double` | `float` |
+| `boolean` | `bool` (`0`/`1`, `Y`/`N`, `T`/`F`, `true`/`false`) |
+| `binarystring` | `bytes` |
+| `decimal` | `decimal.Decimal` |
+
+Attributes of any other type are passed through unchanged, and NULL stays None.
+
+The converters of the selected columns are resolved once, when the decoder
+is built, and compiled into a single function decoding a whole batch of rows,
+so that no type dispatch happens per cell. `decode_columns` is a columnar
+variant for large pages, returning one NumPy array per attribute (NumPy is
+only imported when it is used): numbers, booleans, ISO timestamps and
+intervals are converted by NumPy a whole column at a time, and only decimals,
+LOBs and values in other forms go through the converter of each value.
+"""
+import logging
+import operator
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import partial
+from itertools import repeat
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple
+)
+
+from .enum import FieldType
+
+logger = logging.getLogger(__name__)
+
+Converter = Callable[[Any], Any]
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NOT_NULL = partial(operator.is_not, None)
+
+
+class RowDecodeError(ValueError):
+    """Raised when a fetched value cannot be converted to the type of its attribute."""
+
+    def __init__(self, resource_name: str, column: str, type_name: str, value: Any, reason: str):
+        self.resource_name = resource_name
+        self.column = column
+        self.type_name = type_name
+        self.value = value
+        super().__init__(
+            f"Cannot decode {value!r} as '{type_name}' for attribute '{column}' of resource '{resource_name}': {reason}"
+        )
+
+
+# ---- converters: called on non-NULL values only ----
+
+def _datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    raise TypeError(f"unexpected {type(value).__name__}")
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if hasattr(value, "read"):  # LOB locator
+        return value.read()
+    return str(value)
+
+
+def _interval_int(value: Any) -> int:
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    return int(value)
+
+
+def _interval_double(value: Any) -> float:
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+
+_BOOLEANS = {
+    True: True, False: False,  # also matches 1 / 0 and 1.0 / 0.0
+    "1": True, "0": False,
+    "Y": True, "N": False, "y": True, "n": False,
+    "T": True, "F": False, "t": True, "f": False,
+    "true": True, "false": False, "TRUE": True, "FALSE": False, "True": True, "False": False,
+}
+
+
+def _boolean(value: Any) -> bool:
+    try:
+        return _BOOLEANS[value]
+    except (KeyError, TypeError):
+        raise ValueError("not a boolean value") from None
+
+
+def _binary(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if hasattr(value, "read"):  # LOB locator
+        value = value.read()
+    return bytes(value)
+
+
+def _decimal(value: Any) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        # through its shortest representation, so that 0.1 decodes to Decimal("0.1")
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+# None: the value is passed through
+CONVERTERS: Dict[FieldType, Optional[Converter]] = {
+    FieldType.datetime_iso: _datetime,
+    FieldType.string: None,
+    FieldType.text: _text,
+    FieldType.integer32: int,
+    FieldType.integer64: int,
+    FieldType.biginteger: int,
+    FieldType.timeinterval_int: _interval_int,
+    FieldType.timeinterval_double: _interval_double,
+    FieldType.float: float,
+    FieldType.double: float,
+    FieldType.boolean: _boolean,
+    FieldType.binarystring: _binary,
+    FieldType.decimal: _decimal,
+}
+
+# dtype of the columnar arrays; types not listed are object arrays
+NUMPY_DTYPES: Dict[FieldType, str] = {
+    FieldType.datetime_iso: "datetime64[us]",
+    FieldType.integer32: "int32",
+    FieldType.integer64: "int64",
+    FieldType.timeinterval_int: "int64",
+    FieldType.timeinterval_double: "float64",
+    FieldType.float: "float64",
+    FieldType.double: "float64",
+    FieldType.boolean: "bool",
+}
+
+
+def converter_for(type_name: str) -> Optional[Converter]:
+    """The converter of an `Attribute.type`, None when its values are passed through."""
+    # FieldType is a StrEnum: its members and their string values share the same keys
+    return CONVERTERS.get(type_name)
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError("Columnar row decoding requires the `numpy` package") from exc
+    return numpy
+
+
+def _compile(resource_name: str, columns: Sequence[str], converters: Sequence[Optional[Converter]]):
+    """Source-generate the batch decoders of one column layout, every converter bound to its position."""
+    names = [f"v{i}" for i in range(len(columns))]
+    values = [
+        name if converter is None else f"(None if {name} is None else c{i}({name}))"
+        for i, (name, converter) in enumerate(zip(names, converters))
+    ]
+    target = f"({', '.join(names)},)" if names else "_"
+    row = f"({', '.join(values)},)" if values else "()"
+    record = "{" + ", ".join(f"{column!r}: {value}" for column, value in zip(columns, values)) + "}"
+    source = (
+        f"def decode_rows(rows):\n"
+        f"    return [{row} for {target} in rows]\n"
+        f"def decode_records(rows):\n"
+        f"    return [{record} for {target} in rows]\n"
+    )
+    namespace: Dict[str, Any] = {f"c{i}": converter for i, converter in enumerate(converters) if converter is not None}
+    exec(compile(source, f"<row decoder of {resource_name}>", "exec"), namespace)
+    return namespace["decode_rows"], namespace["decode_records"]
+
+
+def _bulk(np, values: List[Any], type_name: str, dtype: str):
+    """
+    The non-NULL `values` of a column converted to `dtype` a whole column at a time,
+    without calling the converter of each value; None when they are not all in a form
+    that is converted in bulk exactly like the converter does.
+    """
+    count = len(values)
+    if dtype == "bool":
+        # the converter is this lookup; an unknown value raises and is reported by the converter
+        return np.fromiter(map(_BOOLEANS.__getitem__, values), dtype=bool, count=count)
+    types = set(map(type, values))
+    if dtype == "datetime64[us]":
+        if types == {datetime}:
+            # aware datetimes cannot be subtracted from the naive epoch: they go through the converter
+            micros = map(operator.floordiv, map(operator.sub, values, repeat(_EPOCH)), repeat(_MICROSECOND))
+            return np.fromiter(micros, dtype="int64", count=count).view(dtype)
+        # shorter strings are the year-only, "NaT" and "now" forms that NumPy parses but not fromisoformat
+        if types == {str} and min(map(len, values)) >= len("YYYY-MM-DD"):
+            return np.array(values, dtype=dtype)
+    elif types == {timedelta}:
+        if type_name in (FieldType.timeinterval_int, FieldType.timeinterval_double):
+            seconds = np.fromiter(map(timedelta.total_seconds, values), dtype="float64", count=count)
+            return np.trunc(seconds).astype(dtype) if dtype == "int64" else seconds
+    elif types <= ({int, bool, float} if dtype == "float64" else {int, bool}):
+        # integers out of the range of `dtype` raise OverflowError, as with the converter
+        return np.fromiter(values, dtype=dtype, count=count)
+    return None
+
+
+def _column(np, values: Sequence[Any], type_name: str, converter: Optional[Converter]):
+    """The decoded array of one column of raw `values`; see `RowDecoder.decode_columns`."""
+    count = len(values)
+    dtype = NUMPY_DTYPES.get(type_name)
+    nulls = np.fromiter(map(operator.is_, values, repeat(None)), dtype=bool, count=count)
+    has_nulls = bool(nulls.any())
+    valid = list(filter(_NOT_NULL, values)) if has_nulls else list(values)
+
+    decoded = None
+    if dtype is not None and valid:
+        try:
+            decoded = _bulk(np, valid, type_name, dtype)
+        except (KeyError, TypeError, ValueError, ArithmeticError):
+            decoded = None  # the converter reports the offending value
+    if decoded is None:
+        if converter is not None:
+            valid = list(map(converter, valid))
+        if dtype is not None:
+            decoded = np.array(valid, dtype=dtype)
+        else:
+            decoded = np.empty(len(valid), dtype=object)
+            decoded[:] = valid
+    if not has_nulls:
+        return decoded
+    if dtype is None:
+        array = np.full(count, None, dtype=object)
+        array[~nulls] = decoded
+        return array
+    data = np.zeros(count, dtype=dtype)
+    data[~nulls] = decoded
+    return np.ma.MaskedArray(data, mask=nulls)
+
+
+class RowDecoder:
+    """
+    Decoder of the rows of one resource query, built for the `columns` it selects
+    (every attribute of the resource, in declaration order, by default).
+    Prefer `Resource.row_decoder(columns)`, which caches the decoders of a resource.
+
+    **Example**
+
+    ```python
+    page = await executor.fetch_page(spec, request)
+    decoder = spec.resource.row_decoder(page.columns)
+    records = decoder.records(page.rows)       # [{"fill_number": 7920, "stable_beams": True, ...}, ...]
+    arrays = decoder.decode_columns(page.rows) # {"fill_number": array([7920, ...]), ...}
+    ```
+    """
+
+    def __init__(self, resource, columns: Optional[Sequence[str]] = None):
+        types = {field.name: field.type for field in resource.fields}
+        if columns is None:
+            columns = tuple(types)
+        unknown = [column for column in columns if column not in types]
+        if unknown:
+            raise ValueError(f"Unknown attribute(s) of resource '{resource.resource_name}': {', '.join(unknown)}")
+        self.resource_name: str = resource.resource_name
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.types: Tuple[str, ...] = tuple(types[column] for column in self.columns)
+        self.converters: Tuple[Optional[Converter], ...] = tuple(converter_for(t) for t in self.types)
+        self._decode_rows, self._decode_records = _compile(self.resource_name, self.columns, self.converters)
+
+    def decode(self, rows: Sequence[Sequence[Any]]) -> List[Tuple]:
+        """The decoded rows, as tuples of `columns` values."""
+        try:
+            return self._decode_rows(rows)
+        except (TypeError, ValueError, ArithmeticError) as exc:
+            raise self._locate_error(rows, exc) from None
+
+    def records(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        """The decoded rows, as `{attribute: value}` records."""
+        try:
+            return self._decode_records(rows)
+        except (TypeError, ValueError, ArithmeticError) as exc:
+            raise self._locate_error(rows, exc) from None
+
+    def decode_columns(self, rows: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+        """
+        The decoded rows as one NumPy array per attribute. Columns of numeric,
+        boolean and datetime attributes holding NULLs are masked arrays;
+        the other attributes are object arrays, where NULL stays None.
+        """
+        np = _numpy()
+        if any(len(row) != len(self.columns) for row in rows):
+            raise self._locate_error(rows, ValueError("unexpected number of values"))
+        transposed = list(zip(*rows)) if rows else [()] * len(self.columns)
+        arrays: Dict[str, Any] = {}
+        for column, type_name, converter, values in zip(self.columns, self.types, self.converters, transposed):
+            try:
+                arrays[column] = _column(np, values, type_name, converter)
+            except (TypeError, ValueError, ArithmeticError) as exc:
+                raise self._locate_error(rows, exc) from None
+        return arrays
+
+    def _locate_error(self, rows: Sequence[Sequence[Any]], exc: Exception) -> Exception:
+        """Find the cell a failed batch tripped on: batches are decoded without per-cell bookkeeping."""
+        for row in rows:
+            if len(row) != len(self.columns):
+                return ValueError(
+                    f"Rows of resource '{self.resource_name}' have {len(row)} values, "
+                    f"{len(self.columns)} expected ({', '.join(self.columns)})"
+                )
+            for column, type_name, converter, value in zip(self.columns, self.types, self.converters, row):
+                if value is None or converter is None:
+                    continue
+                try:
+                    converter(value)
+                except (TypeError, ValueError, ArithmeticError) as cell_exc:
+                    return RowDecodeError(self.resource_name, column, type_name, value, str(cell_exc))
+        return exc
+
+
+class DecoderCache(dict):
+    """Decoders of a resource by column layout; they hold generated code, so they are not pickled with the spec."""
+
+    def __reduce__(self):
+        return DecoderCache, ()
@@ -0,0 +1,165 @@
+"""
+Compact, immutable runtime representation of validated specifications.
+
+Once validated, a spec is only read, yet every node keeps the per-instance
+overhead of a pydantic model (`__dict__`, fields-set, private attributes).
+`compile_model` turns a validated model tree into a tree of frozen
+`__slots__` objects with the same attribute names:
+
+- every model class gets a runtime class of the same name with one slot per field,
+- lists become tuples and strings are interned with `sys.intern`,
+- identical sub-trees are hash-consed: an `Interner` returns the existing node
+  for a sub-tree it has already built, so e.g. the same `Function` used by many
+  attributes, or by many resources compiled with the same interner, is stored once.
+
+`memory_report` measures the footprint of both trees.
+"""
+import gc
+import sys
+from dataclasses import dataclass
+from enum import Enum
+from types import FunctionType, ModuleType
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Mapping,
+    Optional,
+    Tuple
+)
+
+from pydantic import BaseModel
+
+
+class RuntimeNode:
+    """Base of the runtime classes: immutable, slotted, compared by identity (nodes are hash-consed)."""
+    __slots__ = ()
+    _fields: Tuple[str, ...] = ()
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in self._fields)
+        return f"{type(self).__name__}({values})"
+
+
+_RUNTIME_CLASSES: Dict[type, type] = {}
+
+
+def runtime_class(model_class: type) -> type:
+    """The runtime class of a model class, with one slot per model field."""
+    cls = _RUNTIME_CLASSES.get(model_class)
+    if cls is None:
+        fields = tuple(model_class.model_fields)
+        cls = type(model_class.__name__, (RuntimeNode,), {
+            "__slots__": fields,
+            "__module__": __name__,
+            "__doc__": f"Runtime form of `{model_class.__name__}`.",
+            "_fields": fields,
+        })
+        _RUNTIME_CLASSES[model_class] = cls
+    return cls
+
+
+class Interner:
+    """Hash-consing table: one node per distinct sub-tree. Share it to deduplicate across specs."""
+
+    def __init__(self):
+        self._nodes: Dict[Hashable, RuntimeNode] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def node(self, cls: type, values: Tuple[Any, ...]) -> RuntimeNode:
+        key = (cls, tuple(_key(value) for value in values))
+        node = self._nodes.get(key)
+        if node is None:
+            node = object.__new__(cls)
+            for name, value in zip(cls._fields, values):
+                object.__setattr__(node, name, value)
+            self._nodes[key] = node
+        return node
+
+    def convert(self, value: Any) -> Any:
+        if isinstance(value, BaseModel):
+            cls = runtime_class(type(value))
+            return self.node(cls, tuple(self.convert(getattr(value, name)) for name in cls._fields))
+        if isinstance(value, Enum):
+            return value
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, (list, tuple)):
+            return tuple(self.convert(item) for item in value)
+        if isinstance(value, dict):
+            return tuple((self.convert(k), self.convert(v)) for k, v in value.items())
+        return value
+
+
+def _key(value: Any) -> Hashable:
+    # nodes are canonical, so they are keyed by identity; scalars also by type, so that 1, 1.0 and True stay apart
+    if isinstance(value, RuntimeNode):
+        return value
+    if isinstance(value, tuple):
+        return tuple(_key(item) for item in value)
+    return type(value), value
+
+
+def compile_model(model: BaseModel, interner: Optional[Interner] = None) -> RuntimeNode:
+    """Runtime copy of a validated model tree; pass the same `interner` to share nodes across trees."""
+    return (interner or Interner()).convert(model)
+
+
+def compile_registry(registry: Mapping[str, BaseModel]) -> Dict[str, RuntimeNode]:
+    """Runtime copies of every spec of a registry, sharing identical sub-trees across resources."""
+    interner = Interner()
+    return {name: interner.convert(spec) for name, spec in registry.items()}
+
+
+# ---- memory ----
+
+@dataclass(frozen=True)
+class MemoryReport:
+    pydantic_bytes: int
+    pydantic_objects: int
+    runtime_bytes: int
+    runtime_objects: int
+
+    @property
+    def ratio(self) -> float:
+        return self.runtime_bytes / self.pydantic_bytes if self.pydantic_bytes else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"pydantic tree: {self.pydantic_bytes:>12,d} bytes in {self.pydantic_objects:>9,d} objects\n"
+            f"runtime tree:  {self.runtime_bytes:>12,d} bytes in {self.runtime_objects:>9,d} objects "
+            f"({self.ratio:.0%} of the pydantic tree)"
+        )
+
+
+def deep_size(root: Any) -> Tuple[int, int]:
+    """Bytes and number of the objects reachable from `root`, each counted once; classes and modules excluded."""
+    seen = set()
+    size = count = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, (type, ModuleType, FunctionType)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        count += 1
+        stack.extend(gc.get_referents(obj))
+    return size, count
+
+
+def memory_report(model: BaseModel, compiled: Optional[RuntimeNode] = None) -> MemoryReport:
+    """Compare the footprint of a validated model tree with its runtime copy (compiled when not given)."""
+    if compiled is None:
+        compiled = compile_model(model)
+    pydantic_bytes, pydantic_objects = deep_size(model)
+    runtime_bytes, runtime_objects = deep_size(compiled)
+    return MemoryReport(pydantic_bytes, pydantic_objects, runtime_bytes, runtime_objects)
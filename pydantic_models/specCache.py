@@ -0,0 +1,97 @@
+"""
+Content-addressed on-disk cache of validated `ResourceToDbMappingSpec` objects.
+
+An entry is keyed by a hash of the raw YAML bytes of a spec pair combined
+with a fingerprint of the model definitions. A cache hit skips YAML parsing
+and validation entirely: the already-validated spec is restored from its
+pickled form, which does not re-run any pydantic validator.
+
+The fingerprint covers the source of every module of `pydantic_models` and
+the pydantic / Python versions, so any change of a model definition
+invalidates the whole cache automatically.
+
+The cache directory must only be writable by trusted users, since entries
+are restored with `pickle`.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+import pydantic
+import pydantic_core
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .specLoader import SpecPair, load_spec_pair
+
+PACKAGE_DIR = Path(__file__).parent
+ENTRY_SUFFIX = ".pickle"
+
+
+@lru_cache(maxsize=None)
+def schema_fingerprint() -> str:
+    """Hash of the `pydantic_models` sources and of the library versions the specs were validated with."""
+    digest = hashlib.sha256()
+    digest.update(f"{sys.version_info[:2]}|{pydantic.VERSION}|{pydantic_core.__version__}".encode())
+    for path in sorted(PACKAGE_DIR.glob("*.py")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class SpecCache:
+    """
+    Persistent cache of validated specs, stored as one pickle file per entry under `directory`.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+
+    def key_for(self, pair: SpecPair) -> str:
+        digest = hashlib.sha256(schema_fingerprint().encode())
+        for path in pair.paths:
+            content = path.read_bytes()
+            digest.update(len(content).to_bytes(8, "little"))
+            digest.update(content)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{ENTRY_SUFFIX}"
+
+    def get(self, key: str) -> Optional[ResourceToDbMappingSpec]:
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                spec = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError):
+            # Corrupted or written by an incompatible definition: drop it and re-validate
+            path.unlink(missing_ok=True)
+            return None
+        return spec if isinstance(spec, ResourceToDbMappingSpec) else None
+
+    def put(self, key: str, spec: ResourceToDbMappingSpec) -> None:
+        path = self._entry_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so that concurrent readers never see a partial entry
+        with tempfile.NamedTemporaryFile(dir=path.parent, suffix=".tmp", delete=False) as f:
+            pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, path)
+
+    def load(self, pair: SpecPair) -> ResourceToDbMappingSpec:
+        """Return the cached spec for `pair`, validating and storing it on a miss."""
+        key = self.key_for(pair)
+        spec = self.get(key)
+        if spec is None:
+            spec = load_spec_pair(pair)
+            self.put(key, spec)
+        return spec
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,311 @@
+"""
+Bulk loading of Resource / ResourceToDbMapper YAML specifications.
+
+A specification is split in two YAML documents: one holding the `resource`
+segment and one holding the `resourceToDbMapper` segment (both segments may
+also live in the same file). This module finds every such pair under a
+directory tree and validates them through `ResourceToDbMappingSpec` across a
+process pool, so that start-up time scales with the number of cores rather
+than with the number of resources.
+
+Usage from the command line:
+
+```
+python -m pydantic_models.specLoader path/to/specs --workers 8 --cache-dir .spec_cache
+```
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import repeat
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import yaml
+from pydantic import ValidationError
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+
+if TYPE_CHECKING:
+    from .specCache import SpecCache
+
+SPEC_SUFFIXES = (".yaml", ".yml")
+
+# Use the libyaml bindings when they are available, they are several times faster
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Cheap textual scan used to pair the files without parsing the whole YAML document.
+# Keys are matched case-insensitively, as `TypoDetectingModel` accepts case variations.
+_SEGMENT_KEY = re.compile(r"^(resourceToDbMapper|resource)\s*:", re.MULTILINE | re.IGNORECASE)
+_RESOURCE_NAME = re.compile(
+    r"^[ \t]+resource_name\s*:\s*[\"']?([a-zA-Z0-9_]+)", re.MULTILINE | re.IGNORECASE
+)
+
+
+@dataclass(frozen=True)
+class SpecPair:
+    """The resource and mapper YAML files that together form one specification."""
+    resource_name: str
+    resource_path: Path
+    mapper_path: Path
+
+    @property
+    def paths(self) -> Tuple[Path, ...]:
+        if self.resource_path == self.mapper_path:
+            return (self.resource_path,)
+        return (self.resource_path, self.mapper_path)
+
+
+@dataclass(frozen=True)
+class SpecLoadError:
+    """A specification that could not be paired, parsed or validated."""
+    resource_name: Optional[str]
+    paths: Tuple[Path, ...]
+    message: str
+
+    def __str__(self) -> str:
+        name = self.resource_name or "<unknown>"
+        files = ", ".join(str(path) for path in self.paths)
+        return f"[{name}] ({files})\n{self.message}"
+
+
+@dataclass
+class LoadReport:
+    """Outcome of a bulk load: the validated specs keyed by `resource_name` and every error found."""
+    registry: Dict[str, ResourceToDbMappingSpec] = field(default_factory=dict)
+    errors: List[SpecLoadError] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def error_report(self) -> str:
+        if not self.errors:
+            return ""
+        header = f"{len(self.errors)} specification(s) failed to load:\n"
+        return header + "\n\n".join(str(error) for error in self.errors)
+
+
+def scan_spec_file(path: Path) -> Tuple[Tuple[str, ...], Optional[str]]:
+    """
+    Scan a YAML file and return the top-level segments it defines (`resource`,
+    `resourceToDbMapper`) together with the `resource_name` it declares.
+    """
+    text = path.read_text(encoding="utf-8")
+    segments = tuple(sorted({
+        "resourceToDbMapper" if key.lower() == "resourcetodbmapper" else "resource"
+        for key in _SEGMENT_KEY.findall(text)
+    }))
+    match = _RESOURCE_NAME.search(text)
+    return segments, match.group(1) if match else None
+
+
+ScannedFiles = Dict[Path, Tuple[Tuple[str, ...], str]]
+
+
+def scan_spec_tree(root) -> Tuple[ScannedFiles, List[SpecLoadError]]:
+    """
+    Scan every YAML file under `root` and return the segments and `resource_name`
+    of each specification file. YAML files that define neither segment are ignored;
+    unreadable or unnamed specification files are returned as errors.
+    """
+    scanned: ScannedFiles = {}
+    errors: List[SpecLoadError] = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if not filename.endswith(SPEC_SUFFIXES):
+                continue
+            path = Path(dirpath) / filename
+            try:
+                segments, name = scan_spec_file(path)
+            except (OSError, UnicodeDecodeError) as exc:
+                errors.append(SpecLoadError(None, (path,), f"Cannot read file: {exc}"))
+                continue
+            if not segments:
+                continue
+            if name is None:
+                errors.append(SpecLoadError(None, (path,), "No `resource_name` found in the specification file"))
+                continue
+            scanned[path] = (segments, name)
+    return scanned, errors
+
+
+def pair_spec_files(scanned: ScannedFiles) -> Tuple[List[SpecPair], List[SpecLoadError]]:
+    """Pair the scanned resource and mapper files declaring the same `resource_name`."""
+    resources: Dict[str, List[Path]] = {}
+    mappers: Dict[str, List[Path]] = {}
+    for path, (segments, name) in scanned.items():
+        if "resource" in segments:
+            resources.setdefault(name, []).append(path)
+        if "resourceToDbMapper" in segments:
+            mappers.setdefault(name, []).append(path)
+
+    pairs, errors = [], []
+    for name in sorted(resources.keys() | mappers.keys()):
+        resource_paths = resources.get(name, [])
+        mapper_paths = mappers.get(name, [])
+        all_paths = tuple(dict.fromkeys(resource_paths + mapper_paths))
+        if len(resource_paths) > 1 or len(mapper_paths) > 1:
+            errors.append(SpecLoadError(name, all_paths, f"Resource '{name}' is defined more than once"))
+        elif not resource_paths:
+            errors.append(SpecLoadError(name, all_paths, f"No `resource` specification found for '{name}'"))
+        elif not mapper_paths:
+            errors.append(SpecLoadError(name, all_paths, f"No `resourceToDbMapper` specification found for '{name}'"))
+        else:
+            pairs.append(SpecPair(name, resource_paths[0], mapper_paths[0]))
+    return pairs, errors
+
+
+def discover_spec_pairs(root) -> Tuple[List[SpecPair], List[SpecLoadError]]:
+    """
+    Walk `root` and pair every resource YAML with the mapper YAML declaring the same `resource_name`.
+
+    YAML files that define neither segment are ignored. Unpaired, unnamed or
+    duplicated specifications are returned as errors.
+    """
+    scanned, errors = scan_spec_tree(root)
+    pairs, pair_errors = pair_spec_files(scanned)
+    return pairs, errors + pair_errors
+
+
+def read_yaml(path: Path) -> dict:
+    with open(path, "rb") as f:
+        data = yaml.load(f, Loader=YAML_LOADER)
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a mapping at the top level of {path}")
+    location = _non_string_key(data, ())
+    if location is not None:
+        raise ValueError(f"Expected string keys, found {location[-1]!r} at {'.'.join(map(str, location))} in {path}")
+    return data
+
+
+def _non_string_key(node, location: Tuple) -> Optional[Tuple]:
+    """Location of the first mapping key that is not a string, e.g. the `1` of `1: x`, which YAML reads as an int."""
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if not isinstance(key, str):
+                return location + (key,)
+            found = _non_string_key(value, location + (key,))
+            if found is not None:
+                return found
+    elif isinstance(node, list):
+        for index, value in enumerate(node):
+            found = _non_string_key(value, location + (index,))
+            if found is not None:
+                return found
+    return None
+
+
+def load_spec_pair(pair: SpecPair) -> ResourceToDbMappingSpec:
+    """Parse both YAML files of a pair and validate them as a single `ResourceToDbMappingSpec`."""
+    data = read_yaml(pair.mapper_path)
+    if pair.resource_path != pair.mapper_path:
+        data.update(read_yaml(pair.resource_path))
+    return ResourceToDbMappingSpec(**data)
+
+
+def validate_pair(pair: SpecPair, cache_key: Optional[str] = None,
+                  cache: Optional["SpecCache"] = None
+                  ) -> Tuple[SpecPair, Optional[ResourceToDbMappingSpec], Optional[str]]:
+    """
+    Load and validate one pair, storing the spec in `cache` under `cache_key`.
+    Returns `(pair, spec, None)`, or `(pair, None, message)` when the pair is invalid.
+
+    Never raises, so one broken spec does not abort the whole pool of `load_spec_directory`.
+    """
+    try:
+        spec = load_spec_pair(pair)
+    except (ValidationError, ValueError, yaml.YAMLError, OSError) as exc:
+        return pair, None, str(exc)
+    if cache is not None:
+        try:
+            cache.put(cache_key, spec)
+        except OSError:
+            pass  # an unwritable cache must not fail the load
+    return pair, spec, None
+
+
+def load_spec_directory(root, max_workers: Optional[int] = None,
+                        cache: Optional["SpecCache"] = None) -> LoadReport:
+    """
+    Discover and validate every specification pair under `root`.
+
+    Pairs are validated in a process pool of `max_workers` processes (defaults
+    to the number of cores). With a single worker, or a single pair, the work
+    is done in-process to avoid the pool start-up cost.
+
+    When a `SpecCache` is given, pairs whose YAML files are unchanged are
+    restored from the cache without parsing or validation, and freshly
+    validated pairs are stored in it.
+    """
+    pairs, errors = discover_spec_pairs(root)
+    report = LoadReport(errors=errors)
+
+    pending, keys = [], []
+    for pair in pairs:
+        key = None
+        if cache is not None:
+            try:
+                key = cache.key_for(pair)
+            except OSError as exc:
+                report.errors.append(SpecLoadError(pair.resource_name, pair.paths, f"Cannot read file: {exc}"))
+                continue
+            spec = cache.get(key)
+            if spec is not None:
+                report.registry[pair.resource_name] = spec
+                continue
+        pending.append(pair)
+        keys.append(key)
+
+    workers = min(max_workers or os.cpu_count() or 1, len(pending))
+    if workers <= 1:
+        _collect(report, map(validate_pair, pending, keys, repeat(cache)))
+    else:
+        chunksize = max(1, len(pending) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            _collect(report, executor.map(validate_pair, pending, keys, repeat(cache), chunksize=chunksize))
+    return report
+
+
+def _collect(report: LoadReport, results) -> None:
+    for pair, spec, error in results:
+        if error is not None:
+            report.errors.append(SpecLoadError(pair.resource_name, pair.paths, error))
+        else:
+            report.registry[pair.resource_name] = spec
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Validate every resource / resourceToDbMapper YAML pair under a directory."
+    )
+    parser.add_argument("root", help="Directory containing the YAML specifications")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Number of worker processes (defaults to the number of cores)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory of the validated-spec cache; unchanged specs are not re-validated")
+    args = parser.parse_args(argv)
+
+    cache = None
+    if args.cache_dir:
+        from .specCache import SpecCache
+        cache = SpecCache(args.cache_dir)
+
+    start = time.perf_counter()
+    report = load_spec_directory(args.root, max_workers=args.workers, cache=cache)
+    elapsed = time.perf_counter() - start
+
+    print(f"Loaded {len(report.registry)} resource specification(s) from {args.root} in {elapsed:.2f}s")
+    if not report.ok:
+        print(report.error_report(), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Live registry of validated specifications.
+
+The registry maps `resource_name` to its `ResourceToDbMappingSpec`. Readers
+never lock: every update builds a new mapping and publishes it with a single
+reference assignment, so a reader sees either the old or the new spec of a
+resource, never a partially updated registry. Writers are serialized.
+
+Along with the specs, the registry keeps the last load error of each
+resource. A resource whose files are currently invalid keeps serving its
+last valid spec.
+"""
+import threading
+from types import MappingProxyType
+from typing import (
+    Dict,
+    Iterator,
+    Mapping,
+    Optional
+)
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .specLoader import LoadReport, SpecLoadError
+
+
+class SpecRegistry:
+    """Thread-safe `resource_name` → spec mapping, updated by atomic swaps."""
+
+    def __init__(self, specs: Optional[Mapping[str, ResourceToDbMappingSpec]] = None):
+        self._specs: Mapping[str, ResourceToDbMappingSpec] = MappingProxyType(dict(specs or {}))
+        self._errors: Mapping[str, SpecLoadError] = MappingProxyType({})
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_report(cls, report: LoadReport) -> "SpecRegistry":
+        registry = cls(report.registry)
+        for error in report.errors:
+            if error.resource_name is not None:
+                registry.set_error(error.resource_name, error)
+        return registry
+
+    # ---- reads ----
+
+    def get(self, resource_name: str) -> Optional[ResourceToDbMappingSpec]:
+        return self._specs.get(resource_name)
+
+    def __getitem__(self, resource_name: str) -> ResourceToDbMappingSpec:
+        return self._specs[resource_name]
+
+    def __contains__(self, resource_name: str) -> bool:
+        return resource_name in self._specs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._specs)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def snapshot(self) -> Mapping[str, ResourceToDbMappingSpec]:
+        """A consistent read-only view of every spec, unaffected by later swaps."""
+        return self._specs
+
+    @property
+    def errors(self) -> Mapping[str, SpecLoadError]:
+        """The current load error of each resource whose files are invalid."""
+        return self._errors
+
+    # ---- writes ----
+
+    def swap(self, resource_name: str, spec: ResourceToDbMappingSpec) -> Optional[ResourceToDbMappingSpec]:
+        """Publish `spec` for `resource_name` and clear its error; returns the spec it replaces."""
+        with self._lock:
+            specs: Dict[str, ResourceToDbMappingSpec] = dict(self._specs)
+            previous = specs.get(resource_name)
+            specs[resource_name] = spec
+            self._specs = MappingProxyType(specs)
+            self._clear_error(resource_name)
+            return previous
+
+    def remove(self, resource_name: str) -> Optional[ResourceToDbMappingSpec]:
+        """Withdraw a resource whose files were deleted; returns the removed spec."""
+        with self._lock:
+            specs = dict(self._specs)
+            previous = specs.pop(resource_name, None)
+            self._specs = MappingProxyType(specs)
+            self._clear_error(resource_name)
+            return previous
+
+    def set_error(self, resource_name: str, error: SpecLoadError) -> None:
+        """Record the load error of a resource; its last valid spec, if any, keeps serving."""
+        with self._lock:
+            errors = dict(self._errors)
+            errors[resource_name] = error
+            self._errors = MappingProxyType(errors)
+
+    def _clear_error(self, resource_name: str) -> None:
+        if resource_name in self._errors:
+            errors = dict(self._errors)
+            del errors[resource_name]
+            self._errors = MappingProxyType(errors)
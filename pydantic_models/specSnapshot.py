@@ -0,0 +1,191 @@
+"""
+Read-only snapshot of a validated specification registry.
+
+A snapshot is a single file compiled once from a validated registry:
+
+```
+MAGIC | header length (8 bytes, little-endian) | JSON header | blob | blob | ...
+```
+
+The header holds the schema fingerprint of the models that wrote it and an
+index `resource_name → (offset, length)` of the pickled specs. A
+`SpecSnapshot` maps the file into memory and unpickles a spec only on its
+first access, so that pre-forked workers share the pages of the file and
+only materialize the resources they actually serve, without re-validating
+the bundle. Lookups by `resource_name` are a dictionary access.
+
+Like the spec cache, the blobs are pickles: only load snapshots written by
+trusted processes.
+
+Usage from the command line:
+
+```
+python -m pydantic_models.specSnapshot path/to/specs specs.snapshot
+```
+"""
+import argparse
+import json
+import mmap
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple
+)
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .specCache import schema_fingerprint
+
+MAGIC = b"RRMLSNP1"
+_LENGTH = struct.Struct("<Q")
+
+
+class SnapshotError(ValueError):
+    """Raised when a snapshot file is malformed or was written by other versions of the models."""
+
+
+def write_snapshot(registry: "Mapping[str, ResourceToDbMappingSpec]", path) -> Path:
+    """Write `registry` to a snapshot file at `path`, atomically replacing any previous snapshot."""
+    path = Path(path)
+    blobs: List[bytes] = []
+    index: Dict[str, Tuple[int, int]] = {}
+    offset = 0
+    for name in sorted(registry):
+        blob = pickle.dumps(registry[name], protocol=pickle.HIGHEST_PROTOCOL)
+        index[name] = (offset, len(blob))
+        blobs.append(blob)
+        offset += len(blob)
+    header = json.dumps({"fingerprint": schema_fingerprint(), "index": index}, separators=(",", ":")).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC)
+            f.write(_LENGTH.pack(len(header)))
+            f.write(header)
+            for blob in blobs:
+                f.write(blob)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+class SpecSnapshot(Mapping):
+    """
+    Read-only `resource_name` → spec mapping backed by a memory-mapped snapshot file.
+    Specs are unpickled on first access and memoized. Thread-safe.
+
+    **Example**
+
+    ```python
+    snapshot = SpecSnapshot("specs.snapshot")   # in the master, before forking
+    spec = snapshot["era"]                      # in a worker, on first use
+    ```
+    """
+
+    def __init__(self, path, check_fingerprint: bool = True):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            # an empty file cannot be mapped
+            if os.fstat(f.fileno()).st_size < len(MAGIC) + _LENGTH.size:
+                raise SnapshotError(f"{self.path} is not a specification snapshot")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._index, self._base = self._read_header(check_fingerprint)
+        except BaseException:
+            self._map.close()
+            raise
+        self._specs: Dict[str, ResourceToDbMappingSpec] = {}
+        self._lock = threading.Lock()
+
+    def _read_header(self, check_fingerprint: bool) -> Tuple[Dict[str, Tuple[int, int]], int]:
+        prefix = len(MAGIC) + _LENGTH.size
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise SnapshotError(f"{self.path} is not a specification snapshot")
+        (length,) = _LENGTH.unpack_from(self._map, len(MAGIC))
+        if prefix + length > len(self._map):
+            raise SnapshotError(f"{self.path} is truncated")
+        try:
+            header = json.loads(self._map[prefix:prefix + length])
+            index = {name: (int(offset), int(size)) for name, (offset, size) in header["index"].items()}
+        except (ValueError, KeyError, TypeError) as exc:
+            raise SnapshotError(f"Malformed header in {self.path}: {exc}") from None
+        if check_fingerprint and header.get("fingerprint") != schema_fingerprint():
+            raise SnapshotError(
+                f"{self.path} was written by another version of the models; rebuild the snapshot"
+            )
+        if any(prefix + length + offset + size > len(self._map) for offset, size in index.values()):
+            raise SnapshotError(f"{self.path} is truncated")
+        return index, prefix + length
+
+    def __getitem__(self, resource_name: str) -> ResourceToDbMappingSpec:
+        spec = self._specs.get(resource_name)
+        if spec is not None:
+            return spec
+        offset, size = self._index[resource_name]
+        with self._lock:
+            spec = self._specs.get(resource_name)
+            if spec is None:
+                start = self._base + offset
+                with memoryview(self._map) as view:
+                    spec = pickle.loads(view[start:start + size])
+                self._specs[resource_name] = spec
+        return spec
+
+    def __contains__(self, resource_name) -> bool:
+        return resource_name in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def loaded(self) -> int:
+        """Number of specs materialized so far."""
+        return len(self._specs)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> "SpecSnapshot":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .specLoader import load_spec_directory
+
+    parser = argparse.ArgumentParser(description="Compile a validated specification directory into a snapshot file.")
+    parser.add_argument("root", help="Directory containing the YAML specifications")
+    parser.add_argument("output", help="Snapshot file to write")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="Number of worker processes (defaults to the number of cores)")
+    args = parser.parse_args(argv)
+
+    report = load_spec_directory(args.root, max_workers=args.workers)
+    if not report.ok:
+        print(report.error_report(), file=sys.stderr)
+        return 1
+    path = write_snapshot(report.registry, args.output)
+    print(f"Wrote {len(report.registry)} resource specification(s) to {path} ({path.stat().st_size} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Hot reload of a specification directory.
+
+`SpecWatcher` watches a directory tree with `watchdog` and, when YAML files
+change, re-validates only the resource / mapper pairs those files belong to.
+A pair that validates is swapped into the live `SpecRegistry`, and only the
+compiled queries, cached results and cached counts of that resource are
+invalidated. A pair that fails keeps serving its last valid spec, and its
+error is recorded in `SpecRegistry.errors` until the files are fixed.
+
+`SpecReloader` holds the reload logic without any dependency on `watchdog`,
+so that reloads can also be triggered explicitly, e.g. from a deployment hook.
+
+Usage from the command line:
+
+```
+python -m pydantic_models.specWatcher path/to/specs
+```
+"""
+import argparse
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Set
+)
+
+from .queryBuilderObjModel import ResourceToDbMappingSpec
+from .specLoader import (
+    SPEC_SUFFIXES,
+    ScannedFiles,
+    SpecLoadError,
+    load_spec_directory,
+    pair_spec_files,
+    scan_spec_file,
+    scan_spec_tree,
+    validate_pair
+)
+from .specRegistry import SpecRegistry
+
+if TYPE_CHECKING:
+    from .resultCache import ResultCache
+    from .rowCounting import CountCache
+    from .specCache import SpecCache
+    from .sqlCompiler import QueryCompiler
+
+logger = logging.getLogger(__name__)
+
+# Seconds without further events before a burst of file changes is processed
+DEFAULT_DEBOUNCE = 0.25
+
+
+class SpecReloader:
+    """
+    Re-validates the specifications touched by a set of changed files and
+    publishes them to `registry`.
+
+    `on_reload(resource_name, spec)` is called after each swap, with `spec`
+    None when the resource was removed.
+    """
+
+    def __init__(self, root, registry: SpecRegistry,
+                 compiler: Optional["QueryCompiler"] = None,
+                 result_cache: Optional["ResultCache"] = None,
+                 count_cache: Optional["CountCache"] = None,
+                 cache: Optional["SpecCache"] = None,
+                 on_reload: Optional[Callable[[str, Optional[ResourceToDbMappingSpec]], None]] = None):
+        self.root = Path(root).resolve()
+        self.registry = registry
+        self.compiler = compiler
+        self.result_cache = result_cache
+        self.count_cache = count_cache
+        self.cache = cache
+        self.on_reload = on_reload
+        self._scanned: ScannedFiles = {}
+        self._lock = threading.Lock()
+        self.rescan()
+
+    def rescan(self) -> None:
+        """Rebuild the file → resource index from the whole directory tree."""
+        scanned, _ = scan_spec_tree(self.root)
+        with self._lock:
+            self._scanned = scanned
+
+    def reload_paths(self, paths: Iterable) -> Set[str]:
+        """Re-validate every resource declared by `paths`, before or after the change; returns their names."""
+        with self._lock:
+            affected: Set[str] = set()
+            for path in {Path(path).resolve() for path in paths}:
+                previous = self._scanned.pop(path, None)
+                if previous is not None:
+                    affected.add(previous[1])
+                try:
+                    segments, name = scan_spec_file(path)
+                except FileNotFoundError:
+                    continue
+                except (OSError, UnicodeDecodeError) as exc:
+                    logger.warning("Cannot read specification file %s: %s", path, exc)
+                    continue
+                if segments and name is not None:
+                    self._scanned[path] = (segments, name)
+                    affected.add(name)
+            for name in sorted(affected):
+                self._reload(name)
+            return affected
+
+    def _reload(self, name: str) -> None:
+        files = {path: scan for path, scan in self._scanned.items() if scan[1] == name}
+        if not files:
+            if self.registry.remove(name) is not None:
+                logger.info("Resource '%s' removed: its specification files were deleted", name)
+                self._invalidate(name, None)
+            return
+
+        pairs, errors = pair_spec_files(files)
+        if errors:
+            self._fail(errors[0] if len(errors) == 1 else SpecLoadError(
+                name, tuple(dict.fromkeys(path for error in errors for path in error.paths)),
+                "\n".join(error.message for error in errors)
+            ))
+            return
+        pair = pairs[0]
+        key = None
+        if self.cache is not None:
+            try:
+                key = self.cache.key_for(pair)
+            except OSError as exc:
+                self._fail(SpecLoadError(name, pair.paths, f"Cannot read file: {exc}"))
+                return
+        _, spec, error = validate_pair(pair, key, self.cache)
+        if error is not None:
+            self._fail(SpecLoadError(name, pair.paths, error))
+            return
+        self.registry.swap(name, spec)
+        logger.info("Resource '%s' reloaded from %s", name, ", ".join(str(path) for path in pair.paths))
+        self._invalidate(name, spec)
+
+    def _fail(self, error: SpecLoadError) -> None:
+        self.registry.set_error(error.resource_name, error)
+        serving = "the last valid specification keeps serving" if error.resource_name in self.registry \
+            else "the resource is not served"
+        logger.error("Resource '%s' failed to reload, %s:\n%s", error.resource_name, serving, error)
+
+    def _invalidate(self, name: str, spec: Optional[ResourceToDbMappingSpec]) -> None:
+        if self.compiler is not None:
+            self.compiler.invalidate(name)
+        if self.result_cache is not None:
+            self.result_cache.invalidate_resource(name)
+        if self.count_cache is not None:
+            self.count_cache.invalidate(name)
+        if self.on_reload is not None:
+            self.on_reload(name, spec)
+
+
+# watchdog events that may change a file; reading the files, as the reloader does, emits other ones
+CHANGE_EVENTS = frozenset({"created", "modified", "moved", "deleted", "closed"})
+
+
+class _EventCollector:
+    """watchdog event handler queueing the YAML paths of every change event."""
+
+    def __init__(self, watcher: "SpecWatcher"):
+        self.watcher = watcher
+
+    def dispatch(self, event) -> None:
+        if event.is_directory or event.event_type not in CHANGE_EVENTS:
+            return
+        paths = [event.src_path, getattr(event, "dest_path", None)]
+        self.watcher.notify(path for path in paths if path and str(path).endswith(SPEC_SUFFIXES))
+
+
+class SpecWatcher:
+    """
+    Watches `reloader.root` and hands the changed files to `reloader` once
+    no event arrived for `debounce` seconds, so that an editor saving a file
+    in several steps triggers a single re-validation.
+
+    **Example**
+
+    ```python
+    report = load_spec_directory("specs")
+    registry = SpecRegistry.from_report(report)
+    with SpecWatcher(SpecReloader("specs", registry, compiler=compiler)):
+        serve(registry)
+    ```
+    """
+
+    def __init__(self, reloader: SpecReloader, debounce: float = DEFAULT_DEBOUNCE):
+        self.reloader = reloader
+        self.debounce = debounce
+        self._pending: Set[str] = set()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._observer = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SpecWatcher":
+        try:
+            from watchdog.observers import Observer
+        except ImportError as exc:
+            raise ImportError("Watching specification files requires the `watchdog` package") from exc
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="spec-watcher", daemon=True)
+        self._thread.start()
+        self._observer = Observer()
+        self._observer.schedule(_EventCollector(self), str(self.reloader.root), recursive=True)
+        self._observer.start()
+        return self
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "SpecWatcher":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.stop()
+
+    def notify(self, paths: Iterable[str]) -> None:
+        with self._condition:
+            self._pending.update(str(path) for path in paths)
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                # wait for the burst of events to settle
+                while self._condition.wait(timeout=self.debounce) and not self._stopped:
+                    pass
+                if self._stopped:
+                    return
+                paths, self._pending = self._pending, set()
+            try:
+                self.reloader.reload_paths(paths)
+            except Exception:
+                logger.exception("Reloading %s failed", sorted(paths))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Validate a specification directory, then re-validate its resources as their files change."
+    )
+    parser.add_argument("root", help="Directory containing the YAML specifications")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    report = load_spec_directory(args.root)
+    registry = SpecRegistry.from_report(report)
+    logger.info("Loaded %d resource specification(s) from %s", len(registry), args.root)
+    if not report.ok:
+        logger.error(report.error_report())
+    with SpecWatcher(SpecReloader(args.root, registry)):
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,775 @@
+"""
+Compilation of a validated `ResourceToDbMappingSpec` into SQL.
+
+The `QueryCompiler` turns a spec and the shape of a REST request (selected
+attributes, filters, sorting, pagination) into a `CompiledQuery`. Compiled
+statements are memoized per `(resource_name, shape)` with LRU eviction, so that
+serving a request only costs a dictionary lookup once the shape has been seen.
+
+`QueryCompiler.compile_count` builds the matching row-count statement, which
+joins only the tables the filters need and has no ORDER BY. With
+`rowCounting: window` the total is instead returned with every row of the page
+through `COUNT(*) OVER ()`.
+
+Every value compared in a condition, whether it comes from the spec or from a
+REST filter, is sent as a bind parameter: the statement text depends only on
+the shape of the request, which keeps the statement / plan cache of the
+database warm. `in` lists are padded to a few fixed arities
+(`IN_LIST_BUCKETS`) so that the number of distinct statements stays bounded.
+
+**Example**
+
+```python
+compiler = QueryCompiler(dialect=ORACLE)
+request = QueryRequest(fields=("name", "start_run"), filters=(Filter("start_run", "gt", 1000),), limit=50)
+query = compiler.compile(spec, request)
+cursor.execute(query.sql, query.bind(request))
+```
+"""
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+    Union
+)
+
+from .enum import ComparisonOperator
+from .mappingDependencies import (
+    MappingDependencies,
+    is_aggregate,
+    is_grouped_subselect,
+    mapped_attributes
+)
+from .keysetPagination import (
+    KeysetColumn,
+    cursor_from_row,
+    decode_cursor,
+    keyset_columns,
+    keyset_param,
+    keyset_predicate
+)
+from .projection import expand_fieldset, parse_fieldset, subselect_columns
+from .queryBuilderObjModel import (
+    AdditionalTable,
+    CaseExpression,
+    Condition,
+    DBColumnReference,
+    Expression,
+    Function,
+    FunctionCall,
+    Regex,
+    RelationKey,
+    ResourceToDbMappingSpec,
+    TableAttribute
+)
+
+JOIN_KEYWORDS = {
+    "innerJoin": "INNER JOIN",
+    "leftJoin": "LEFT JOIN",
+    "rightJoin": "RIGHT JOIN",
+    "asSubselect": "LEFT JOIN",
+}
+
+OFFSET_PARAM = "rrml_offset"
+LIMIT_PARAM = "rrml_limit"
+COUNT_LIMIT_PARAM = "rrml_count_limit"
+WINDOW_COUNT_COLUMN = "rrml_total_count"
+
+# Upper bound of `rowCounting: estimate` when the spec does not set `rowCountingOptions.limit`
+DEFAULT_COUNT_LIMIT = 10000
+
+# Arities an `in` list is padded to. Longer lists are split in chunks of the largest
+# arity, which also stays below the 1000 elements Oracle accepts in a single list.
+IN_LIST_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class SqlCompileError(ValueError):
+    """Raised when a spec or a request cannot be turned into SQL."""
+
+
+@dataclass(frozen=True)
+class Dialect:
+    """The few syntax differences between the supported database backends."""
+    name: str
+    paramstyle: str = "named"       # `named` (:name) or `pyformat` (%(name)s)
+    true_literal: str = "1"
+    false_literal: str = "0"
+    limit_style: str = "fetch"      # `fetch` (OFFSET .. FETCH NEXT ..) or `limit` (LIMIT .. OFFSET ..)
+    row_values: bool = False        # supports row value comparisons such as (a, b) > (:a, :b)
+    integer_division: bool = False  # an integer divided by an integer is an integer (Oracle NUMBER division is exact)
+
+    def param(self, name: str) -> str:
+        if self.paramstyle == "pyformat":
+            return f"%({name})s"
+        return f":{name}"
+
+    def string(self, value: str) -> str:
+        escaped = value.replace("'", "''")
+        if self.paramstyle == "pyformat":
+            escaped = escaped.replace("%", "%%")
+        return f"'{escaped}'"
+
+    def adapt(self, value: Any) -> Any:
+        """Bind value for `value`; booleans become 1/0 on backends without a native boolean type."""
+        if isinstance(value, bool) and self.true_literal == "1":
+            return int(value)
+        return value
+
+    def paginate(self) -> str:
+        offset, limit = self.param(OFFSET_PARAM), self.param(LIMIT_PARAM)
+        if self.limit_style == "limit":
+            return f"LIMIT {limit} OFFSET {offset}"
+        return f"OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY"
+
+    def first_rows(self, name: str) -> str:
+        if self.limit_style == "limit":
+            return f"LIMIT {self.param(name)}"
+        return f"FETCH FIRST {self.param(name)} ROWS ONLY"
+
+
+ORACLE = Dialect("oracle")
+POSTGRES = Dialect(
+    "postgres", paramstyle="pyformat", true_literal="TRUE", false_literal="FALSE", row_values=True, integer_division=True
+)
+SQLITE = Dialect("sqlite", limit_style="limit", row_values=True, integer_division=True)
+
+
+def in_list_arity(size: int) -> int:
+    """Number of bind parameters an `in` list of `size` values is padded to."""
+    if size == 0:
+        return 0
+    largest = IN_LIST_BUCKETS[-1]
+    if size > largest:
+        return -(-size // largest) * largest
+    return IN_LIST_BUCKETS[bisect_left(IN_LIST_BUCKETS, size)]
+
+
+def _is_null(value: Any) -> bool:
+    return value is None or (isinstance(value, str) and value.lower() == "null")
+
+
+def _as_list(value: Any) -> List[Any]:
+    return list(value) if isinstance(value, (list, tuple, set, frozenset)) else [value]
+
+
+@dataclass(frozen=True)
+class Filter:
+    """A REST-level filter `attribute operator value` on a resource attribute."""
+    attribute: str
+    operator: str
+    value: Any = None
+
+    def arity(self) -> int:
+        """Number of bind parameters the filter takes in the statement."""
+        if self.operator in (ComparisonOperator.IS, ComparisonOperator.ISNOT):
+            return 0
+        if self.operator == ComparisonOperator.IN:
+            return in_list_arity(len(_as_list(self.value)))
+        return 1
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    """
+    The part of a request that determines the SQL text. Requests with the same
+    shape share one compiled statement and only differ in their bind values.
+
+    `fields` and `sort` are those of the request, as given: building a shape
+    costs no more than reading the request, so that a statement already
+    compiled is found with a single dictionary lookup.
+    `filters` holds one `(attribute, operator, arity)` triple per REST filter.
+    With keyset pagination, `keyset` tells which values of the cursor are
+    NULL, and is None on the first page. `count` selects the row-count
+    statement of the request instead of its page.
+    """
+    fields: Optional[Tuple[str, ...]] = None
+    filters: Tuple[Tuple[str, str, int], ...] = ()
+    sort: Optional[Tuple[Tuple[str, str], ...]] = None
+    paginate: bool = False
+    keyset: Optional[Tuple[bool, ...]] = None
+    count: bool = False
+
+
+@dataclass(frozen=True)
+class QueryRequest:
+    """
+    A REST-level query on a resource.
+
+    - `fields`: the resource attributes to return, all of them when omitted. The `fields=a,b,c`
+      query parameter may be given as is, it is parsed by `projection.parse_fieldset`.
+      The `isKey` attributes are always returned.
+    - `filters`: `Filter`s combined with AND.
+    - `sort`: `(attribute, "asc" | "desc")` pairs overriding the `defaultSort`.
+    - `offset` / `limit`: the requested page, ignored when pagination is disabled.
+    - `cursor`: with keyset pagination, the token returned with the previous page; it replaces `offset`.
+    """
+    fields: Optional[Tuple[str, ...]] = None
+    filters: Tuple[Filter, ...] = ()
+    sort: Optional[Tuple[Tuple[str, str], ...]] = None
+    offset: int = 0
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    # (keyset columns, values) of the decoded cursor, shared by `shape` and `CompiledQuery.bind`
+    _cursor_values: Optional[Tuple[Tuple[KeysetColumn, ...], Tuple[Any, ...]]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    def __post_init__(self):
+        if isinstance(self.fields, str):
+            object.__setattr__(self, "fields", parse_fieldset(self.fields))
+        elif self.fields is not None:
+            object.__setattr__(self, "fields", tuple(self.fields))
+
+    def cursor_values(self, columns: Tuple[KeysetColumn, ...]) -> Tuple[Any, ...]:
+        """The keyset values held by `cursor`, decoded once per request."""
+        cached = self._cursor_values
+        if cached is None or cached[0] != columns:
+            cached = (columns, tuple(decode_cursor(columns, self.cursor)))
+            object.__setattr__(self, "_cursor_values", cached)
+        return cached[1]
+
+    def normalized_filters(self) -> Tuple[Filter, ...]:
+        """The filters in a canonical order, so that equivalent requests share one statement."""
+        return tuple(sorted(self.filters, key=lambda f: (f.attribute, str(f.operator))))
+
+    def filter_shapes(self) -> Tuple[Tuple[str, str, int], ...]:
+        """The `(attribute, operator, arity)` triples of the filters; their values are bound, not compiled."""
+        for f in self.filters:
+            if f.operator in (ComparisonOperator.IS, ComparisonOperator.ISNOT) and not _is_null(f.value):
+                # the value of a null check is not bound: it must not be silently dropped
+                raise SqlCompileError(f"Operator '{f.operator}' on '{f.attribute}' only accepts the value null")
+        return tuple((f.attribute, str(f.operator), f.arity()) for f in self.normalized_filters())
+
+    def shape(self, spec: ResourceToDbMappingSpec) -> QueryShape:
+        paginate = self.limit is not None and spec.resourceToDbMapper.pagination != "disabled"
+        keyset = None
+        if self.cursor and spec.resourceToDbMapper.pagination == "keyset":
+            # NULL cursor values are compared with IS NULL: which ones are NULL is part of the SQL text
+            keyset = tuple(value is None for value in self.cursor_values(keyset_columns(spec, self.sort)))
+        return QueryShape(fields=self.fields, filters=self.filter_shapes(), sort=self.sort, paginate=paginate, keyset=keyset)
+
+    def count_shape(self) -> QueryShape:
+        """Shape of the row-count statement: only the filters matter."""
+        return QueryShape(filters=self.filter_shapes(), count=True)
+
+
+def filter_param(index: int, position: Optional[int] = None) -> str:
+    """Bind parameter name of the `index`-th filter (and `position`-th element of an `in` list)."""
+    return f"rrml_f{index}" if position is None else f"rrml_f{index}_{position}"
+
+
+@dataclass(frozen=True)
+class CompiledQuery:
+    """
+    The SQL text of one statement shape and the resource attributes it returns, in order.
+
+    `static_params` holds the bind values of the conditions written in the
+    spec; the values of a request are added by `bind`. `keyset` holds the
+    order of keyset pagination, empty for other pagination modes.
+
+    With `window_count`, every row carries the total row count in an extra
+    last column, `WINDOW_COUNT_COLUMN`, which is not listed in `columns`.
+    """
+    resource_name: str
+    sql: str
+    columns: Tuple[str, ...]
+    shape: QueryShape = QueryShape()
+    static_params: Mapping[str, Any] = field(default_factory=dict)
+    dialect: "Dialect" = None
+    keyset: Tuple[KeysetColumn, ...] = ()
+    window_count: bool = False
+    count_limit: Optional[int] = None
+
+    @property
+    def paginated(self) -> bool:
+        return self.shape.paginate
+
+    def next_cursor(self, row: Mapping[str, Any]) -> Optional[str]:
+        """Cursor token of the page following `row`, the last record of a page (keyset pagination only)."""
+        return cursor_from_row(self.keyset, row) if self.keyset else None
+
+    def bind(self, request: QueryRequest) -> Dict[str, Any]:
+        """Bind values of `request` for this statement."""
+        params = dict(self.static_params)
+        adapt = self.dialect.adapt if self.dialect else (lambda value: value)
+        for index, (flt, (_, _, arity)) in enumerate(zip(request.normalized_filters(), self.shape.filters)):
+            if flt.operator == ComparisonOperator.IN:
+                values = _as_list(flt.value)
+                values += values[-1:] * (arity - len(values))
+                for position, value in enumerate(values):
+                    params[filter_param(index, position)] = adapt(value)
+            elif arity:
+                params[filter_param(index)] = adapt(flt.value)
+        if self.shape.keyset is not None:
+            for index, value in enumerate(request.cursor_values(self.keyset)):
+                if value is not None:
+                    params[keyset_param(index)] = adapt(value)
+        if self.paginated:
+            params[OFFSET_PARAM] = 0 if self.keyset else request.offset
+            params[LIMIT_PARAM] = request.limit
+        if self.count_limit is not None:
+            params[COUNT_LIMIT_PARAM] = self.count_limit
+        return params
+
+
+Operand = Union[Expression, FunctionCall, DBColumnReference, str, int, float, bool, None]
+
+
+class SqlBuilder:
+    """
+    Renders the nodes of a spec as SQL fragments for one dialect.
+
+    Condition values are not inlined: each one is collected in `params` and
+    replaced by a bind parameter.
+    """
+
+    def __init__(self, dialect: Dialect = ORACLE):
+        self.dialect = dialect
+        self.params: Dict[str, Any] = {}
+
+    def bind(self, value: Any) -> str:
+        name = f"rrml_c{len(self.params)}"
+        self.params[name] = self.dialect.adapt(value)
+        return self.dialect.param(name)
+
+    # ---- values and expressions ----
+
+    def literal(self, value: Any) -> str:
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            return self.dialect.true_literal if value else self.dialect.false_literal
+        if isinstance(value, (int, float)):
+            return repr(value)
+        return self.dialect.string(str(value))
+
+    def operand(self, value: Operand, owner: str) -> str:
+        if isinstance(value, DBColumnReference):
+            return f"{value.table}.{value.column}"
+        if isinstance(value, FunctionCall):
+            return self.function(value.function, owner)
+        if isinstance(value, Expression):
+            return self.expression(value, owner)
+        return self.literal(value)
+
+    def function(self, function: Function, owner: str, column: Optional[str] = None) -> str:
+        args = [column] if column else []
+        args.extend(self.operand(param, owner) for param in function.params or [])
+        distinct = "DISTINCT " if function.distinct else ""
+        return f"{function.name}({distinct}{', '.join(args)})"
+
+    def expression(self, expression: Expression, owner: str) -> str:
+        left = self.operand(expression.left, owner)
+        right = self.operand(expression.right, owner)
+        return f"({left} {expression.operator.symbol} {right})"
+
+    def case(self, branches: List[CaseExpression], owner: str) -> str:
+        parts = ["CASE"]
+        fallback = None
+        for branch in branches:
+            parts.append(f"WHEN {self.condition(branch.when, owner)} THEN {self.operand(branch.then, owner)}")
+            if branch.else_ is not None:
+                fallback = branch.else_
+        if fallback is not None:
+            parts.append(f"ELSE {self.operand(fallback, owner)}")
+        parts.append("END")
+        return " ".join(parts)
+
+    def regex(self, regex: Regex, column: str) -> str:
+        args = ", ".join(str(group) for group in regex.groups)
+        return f"REGEXP_SUBSTR({column}, {self.dialect.string(regex.pattern)}{', ' if args else ''}{args})"
+
+    # ---- predicates ----
+
+    def condition(self, condition: Union[Condition, Regex], owner: str) -> str:
+        if isinstance(condition, Regex):
+            return f"{self.regex(condition, f'{owner}.{condition.column}')} IS NOT NULL"
+
+        column = f"{condition.table or owner}.{condition.column}"
+        operator = condition.operator
+        if not isinstance(operator, ComparisonOperator):
+            raise SqlCompileError(
+                f"Operator '{operator}' cannot be used in a condition on '{column}', a comparison operator is expected"
+            )
+        if operator in (ComparisonOperator.IS, ComparisonOperator.ISNOT):
+            if not _is_null(condition.value):
+                raise SqlCompileError(f"Operator '{operator}' on '{column}' only accepts the value null")
+            return f"{column} {operator.symbol.upper()} NULL"
+        if operator is ComparisonOperator.IN:
+            values = _as_list(condition.value)
+            if not values:
+                return "1 = 0"
+            return f"{column} IN ({', '.join(self.bind(value) for value in values)})"
+        return f"{column} {operator.symbol.upper()} {self.bind(condition.value)}"
+
+    def filter(self, column: str, operator: str, arity: int, index: int) -> str:
+        """Predicate of the `index`-th REST filter, whose values are bound at execution time."""
+        try:
+            operator = ComparisonOperator(operator)
+        except ValueError:
+            raise SqlCompileError(f"Invalid filter operator '{operator}' on '{column}'") from None
+        if operator in (ComparisonOperator.IS, ComparisonOperator.ISNOT):
+            return f"{column} {operator.symbol.upper()} NULL"
+        if operator is ComparisonOperator.IN:
+            if arity == 0:
+                return "1 = 0"
+            chunk = IN_LIST_BUCKETS[-1]
+            lists = [
+                f"{column} IN ({', '.join(self.dialect.param(filter_param(index, p)) for p in range(start, min(start + chunk, arity)))})"
+                for start in range(0, arity, chunk)
+            ]
+            return lists[0] if len(lists) == 1 else "(" + " OR ".join(lists) + ")"
+        return f"{column} {operator.symbol.upper()} {self.dialect.param(filter_param(index))}"
+
+    # ---- mapped attributes ----
+
+    def attribute(self, field: TableAttribute, owner: str) -> str:
+        """SQL expression of a mapped attribute, evaluated in the scope of the `owner` table."""
+        column = f"{owner}.{field.attNamedb}" if field.attNamedb else None
+        if field.function:
+            return self.function(field.function, owner, column)
+        if field.expression:
+            return self.expression(field.expression, owner)
+        if field.case_expression:
+            return self.case(field.case_expression, owner)
+        return column
+
+    def relation_key(self, key: RelationKey, table: AdditionalTable, table_side: Optional[str] = None) -> str:
+        """Equality of one relation key; `table_side` replaces the additional table column (subselects)."""
+        target_column = f"{table.relationTable}.{key.targetKey or key.tableKey}"
+        table_column = table_side or f"{table.namedb}.{key.tableKey}"
+        if key.regex and table_side is None:
+            if key.targetKey and key.regex.column == key.targetKey:
+                target_column = self.regex(key.regex, target_column)
+            elif key.regex.column == key.tableKey:
+                table_column = self.regex(key.regex, table_column)
+            else:
+                raise SqlCompileError(
+                    f"Regex column '{key.regex.column}' of table '{table.namedb}' does not match any of its relation keys"
+                )
+        return f"{target_column} = {table_column}"
+
+
+class StatementCompiler:
+    """
+    Builds the SQL statement of one spec for one `QueryShape`.
+
+    Only the additional tables the shape needs are joined, see `MappingDependencies.tables_to_join`.
+    With keyset pagination, the keyset attributes are always selected so that
+    the cursor of the next page can be taken from the last row.
+    """
+
+    def __init__(self, spec: ResourceToDbMappingSpec, dialect: Dialect = ORACLE):
+        self.spec = spec
+        self.mapper = spec.resourceToDbMapper
+        self.sql = SqlBuilder(dialect)
+        self.dialect = dialect
+        self.mapping = mapped_attributes(spec)
+        self.dependencies = MappingDependencies.from_spec(spec)
+
+    def compile(self, shape: QueryShape) -> CompiledQuery:
+        if shape.count:
+            return self.compile_count(shape)
+        keyset = ()
+        if self.mapper.pagination == "keyset":
+            self.sort_items(shape)  # validates the requested sort
+            keyset = keyset_columns(self.spec, shape.sort)
+        columns = self.select_attributes(shape)
+        if keyset:
+            selected = set(columns) | {column.attribute for column in keyset}
+            columns = tuple(field.name for field in self.spec.resource.fields if field.name in selected)
+        used = set(columns)
+        used.update(attribute for attribute, _, _ in shape.filters)
+        used.update(name for name, _ in self.sort_items(shape))
+        joined = set(self.dependencies.tables_to_join(used))
+        select = [f"{self.select_expression(name)} AS {name}" for name in columns]
+        # keyset pages after the first are counted separately: the window would only see the rows after the cursor
+        window_count = self.mapper.rowCounting == "window" and shape.keyset is None
+        if window_count:
+            select.append(f"COUNT(*) OVER () AS {WINDOW_COUNT_COLUMN}")
+        lines = ["SELECT " + ", ".join(select)] + self.from_clause(joined, used)
+        where, having = self.filters(shape)
+        if shape.keyset is not None:
+            predicate = keyset_predicate(
+                keyset, [self.select_expression(column.attribute) for column in keyset],
+                shape.keyset, self.dialect.param, row_values=self.dialect.row_values
+            )
+            aggregated = any(self.is_aggregated(column.attribute) for column in keyset)
+            (having if aggregated else where).append(predicate)
+        if where:
+            lines.append("WHERE " + " AND ".join(where))
+        if self.mapper.groupBy:
+            lines.append("GROUP BY " + ", ".join(self.group_by_column(item) for item in self.mapper.groupBy))
+        if having:
+            lines.append("HAVING " + " AND ".join(having))
+        if keyset:
+            order_by = ", ".join(f"{column.attribute} {column.order_by}" for column in keyset)
+        else:
+            order_by = self.order_by(shape, columns)
+        if order_by:
+            lines.append("ORDER BY " + order_by)
+        if shape.paginate:
+            lines.append(self.dialect.paginate())
+        return CompiledQuery(
+            resource_name=self.spec.resource.resource_name,
+            sql="\n".join(lines),
+            columns=columns,
+            shape=shape,
+            static_params=self.sql.params,
+            dialect=self.dialect,
+            keyset=keyset,
+            window_count=window_count,
+        )
+
+    def compile_count(self, shape: QueryShape) -> CompiledQuery:
+        """
+        Row-count statement of the filters of `shape`. Only the tables the
+        filters need are joined, and there is no ORDER BY. With
+        `rowCounting: estimate`, counting stops after `rowCountingOptions.limit` rows.
+        """
+        used = {attribute for attribute, _, _ in shape.filters}
+        joined = set(self.dependencies.tables_to_join(used))
+        lines = ["SELECT 1"] + self.from_clause(joined, used)
+        where, having = self.filters(shape)
+        if where:
+            lines.append("WHERE " + " AND ".join(where))
+        if self.mapper.groupBy:
+            lines.append("GROUP BY " + ", ".join(self.group_by_column(item) for item in self.mapper.groupBy))
+        if having:
+            lines.append("HAVING " + " AND ".join(having))
+
+        count_limit = None
+        if self.mapper.rowCounting == "estimate":
+            options = self.mapper.rowCountingOptions
+            count_limit = (options.limit if options and options.limit else None) or DEFAULT_COUNT_LIMIT
+            lines.append(self.dialect.first_rows(COUNT_LIMIT_PARAM))
+
+        inner = "\n".join(lines)
+        return CompiledQuery(
+            resource_name=self.spec.resource.resource_name,
+            sql=f"SELECT COUNT(*) AS rrml_count FROM (\n{inner}\n) rrml_rows",
+            columns=("rrml_count",),
+            shape=shape,
+            static_params=self.sql.params,
+            dialect=self.dialect,
+            count_limit=count_limit,
+        )
+
+    def from_clause(self, joined: Set[str], used: Set[str]) -> List[str]:
+        lines = [f"FROM {self.mapper.dbSchema}.{self.mapper.masterTable} {self.mapper.masterTable}"]
+        tables = self.dependencies.tables
+        lines.extend(self.join(tables[name], used) for name in self.dependencies.graph.order if name in joined)
+        return lines
+
+    # ---- select list ----
+
+    def select_attributes(self, shape: QueryShape) -> Tuple[str, ...]:
+        return expand_fieldset(self.spec, shape.fields)
+
+    def check_attributes(self, names, segment: str) -> None:
+        unknown = [name for name in names if name not in self.mapping]
+        if unknown:
+            raise SqlCompileError(
+                f"Unknown attribute(s) {unknown} in `{segment}` of resource '{self.spec.resource.resource_name}'"
+            )
+
+    def select_expression(self, name: str) -> str:
+        field, table = self.mapping[name]
+        if table is None:
+            return self.sql.attribute(field, self.mapper.masterTable)
+        if table.relation == "asSubselect":
+            return f"{table.namedb}.{name}"
+        return self.sql.attribute(field, table.namedb)
+
+    # ---- filters ----
+
+    def filters(self, shape: QueryShape) -> Tuple[List[str], List[str]]:
+        """Predicates of the REST filters: WHERE for row values, HAVING for aggregated attributes."""
+        self.check_attributes([attribute for attribute, _, _ in shape.filters], "filters")
+        where, having = [], []
+        for index, (attribute, operator, arity) in enumerate(shape.filters):
+            predicate = self.sql.filter(self.select_expression(attribute), operator, arity, index)
+            (having if self.is_aggregated(attribute) else where).append(predicate)
+        return where, having
+
+    def is_aggregated(self, attribute: str) -> bool:
+        """True when the attribute is aggregated by the outer query, so that it can only be filtered in HAVING."""
+        field, table = self.mapping[attribute]
+        return is_aggregate(field) and (table is None or table.relation != "asSubselect")
+
+    # ---- joins ----
+
+    def join(self, table: AdditionalTable, used: Set[str]) -> str:
+        keyword = JOIN_KEYWORDS[table.relation]
+        if table.relation == "asSubselect":
+            on = [
+                self.sql.relation_key(key, table, table_side=f"{table.namedb}.{key.tableKey}")
+                for key in table.relationKeys
+            ]
+            return f"{keyword} ({self.subselect(table, used)}) {table.namedb} ON " + " AND ".join(on)
+
+        on = [self.sql.relation_key(key, table) for key in table.relationKeys]
+        on.extend(self.sql.condition(condition, table.namedb) for condition in table.conditions or [])
+        return f"{keyword} {table.dbSchema}.{table.namedb} {table.namedb} ON " + " AND ".join(on)
+
+    def subselect_key(self, key: RelationKey, table: AdditionalTable) -> str:
+        column = f"{table.namedb}.{key.tableKey}"
+        if key.regex and key.regex.column == key.tableKey:
+            return self.sql.regex(key.regex, column)
+        return column
+
+    def subselect(self, table: AdditionalTable, used: Set[str]) -> str:
+        """
+        Render an `asSubselect` table as a derived table grouped by its relation keys.
+        Only the attributes in `used` are computed, reading only the columns they need.
+
+        Attributes with a `sort` are evaluated on the rows ranked first by their
+        window function, e.g. `DENSE_RANK() OVER (PARTITION BY keys ORDER BY by)`.
+        """
+        alias = table.namedb
+        keys = [self.subselect_key(key, table) for key in table.relationKeys]
+        fields = [field for field in table.fields or [] if field.attNameResource in used]
+
+        rank_columns: Dict[Tuple[str, str, str], str] = {}
+        for field in fields:
+            if field.sort:
+                sort = field.sort
+                rank_columns.setdefault(
+                    (sort.type or "row_number", sort.by, sort.order or "asc"),
+                    f"rrml_rank_{len(rank_columns)}"
+                )
+
+        select = [f"{key} AS {relation_key.tableKey}" for key, relation_key in zip(keys, table.relationKeys)]
+        for field in fields:
+            if field.sort:
+                sort = field.sort
+                rank = rank_columns[(sort.type or "row_number", sort.by, sort.order or "asc")]
+                column = f"CASE WHEN {alias}.{rank} = 1 THEN {alias}.{field.attNamedb} END"
+                if field.function:
+                    expression = self.sql.function(field.function, alias, column)
+                else:
+                    expression = f"MAX({column})"
+            else:
+                expression = self.sql.attribute(field, alias)
+            select.append(f"{expression} AS {field.attNameResource}")
+
+        source = f"{table.dbSchema}.{table.namedb} {alias}"
+        where = [self.sql.condition(condition, alias) for condition in table.conditions or []]
+        if rank_columns:
+            partition = ", ".join(keys)
+            windows = [
+                f"{rank_type.upper()}() OVER (PARTITION BY {partition} ORDER BY {alias}.{by} {order.upper()}) AS {name}"
+                for (rank_type, by, order), name in rank_columns.items()
+            ]
+            columns = [f"{alias}.{column}" for column in subselect_columns(table, used)]
+            inner = f"SELECT {', '.join(columns + windows)} FROM {source}"
+            if where:
+                inner += " WHERE " + " AND ".join(where)
+                where = []
+            source = f"({inner}) {alias}"
+
+        sql = f"SELECT {', '.join(select)} FROM {source}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if is_grouped_subselect(table):
+            sql += " GROUP BY " + ", ".join(keys)
+        return sql
+
+    # ---- grouping and ordering ----
+
+    def group_by_column(self, item: str) -> str:
+        for field in self.mapper.fields or []:
+            if field.attNamedb == item:
+                return f"{self.mapper.masterTable}.{item}"
+        for table in self.mapper.additionalTables or []:
+            if table.relation == "asSubselect":
+                continue
+            for field in table.fields or []:
+                if field.attNamedb == item:
+                    return f"{table.namedb}.{item}"
+        return item
+
+    def sort_items(self, shape: QueryShape) -> List[Tuple[str, str]]:
+        if shape.sort is not None:
+            self.check_attributes([name for name, _ in shape.sort], "sort")
+            for name, order in shape.sort:
+                if order not in ("asc", "desc"):
+                    raise SqlCompileError(f"Invalid sort order '{order}' for attribute '{name}'")
+            return list(shape.sort)
+        default = self.mapper.defaultSort
+        if default is None:
+            return []
+        return [(name, default.order or "asc") for name in default.fields]
+
+    def order_by(self, shape: QueryShape, columns: Tuple[str, ...]) -> str:
+        """
+        Order by the select alias when the attribute is projected, by its expression otherwise.
+        The `nulls` placement of the `defaultSort` only applies to it, not to the sort of a request.
+        """
+        default = self.mapper.defaultSort
+        nulls = default.nulls if default is not None and shape.sort is None else None
+        suffix = f" NULLS {nulls.upper()}" if nulls else ""
+        return ", ".join(
+            f"{name if name in columns else self.select_expression(name)} {order.upper()}{suffix}"
+            for name, order in self.sort_items(shape)
+        )
+
+
+class QueryCompiler:
+    """
+    Compiles specs into SQL and memoizes the statements per `(resource_name, shape)`.
+
+    The cache is a bounded LRU: once `maxsize` statements are held, the least
+    recently used one is evicted. It is safe to share between threads.
+    """
+
+    def __init__(self, dialect: Dialect = ORACLE, maxsize: int = 1024):
+        self.dialect = dialect
+        self.maxsize = maxsize
+        self._cache: "OrderedDict[Tuple[str, QueryShape], CompiledQuery]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def compile(self, spec: ResourceToDbMappingSpec,
+                request: Union[QueryRequest, QueryShape, None] = None) -> CompiledQuery:
+        if request is None:
+            request = QueryShape()
+        shape = request.shape(spec) if isinstance(request, QueryRequest) else request
+        key = (spec.resource.resource_name, shape)
+
+        with self._lock:
+            compiled = self._cache.get(key)
+            if compiled is not None:
+                self._cache.move_to_end(key)
+                return compiled
+
+        compiled = StatementCompiler(spec, self.dialect).compile(shape)
+        with self._lock:
+            self._cache[key] = compiled
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+        return compiled
+
+    def compile_count(self, spec: ResourceToDbMappingSpec, request: Optional[QueryRequest] = None) -> CompiledQuery:
+        """Row-count statement of `request`, memoized like the page statements."""
+        return self.compile(spec, (request or QueryRequest()).count_shape())
+
+    def invalidate(self, resource_name: Optional[str] = None) -> None:
+        """Drop the statements of one resource, or of every resource when no name is given."""
+        with self._lock:
+            if resource_name is None:
+                self._cache.clear()
+            else:
+                for key in [key for key in self._cache if key[0] == resource_name]:
+                    del self._cache[key]
+
+    def __len__(self) -> int:
+        return len(self._cache)
@@ -0,0 +1,144 @@
+"""
+"Did you mean" suggestions over a fixed vocabulary.
+
+`SuggestionIndex(words).suggest(word)` returns exactly what
+`difflib.get_close_matches(word, words, n=1, cutoff)` returns, without
+comparing `word` to every entry of the vocabulary:
+
+- A ratio of at least `r` bounds the edit distance of two words, and by the
+  q-gram lemma each edit destroys at most `Q` of their shared character
+  q-grams: a word can only reach `r` when it shares enough q-grams with
+  `word`. Such a word shares at least one of the rarest q-grams of `word`
+  (prefix filtering), so only the postings of those q-grams, in an inverted
+  index of the vocabulary, are visited. `r` is the cutoff at first, then the
+  best ratio found, so the search narrows as it goes. Words too short for the
+  bound to exclude anything are scored from their length bucket.
+- A candidate of length `la` can only reach a ratio of
+  `2 * min(la, lb) / (la + lb)` against a word of length `lb`.
+- The character bag of each candidate bounds its ratio from above (difflib's
+  `quick_ratio`), so the exact `SequenceMatcher.ratio` only runs for the
+  candidates that may still win.
+
+All the bounds are exact upper bounds of the ratio, so no suggestion is lost.
+"""
+import math
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import (
+    Dict,
+    FrozenSet,
+    Iterable,
+    List,
+    Optional,
+    Tuple
+)
+
+# Length of the indexed character q-grams
+Q = 2
+
+Gram = Tuple[str, int]
+
+
+def _grams(word: str) -> List[Gram]:
+    """The q-grams of `word`, the k-th occurrence of each numbered k: shared q-grams count with multiplicity."""
+    seen: Counter = Counter()
+    grams = []
+    for i in range(len(word) - Q + 1):
+        gram = word[i:i + Q]
+        grams.append((gram, seen[gram]))
+        seen[gram] += 1
+    return grams
+
+
+class SuggestionIndex:
+    """Closest-match lookups over `words`, equivalent to `get_close_matches(..., n=1, cutoff=cutoff)`."""
+
+    def __init__(self, words: Iterable[str], cutoff: float = 0.8):
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError(f"cutoff must be in [0.0, 1.0]: {cutoff!r}")
+        self.cutoff = cutoff
+        self.words = frozenset(words)
+        self._buckets: Dict[int, List[str]] = {}
+        self._postings: Dict[Gram, List[str]] = {}
+        self._grams: Dict[str, FrozenSet[Gram]] = {}
+        self._bags: Dict[str, Counter] = {}
+        for word in self.words:
+            self._buckets.setdefault(len(word), []).append(word)
+            self._grams[word] = frozenset(_grams(word))
+            self._bags[word] = Counter(word)
+            for gram in self._grams[word]:
+                self._postings.setdefault(gram, []).append(word)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.words
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @staticmethod
+    def _min_shared(la: int, lb: int, ratio: float) -> int:
+        """The fewest q-grams words of lengths `la` and `lb` share when their ratio is at least `ratio`."""
+        # at least ratio * (la + lb) / 2 matching characters: at most (1 - ratio) * (la + lb) insertions and deletions
+        edits = math.floor((1.0 - ratio) * (la + lb) + 1e-9)
+        return max(la, lb) - Q + 1 - Q * edits
+
+    @staticmethod
+    def _length_bound(la: int, lb: int) -> float:
+        return 2.0 * min(la, lb) / (la + lb) if la + lb else 1.0
+
+    def suggest(self, word: str) -> Optional[str]:
+        """The closest word with a similarity ratio of at least `cutoff`, or None."""
+        lb = len(word)
+        word_grams = _grams(word)
+        word_gram_set = frozenset(word_grams)
+        word_bag = Counter(word)
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        best: Optional[Tuple[float, str]] = None
+        scored = set()
+
+        def score(candidate: str, filtered: bool) -> None:
+            nonlocal best
+            scored.add(candidate)
+            la = len(candidate)
+            threshold = best[0] if best is not None else self.cutoff
+            if self._length_bound(la, lb) < threshold:
+                return
+            if filtered and len(self._grams[candidate] & word_gram_set) < self._min_shared(la, lb, threshold):
+                return
+            matches = sum((self._bags[candidate] & word_bag).values())
+            if (2.0 * matches / (la + lb) if la + lb else 1.0) < threshold:
+                return
+            matcher.set_seq1(candidate)
+            ratio = matcher.ratio()
+            if ratio >= self.cutoff and (best is None or (ratio, candidate) > best):
+                best = (ratio, candidate)
+
+        def fewest_shared() -> Optional[int]:
+            """The fewest q-grams shared by a word that may still win, among the lengths the q-gram bound applies to."""
+            threshold = best[0] if best is not None else self.cutoff
+            bounds = [
+                self._min_shared(la, lb, threshold) for la in self._buckets
+                if self._length_bound(la, lb) >= threshold
+            ]
+            return min((bound for bound in bounds if bound > 0), default=None)
+
+        # rarest first: a word sharing at least T q-grams shares one of the first len(word_grams) - T + 1
+        word_grams.sort(key=lambda gram: len(self._postings.get(gram, ())))
+        probed = 0
+        while True:
+            shared = fewest_shared()
+            if shared is None or probed >= len(word_grams) - shared + 1:
+                break
+            for candidate in self._postings.get(word_grams[probed], ()):
+                if candidate not in scored:
+                    score(candidate, filtered=True)
+            probed += 1
+        # the lengths the q-gram bound did not apply to when the probing stopped
+        threshold = best[0] if best is not None else self.cutoff
+        unfiltered = [la for la in self._buckets if self._min_shared(la, lb, threshold) <= 0]
+        for la in unfiltered:
+            for candidate in self._buckets[la]:
+                if candidate not in scored:
+                    score(candidate, filtered=False)
+        return best[1] if best else None
@@ -1,10 +1,36 @@
 from pydantic import BaseModel, model_validator
-from typing import Dict, Any
-from difflib import get_close_matches
+from typing import Dict, Any, FrozenSet, Tuple
+from functools import lru_cache
+from .suggestionIndex import SuggestionIndex
+
+# Keys tolerated in the specifications although no model declares them
+IGNORED_FIELDS = ('java_type', 'db_type')
+
+# Per-class field index: the exact field names and the lowercase name → field name map
+_FIELD_INDEXES: Dict[type, Tuple[FrozenSet[str], Dict[str, str]]] = {}
+
+
+def field_index(cls) -> Tuple[FrozenSet[str], Dict[str, str]]:
+    """The field names of a model class and their lowercase map, computed once per class."""
+    index = _FIELD_INDEXES.get(cls)
+    if index is None:
+        known_fields = frozenset(cls.model_fields.keys())
+        index = known_fields, {field.lower(): field for field in known_fields}
+        _FIELD_INDEXES[cls] = index
+    return index
+
+
+@lru_cache(maxsize=None)
+def suggestion_index(cls) -> SuggestionIndex:
+    """Fuzzy index of the lowercase field names of a model class, built on its first typo."""
+    return SuggestionIndex(field_index(cls)[1].keys(), cutoff=0.8)
+
 
 class TypoDetectingModel(BaseModel):
     class Config:
         extra = "forbid" # allow
+        # schemas are built on first validation rather than at import, see README "Import time"
+        defer_build = True
     
     @model_validator(mode="before")
     @classmethod
@@ -22,7 +48,7 @@ class TypoDetectingModel(BaseModel):
              and maps them back to the canonical field defined in the model.
 
         2. Typo detection:
-           - Uses fuzzy matching to detect close matches to known field names.
+           - Uses fuzzy matching (a per-class `SuggestionIndex`) to detect close matches to known field names.
            - If a likely match is found, raises an error with a suggestion:
              e.g., `"Unexpected field 'resouce'. Did you mean 'resource'?"`
 
@@ -38,41 +64,39 @@ class TypoDetectingModel(BaseModel):
         """
         if not isinstance(values, dict):
             return values
-            
-        known_fields = set(cls.model_fields.keys())
-        known_fields_lower = {field.lower(): field for field in known_fields}
-        # print(f"known_fields_lower {known_fields_lower}")
-        
+
+        known_fields, known_fields_lower = field_index(cls)
+        # Fast path: every key is already a canonical field name
+        if known_fields.issuperset(values):
+            return values
+
         corrected_values = {}
-        errors = []
-        
+        unmatched = []
         for input_field, value in values.items():
-            input_field_lower = input_field.lower()
-            if input_field_lower in known_fields_lower:
-                correct_field = known_fields_lower[input_field_lower]
+            correct_field = known_fields_lower.get(input_field.lower())
+            if correct_field is not None:
                 corrected_values[correct_field] = value
-        
             else:
-                close_matches = get_close_matches(
-                    input_field.lower(), 
-                    known_fields_lower.keys(), 
-                    n=1, 
-                    cutoff=0.8
-                )
-                
-                if close_matches:
-                    suggestion = known_fields_lower[close_matches[0]]
-                    errors.append({
-                        "loc": f"{input_field}",
-                        "msg": f"Unexpected field '{input_field}'. Did you mean '{suggestion}' ?",
-                        "type": "value_error.possible_typo"
-                    })
-                elif input_field not in ('java_type', 'db_type'):
-                    errors.append({
-                        "loc": f"{input_field}",
-                        "msg": f"Unexpected field '{input_field}'. No similar field found in the specification.",
-                        "type": "value_error.unknown_field"
-                    })
+                unmatched.append(input_field)
+
+        # Fuzzy matching only runs for the keys that matched no field
+        errors = []
+        for input_field in unmatched:
+            close_match = suggestion_index(cls).suggest(input_field.lower())
+            
+            if close_match:
+                suggestion = known_fields_lower[close_match]
+                errors.append({
+                    "loc": f"{input_field}",
+                    "msg": f"Unexpected field '{input_field}'. Did you mean '{suggestion}' ?",
+                    "type": "value_error.possible_typo"
+                })
+            elif input_field not in IGNORED_FIELDS:
+                errors.append({
+                    "loc": f"{input_field}",
+                    "msg": f"Unexpected field '{input_field}'. No similar field found in the specification.",
+                    "type": "value_error.unknown_field"
+                })
         
         if errors:
             raise ValueError("\n".join(str(err) for err in errors))
@@ -0,0 +1,231 @@
+"""The async executor against a SQLite stand-in: pool limits, concurrent page and count, streaming backpressure."""
+import asyncio
+import threading
+
+import pytest
+
+from pydantic_models.asyncExecutor import (
+    AsyncQueryExecutor,
+    ConnectionPool,
+    ThreadedConnection,
+    sqlite_connection_factory
+)
+from pydantic_models.batchFetch import BatchFetcher, BatchQuery
+from pydantic_models.queryBuilderObjModel import ResourceToDbMappingSpec
+from pydantic_models.sqlCompiler import SQLITE, Filter, QueryCompiler, QueryRequest
+
+ROWS = 200
+
+
+def setup(db):
+    # every in-memory connection gets its own copy of the `oms` schema
+    db.execute("ATTACH ':memory:' AS oms")
+    db.execute("CREATE TABLE oms.fills (fill_number INTEGER, name TEXT)")
+    db.executemany("INSERT INTO oms.fills VALUES (?, ?)", [(i, f"fill_{i:03d}") for i in range(ROWS)])
+
+
+def make_spec(row_counting="enabled", pagination="enabled"):
+    return ResourceToDbMappingSpec(**{
+        "resource": {
+            "resource_name": "fill",
+            "version": "1.0.0",
+            "fields": [{"name": "fill_number", "type": "integer", "isKey": True}, {"name": "name", "type": "string"}],
+        },
+        "resourceToDbMapper": {
+            "resource_name": "fill",
+            "masterTable": "fills",
+            "dbSchema": "oms",
+            "fields": [
+                {"attNamedb": "fill_number", "attNameResource": "fill_number"},
+                {"attNamedb": "name", "attNameResource": "name"},
+            ],
+            "defaultSort": {"fields": ["fill_number"], "order": "asc"},
+            "pagination": pagination,
+            "rowCounting": row_counting,
+        },
+    })
+
+
+class Counting:
+    """Factory of SQLite connections that records how many are open and how many batches they fetched."""
+
+    def __init__(self):
+        self.factory = sqlite_connection_factory(":memory:", setup)
+        self.created = 0
+        self.closed = 0
+        self.batches = 0
+
+    async def __call__(self):
+        connection = await self.factory()
+        self.created += 1
+        fetch_batches, close = connection.fetch_batches, connection.close
+
+        async def counted_batches(*args):
+            async for batch in fetch_batches(*args):
+                self.batches += 1
+                yield batch
+
+        async def counted_close():
+            self.closed += 1
+            await close()
+        connection.fetch_batches, connection.close = counted_batches, counted_close
+        return connection
+
+
+def test_threaded_connection_runs_on_its_own_thread():
+    async def main():
+        connection = await sqlite_connection_factory(":memory:", setup)()
+        assert isinstance(connection, ThreadedConnection)
+        try:
+            rows = await connection.fetch_all("SELECT COUNT(*) FROM oms.fills WHERE fill_number < :n", {"n": 10})
+            threads = await connection._run(lambda: threading.current_thread().name)
+            batches = [batch async for batch in connection.fetch_batches("SELECT * FROM oms.fills", {}, 64)]
+        finally:
+            await connection.close()
+        return rows, threads, batches
+
+    rows, thread, batches = asyncio.run(main())
+    assert rows == [(10,)]
+    assert thread.startswith("rrml-db") and thread != threading.current_thread().name
+    assert [len(batch) for batch in batches] == [64, 64, 64, 8]
+
+
+def test_pool_never_opens_more_than_maxsize_connections():
+    factory = Counting()
+    peak = 0
+    active = 0
+
+    async def borrow(pool):
+        nonlocal peak, active
+        async with pool.acquire() as connection:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return await connection.fetch_all("SELECT 1", {})
+
+    async def main():
+        async with ConnectionPool(factory, maxsize=2) as pool:
+            results = await asyncio.gather(*[borrow(pool) for _ in range(8)])
+            assert len(pool._idle) == 2
+        return results
+
+    assert asyncio.run(main()) == [[(1,)]] * 8
+    assert peak == 2
+    assert factory.created == 2 and factory.closed == 2
+
+
+def test_pool_discards_a_connection_that_failed_and_refuses_borrowers_once_closed():
+    factory = Counting()
+
+    async def main():
+        pool = ConnectionPool(factory, maxsize=1)
+        with pytest.raises(KeyError):
+            async with pool.acquire():
+                raise KeyError("boom")
+        assert factory.closed == 1 and not pool._idle
+        await pool.close()
+        with pytest.raises(RuntimeError):
+            async with pool.acquire():
+                pass
+
+    asyncio.run(main())
+    with pytest.raises(ValueError):
+        ConnectionPool(factory, maxsize=0)
+
+
+def test_fetch_page_runs_the_page_and_its_count_concurrently():
+    factory = Counting()
+    spec = make_spec()
+
+    async def main():
+        async with ConnectionPool(factory, maxsize=2) as pool:
+            executor = AsyncQueryExecutor(pool, QueryCompiler(SQLITE))
+            request = QueryRequest(filters=(Filter("fill_number", "gte", 50),), offset=10, limit=20)
+            return await executor.fetch_page(spec, request)
+
+    page = asyncio.run(main())
+    assert page.columns == ("fill_number", "name")
+    assert page.rows[0] == (60, "fill_060") and len(page.rows) == 20
+    assert page.count.value == ROWS - 50 and page.count.exact
+    # both statements were in flight at the same time, each on its own connection
+    assert factory.created == 2
+
+
+def test_window_count_of_keyset_pages_is_the_total():
+    spec = make_spec(row_counting="window", pagination="keyset")
+
+    async def main():
+        async with ConnectionPool(sqlite_connection_factory(":memory:", setup), maxsize=2) as pool:
+            executor = AsyncQueryExecutor(pool, QueryCompiler(SQLITE))
+            pages, cursor = [], None
+            for _ in range(3):
+                page = await executor.fetch_page(spec, QueryRequest(limit=80, cursor=cursor))
+                pages.append(page)
+                cursor = page.cursor
+            return pages
+
+    pages = asyncio.run(main())
+    assert [len(page.rows) for page in pages] == [80, 80, 40]
+    assert [page.count.value for page in pages] == [ROWS] * 3
+    assert pages[1].rows[0][0] == 80 and pages[2].cursor is None
+
+
+def test_stream_holds_at_most_max_buffered_batches_ahead_of_the_consumer():
+    factory = Counting()
+    spec = make_spec(row_counting="disabled", pagination="disabled")
+
+    async def main():
+        async with ConnectionPool(factory, maxsize=1) as pool:
+            executor = AsyncQueryExecutor(pool, QueryCompiler(SQLITE))
+            rows = executor.stream(spec, QueryRequest(), batch_size=10, max_buffered=2)
+            first = await rows.__anext__()
+            await asyncio.sleep(0.1)  # a slow consumer: the producer must pause
+            fetched_while_paused = factory.batches
+            rest = [row async for row in rows]
+            return first, fetched_while_paused, rest
+
+    first, fetched_while_paused, rest = asyncio.run(main())
+    assert first == (0, "fill_000")
+    # the batch being consumed, `max_buffered` queued ones and the one waiting to be queued
+    assert fetched_while_paused <= 1 + 2 + 1
+    assert len(rest) == ROWS - 1 and factory.batches == ROWS // 10
+
+
+def test_closing_a_stream_early_closes_its_connection():
+    factory = Counting()
+    spec = make_spec(row_counting="disabled", pagination="disabled")
+
+    async def main():
+        async with ConnectionPool(factory, maxsize=1) as pool:
+            executor = AsyncQueryExecutor(pool, QueryCompiler(SQLITE))
+            rows = executor.stream(spec, QueryRequest(), batch_size=10)
+            async for _ in rows:
+                break
+            await rows.aclose()
+            assert not pool._idle and factory.closed == 1
+            # the pool slot was released: the next query gets a new connection
+            page = await executor.fetch_page(spec, QueryRequest())
+        return page
+
+    assert len(asyncio.run(main()).rows) == ROWS
+    assert factory.created == 2
+
+
+def test_a_gate_bounds_the_statements_of_a_batch_below_the_pool_size():
+    factory = Counting()
+    spec = make_spec()
+
+    async def main():
+        async with ConnectionPool(factory, maxsize=4) as pool:
+            fetcher = BatchFetcher({"fill": spec}, AsyncQueryExecutor(pool, QueryCompiler(SQLITE)), max_concurrency=2)
+            queries = [
+                BatchQuery(i, "fill", QueryRequest(filters=(Filter("fill_number", "gte", i),), limit=5))
+                for i in range(6)
+            ]
+            return await fetcher.fetch(queries)
+
+    response = asyncio.run(main())
+    assert [result.page.rows[0][0] for result in response.results] == list(range(6))
+    # six pages and their six counts, never more than two statements at a time
+    assert factory.created == 2
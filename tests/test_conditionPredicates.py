@@ -0,0 +1,145 @@
+"""The fused predicate and the masks must match a plain evaluation of the conditions, one at a time."""
+import fnmatch
+import operator
+import random
+
+import pytest
+
+from pydantic_models.conditionPredicates import LikePattern, PredicateError, compile_conditions, compile_filters
+from pydantic_models.queryBuilderObjModel import Condition
+from pydantic_models.sqlCompiler import Filter
+
+np = pytest.importorskip("numpy")
+
+COMPARISONS = {
+    "eq": operator.eq, "ne": operator.ne, "lt": operator.lt,
+    "lte": operator.le, "gt": operator.gt, "gte": operator.ge,
+}
+
+CONDITIONS = {
+    "gt": {"column": "a", "operator": "gt", "value": 3},
+    "lte": {"column": "x", "operator": "lte", "value": 0.5},
+    "ne_string": {"column": "s", "operator": "ne", "value": "abc"},
+    "lt_string": {"column": "s", "operator": "lt", "value": "b"},
+    "eq_other_table": {"table": "u", "column": "b", "operator": "eq", "value": 2},
+    "in": {"column": "a", "operator": "in", "value": [1, 2, 3, 19]},
+    "in_strings": {"column": "s", "operator": "in", "value": ["abc", "a%c"]},
+    "is": {"column": "s", "operator": "is", "value": "null"},
+    "isnot": {"column": "a", "operator": "isnot", "value": "NULL"},
+    "like_equal": {"column": "s", "operator": "like", "value": "abc"},
+    "like_prefix": {"column": "s", "operator": "like", "value": "ab%"},
+    "like_suffix": {"column": "s", "operator": "like", "value": "%c"},
+    "like_contains": {"column": "s", "operator": "like", "value": "%b%"},
+    "like_regex": {"column": "s", "operator": "like", "value": "a_c%"},
+    "like_escaped": {"column": "s", "operator": "like", "value": "%.%"},
+    "like_integers": {"column": "a", "operator": "like", "value": "1%"},
+}
+
+STRINGS = ["abc", "ab", "xbc", "a%c", "a.c", "b\nc", "", "ABC", "abcabc"]
+
+
+@pytest.fixture(scope="module")
+def columns():
+    rng = random.Random(3)
+    n = 500
+    return {
+        "t.a": [rng.choice([None, *range(-5, 20)]) for _ in range(n)],
+        "t.x": [rng.choice([None, 0.5, rng.uniform(-2, 2)]) for _ in range(n)],
+        "t.s": [rng.choice([None, *STRINGS]) for _ in range(n)],
+        "u.b": [rng.choice([None, 1, 2]) for _ in range(n)],
+    }
+
+
+def rows_of(columns):
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def like(value, pattern):
+    """LIKE through `fnmatch`: `%` is `*` and `_` is `?` (the patterns above use neither `[` nor `]`)."""
+    return fnmatch.fnmatchcase(str(value), pattern.replace("*", "[*]").replace("?", "[?]")
+                               .replace("%", "*").replace("_", "?"))
+
+
+def matches(condition, row):
+    """SQL semantics, spelled out: a NULL only satisfies `is` null."""
+    value = row[f"{condition.get('table', 't')}.{condition['column']}"]
+    op = condition["operator"]
+    if op in ("is", "isnot"):
+        return (value is None) == (op == "is")
+    if value is None:
+        return False
+    if op == "in":
+        return value in condition["value"]
+    if op == "like":
+        return like(value, condition["value"])
+    return COMPARISONS[op](value, condition["value"])
+
+
+def typed(values):
+    """The column as `RowDecoder.decode_columns` returns it: a typed array, masked where NULL."""
+    present = [value for value in values if value is not None]
+    dtype = np.asarray(present).dtype
+    filler = present[0]
+    return np.ma.array(np.array([filler if value is None else value for value in values], dtype=dtype),
+                       mask=[value is None for value in values])
+
+
+def check(predicate, conditions, columns):
+    rows = rows_of(columns)
+    expected = [all(matches(condition, row) for condition in conditions) for row in rows]
+    assert [predicate(row) for row in rows] == expected
+    assert predicate.filter(rows) == [row for row, keep in zip(rows, expected) if keep]
+    assert predicate.mask(columns).tolist() == expected
+    arrays = {key: typed(values) for key, values in columns.items()}
+    assert predicate.mask(arrays).tolist() == expected
+    assert predicate.mask_of(np, arrays.__getitem__, len(rows)).tolist() == expected
+
+
+@pytest.mark.parametrize("name", sorted(CONDITIONS))
+def test_each_condition_matches_its_plain_evaluation(columns, name):
+    condition = CONDITIONS[name]
+    check(compile_conditions([Condition(**condition)], "t"), [condition], columns)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_fused_conditions_match_their_conjunction(columns, seed):
+    rng = random.Random(seed)
+    conditions = rng.sample(list(CONDITIONS.values()), rng.randint(2, 4))
+    check(compile_conditions([Condition(**condition) for condition in conditions], "t"), conditions, columns)
+
+
+def test_no_condition_matches_every_row(columns):
+    check(compile_conditions([], "t"), [], columns)
+
+
+def test_filters_are_evaluated_on_attributes():
+    rows = [{"fill": fill, "mode": mode} for fill in (None, 1, 2, 3) for mode in (None, "STABLE", "RAMP")]
+    predicate = compile_filters([Filter("fill", "in", [1, None, 3]), Filter("mode", "isnot")])
+    assert predicate.filter(rows) == [row for row in rows if row["fill"] in (1, 3) and row["mode"] is not None]
+    columns = {key: [row[key] for row in rows] for key in ("fill", "mode")}
+    assert predicate.mask(columns).tolist() == [predicate(row) for row in rows]
+
+
+@pytest.mark.parametrize("pattern, kind, text", [
+    ("abc", "equal", "abc"),
+    ("ab%", "prefix", "ab"),
+    ("%bc", "suffix", "bc"),
+    ("%b%", "contains", "b"),
+    ("%%b%%", "contains", "b"),
+    ("a_c", "regex", "a_c"),
+    ("a%c", "regex", "a%c"),
+    ("%", "regex", "%"),
+])
+def test_like_patterns_are_compiled_to_string_tests(pattern, kind, text):
+    compiled = LikePattern.compile(pattern)
+    assert (compiled.kind, compiled.text) == (kind, text)
+    assert [compiled.matches(value) for value in STRINGS] == [like(value, pattern) for value in STRINGS]
+
+
+@pytest.mark.parametrize("condition", [
+    {"column": "a", "operator": "is", "value": 1},
+    {"column": "a", "operator": "add", "value": 1},
+])
+def test_invalid_conditions_are_rejected(condition):
+    with pytest.raises(PredicateError):
+        compile_conditions([Condition(**condition)], "t")
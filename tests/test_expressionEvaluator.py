@@ -0,0 +1,77 @@
+"""The row and batch modes of the expression evaluator must agree, on every dialect."""
+import random
+
+import pytest
+
+from pydantic_models.expressionEvaluator import compile_attribute, compile_attribute_batch
+from pydantic_models.queryBuilderObjModel import TableAttribute
+from pydantic_models.sqlCompiler import ORACLE, SQLITE
+
+np = pytest.importorskip("numpy")
+
+
+def column(name):
+    return {"table": "t", "column": name}
+
+
+FIELDS = {
+    "divide": {"expression": {"operator": "divide", "left": column("a"), "right": column("b")}},
+    "divide_constant": {"expression": {"operator": "divide", "left": column("x"), "right": 4}},
+    "round": {"function": {"name": "round", "params": [column("x"), 2]}},
+    "round_tens": {"function": {"name": "round", "params": [column("a"), -1]}},
+    "trunc": {"function": {"name": "trunc", "params": [column("x"), 1]}},
+    "mod": {"function": {"name": "mod", "params": [column("a"), column("b")]}},
+    "least": {"function": {"name": "least", "params": [column("a"), column("b"), 3]}},
+    "nvl": {"attNamedb": "a", "function": {"name": "nvl", "params": [0]}},
+    "upper": {"function": {"name": "upper", "params": [column("s")]}},
+    "case": {"case_expression": [
+        {"when": {"column": "a", "operator": "gt", "value": 5}, "then": "big"},
+        {"when": {"column": "s", "operator": "like", "value": "%b_"}, "then": "like"},
+    ]},
+}
+
+# decimal ties that binary floating point puts on either side
+TIES = [1.005, 0.285, 2.675, -1.005, -0.285, 0.125, 1.115]
+
+
+@pytest.fixture(scope="module")
+def columns():
+    rng = random.Random(1)
+    n = 400
+    return {
+        "t.a": [rng.choice([None, *range(-19, 20)]) for _ in range(n)],
+        "t.b": [rng.choice([None, -3, 1, 2, 3, 7]) for _ in range(n)],
+        "t.x": [rng.choice([None, rng.choice(TIES), round(rng.uniform(-10, 10), 3)]) for _ in range(n)],
+        "t.s": [rng.choice([None, " ab ", "abc", "xbz", "cb1"]) for _ in range(n)],
+    }
+
+
+def same(expected, got):
+    if isinstance(expected, float) and got is not None:
+        return abs(expected - got) <= 1e-12 * max(1.0, abs(expected))
+    return expected == got
+
+
+@pytest.mark.parametrize("dialect", [ORACLE, SQLITE], ids=lambda dialect: dialect.name)
+@pytest.mark.parametrize("name", sorted(FIELDS))
+def test_row_and_batch_modes_agree(columns, name, dialect):
+    field = TableAttribute(attNameResource=name, **FIELDS[name])
+    row_mode = compile_attribute(field, "t", dialect)
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    expected = [row_mode(row) for row in rows]
+    got = compile_attribute_batch(field, "t", dialect)(columns).tolist(None)
+    assert [row for row, e, g in zip(rows, expected, got) if not same(e, g)] == []
+
+
+def test_rounding_is_half_away_from_zero_on_the_decimal_value():
+    field = TableAttribute(attNameResource="round", **FIELDS["round"])
+    values = [1.005, 0.285, -1.005, 2.675]
+    assert [compile_attribute(field, "t")({"t.x": value}) for value in values] == [1.01, 0.29, -1.01, 2.68]
+    assert compile_attribute_batch(field, "t")({"t.x": values}).tolist() == [1.01, 0.29, -1.01, 2.68]
+
+
+def test_division_follows_the_dialect():
+    field = TableAttribute(attNameResource="divide", **FIELDS["divide"])
+    assert compile_attribute(field, "t")({"t.a": -7, "t.b": 2}) == -3.5
+    assert compile_attribute(field, "t", SQLITE)({"t.a": -7, "t.b": 2}) == -3
+    assert compile_attribute_batch(field, "t", SQLITE)({"t.a": [7, -7], "t.b": [2, 2]}).tolist() == [3, -3]
@@ -0,0 +1,123 @@
+"""Invalidation of the result cache, on both backends, including invalidations racing a query."""
+import pytest
+
+from pydantic_models.queryBuilderObjModel import ResourceToDbMappingSpec
+from pydantic_models.resultCache import LruResultBackend, ResultCache, SqliteResultBackend
+from pydantic_models.sqlCompiler import CompiledQuery
+
+
+def make_spec(name, master, *additional):
+    return ResourceToDbMappingSpec(**{
+        "resource": {
+            "resource_name": name,
+            "version": "1.0.0",
+            "fields": [{"name": "id", "type": "integer", "isKey": True}]
+                      + [{"name": f"{table}_value", "type": "integer"} for table in additional],
+        },
+        "resourceToDbMapper": {
+            "resource_name": name,
+            "masterTable": master,
+            "dbSchema": "OMS",
+            "fields": [{"attNamedb": "id", "attNameResource": "id"}],
+            "additionalTables": [
+                {
+                    "namedb": table, "dbSchema": "oms", "relation": "leftJoin", "relationTable": master,
+                    "relationKeys": [{"tableKey": "id"}],
+                    "fields": [{"attNamedb": "value", "attNameResource": f"{table}_value"}],
+                }
+                for table in additional
+            ] or None,
+            "pagination": "disabled",
+            "rowCounting": "disabled",
+        },
+    })
+
+
+@pytest.fixture(params=["lru", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "lru":
+        return ResultCache(LruResultBackend(maxsize=16))
+    return ResultCache(SqliteResultBackend(tmp_path / "results.db", max_entries=16))
+
+
+@pytest.fixture(scope="module")
+def specs():
+    return make_spec("era", "eras", "runs"), make_spec("fill", "fills")
+
+
+def query(spec, sql="SELECT 1"):
+    return CompiledQuery(spec.resource.resource_name, sql, ("id",))
+
+
+class Query:
+    """`execute` callback counting its runs; `during` runs inside it, as a concurrent writer would."""
+
+    def __init__(self, result, during=None):
+        self.result = result
+        self.during = during
+        self.runs = 0
+
+    def __call__(self):
+        self.runs += 1
+        if self.during is not None:
+            self.during()
+        return self.result
+
+
+def test_results_are_cached_per_statement_and_bind_values(cache, specs):
+    era, _ = specs
+    first = Query([(1,)])
+    assert cache.get_or_execute(era, query(era), {"p": 1}, first) == [(1,)]
+    assert cache.get_or_execute(era, query(era), {"p": 1}, first) == [(1,)]
+    assert first.runs == 1
+    other = Query([(2,)])
+    assert cache.get_or_execute(era, query(era), {"p": 2}, other) == [(2,)] and other.runs == 1
+
+
+def test_invalidating_a_table_evicts_the_resources_reading_it(cache, specs):
+    era, fill = specs
+    cache.get_or_execute(era, query(era), {}, Query("era"))
+    cache.get_or_execute(fill, query(fill), {}, Query("fill"))
+    assert cache.invalidate_table("OMS.RUNS") == 1  # names are matched case-insensitively
+    assert cache.get(query(era), {}) is None
+    assert cache.get(query(fill), {}) == "fill"
+    assert cache.invalidate_resource("fill") == 1 and len(cache.backend) == 0
+
+
+@pytest.mark.parametrize("invalidate", [
+    lambda cache: cache.invalidate_table("oms.runs"),
+    lambda cache: cache.invalidate_resource("era"),
+    lambda cache: cache.clear(),
+], ids=["table", "resource", "clear"])
+def test_a_result_read_before_an_invalidation_is_not_stored(cache, specs, invalidate):
+    era, _ = specs
+    stale = Query("stale", during=lambda: invalidate(cache))
+    assert cache.get_or_execute(era, query(era), {}, stale) == "stale"  # returned, but not cached
+    assert cache.get(query(era), {}) is None
+    fresh = Query("fresh")
+    assert cache.get_or_execute(era, query(era), {}, fresh) == "fresh" and fresh.runs == 1
+    assert cache.get(query(era), {}) == "fresh"
+
+
+def test_an_invalidation_of_other_tables_does_not_prevent_storing(cache, specs):
+    era, _ = specs
+    unrelated = Query("era", during=lambda: cache.invalidate_table("oms.fills"))
+    cache.get_or_execute(era, query(era), {}, unrelated)
+    assert cache.get(query(era), {}) == "era"
+
+
+def test_put_checks_the_generation_taken_before_the_query(cache, specs):
+    era, fill = specs
+    generation = cache.generation(era)
+    cache.invalidate_table("oms.eras")
+    assert not cache.put(era, query(era), {}, "stale", generation)
+    assert cache.put(era, query(era), {}, "fresh", cache.generation(era))
+    assert cache.put(fill, query(fill), {}, "fill", cache.generation(fill))
+
+
+def test_the_backends_are_bounded(cache, specs):
+    era, _ = specs
+    for i in range(40):
+        cache.get_or_execute(era, query(era, f"SELECT {i}"), {}, Query(i))
+    assert len(cache.backend) == 16
+    assert cache.get(query(era, "SELECT 39"), {}) == 39 and cache.get(query(era, "SELECT 0"), {}) is None
@@ -0,0 +1,85 @@
+"""The columnar decoder converts whole columns in bulk: it must decode like the row decoder."""
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from pydantic_models.resourceObjModel import Resource
+from pydantic_models.rowDecoder import NUMPY_DTYPES, RowDecodeError
+
+np = pytest.importorskip("numpy")
+
+# type → values a driver may return for it; each column is decoded with and without NULLs
+VALUES = {
+    "smallinteger": [[1, -7, 2**31 - 1], [True, 5], [3.9, -3.9], ["12", 4], [Decimal("7"), 8]],
+    "integer": [[2**62, -1]],
+    "biginteger": [[2**70, -1]],
+    "double": [[1.5, -2, True], ["2.5", 1.0], [Decimal("0.1"), 2.0]],
+    "boolean": [["Y", "N", "y"], [1, 0, True], ["true", "F", 1.0]],
+    "datetime": [
+        [datetime(2024, 1, 1, 10, 0, 0, 123456), datetime(1969, 12, 31, 23, 59, 59, 1)],
+        ["2024-01-01T10:00:00", "2024-01-01 10:00:00.5", "2024-02-29"],
+        [date(2024, 1, 2), "2024-01-01T10:00:00"],
+    ],
+    "timeinterval_int": [[timedelta(seconds=90.7), timedelta(seconds=-1.5)], [5, 6.9]],
+    "timeinterval_double": [[timedelta(days=1, microseconds=3), timedelta(seconds=-1.5)], [5, 6.5]],
+    "decimal": [[0.1, Decimal("2.50"), 3]],
+    "string": [["a", ""]],
+}
+
+
+def decoders(type_name):
+    resource = Resource(resource_name="r", version="1.0.0", fields=[
+        {"name": "id", "type": "integer", "isKey": True},
+        {"name": "value", "type": type_name},
+    ])
+    return resource.row_decoder(["value"])
+
+
+def cases():
+    for type_name, columns in VALUES.items():
+        for i, values in enumerate(columns):
+            yield pytest.param(type_name, values, id=f"{type_name}-{i}")
+            yield pytest.param(type_name, [None, *values, None], id=f"{type_name}-{i}-nulls")
+
+
+@pytest.mark.parametrize("type_name, values", cases())
+def test_columnar_and_row_decoding_agree(type_name, values):
+    decoder = decoders(type_name)
+    rows = [(value,) for value in values]
+    column = decoder.decode_columns(rows)["value"]
+    assert column.dtype == np.dtype(NUMPY_DTYPES.get(type_name, object))
+    assert isinstance(column, np.ma.MaskedArray) == (None in values and column.dtype != object)
+    # masked values and NULLs of object arrays are listed as None
+    assert column.tolist() == [row[0] for row in decoder.decode(rows)]
+
+
+@pytest.mark.parametrize("type_name, value", [
+    ("integer", "x"),
+    ("boolean", "maybe"),
+    ("boolean", [1]),
+    ("datetime", 20240101),
+    ("datetime", "2024"),
+    ("timeinterval_double", "1 day"),
+])
+def test_columnar_decoding_reports_the_offending_value(type_name, value):
+    decoder = decoders(type_name)
+    with pytest.raises(RowDecodeError) as raised:
+        decoder.decode_columns([(1,), (value,), (None,)] if type_name != "datetime" else [(value,)])
+    assert raised.value.value == value and raised.value.column == "value"
+
+
+@pytest.mark.parametrize("type_name, value", [("smallinteger", 2**40), ("integer", 2**70)])
+def test_columnar_decoding_rejects_integers_out_of_the_range_of_the_array(type_name, value):
+    with pytest.raises(OverflowError):
+        decoders(type_name).decode_columns([(1,), (value,)])
+
+
+def test_aware_datetimes_are_converted_like_the_row_decoder():
+    decoder = decoders("datetime")
+    rows = [(datetime(2024, 1, 1, 10, tzinfo=timezone(timedelta(hours=1))),), (datetime(2024, 1, 1),)]
+    with pytest.warns(UserWarning):
+        by_row = np.array([row[0] for row in decoder.decode(rows)], dtype="datetime64[us]")
+    with pytest.warns(UserWarning):
+        column = decoder.decode_columns(rows)["value"]
+    assert (column == by_row).all()
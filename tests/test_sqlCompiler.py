@@ -0,0 +1,209 @@
+"""Statements of the SQL compiler, run against an in-memory SQLite database standing in for the `oms` schema."""
+import random
+import sqlite3
+
+import pytest
+
+from pydantic_models.queryBuilderObjModel import ResourceToDbMappingSpec
+from pydantic_models.rowCounting import RowCount, count_from_window, count_rows
+from pydantic_models.sqlCompiler import (
+    SQLITE,
+    Filter,
+    QueryCompiler,
+    QueryRequest,
+    SqlCompileError,
+    in_list_arity
+)
+
+RUNS = 40
+SITES = {1: "P5", 2: "Meyrin"}  # runs of site 0 have no site: the inner join drops them
+
+
+def run_row(number):
+    energy = None if number % 4 == 0 else float(number % 7)  # repeated and NULL sort values
+    return number, 100 + number // 5, energy, number % 3, f"run_{number:02d}"
+
+
+@pytest.fixture(scope="module")
+def db():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("ATTACH ':memory:' AS oms")
+    connection.execute("CREATE TABLE oms.runs (run_number, fill_number, energy, site_id, name)")
+    connection.execute("CREATE TABLE oms.fills (fill_number, beam_energy)")
+    connection.execute("CREATE TABLE oms.sites (site_id, site_name)")
+    connection.executemany("INSERT INTO oms.runs VALUES (?, ?, ?, ?, ?)", [run_row(n) for n in range(RUNS)])
+    connection.executemany("INSERT INTO oms.fills VALUES (?, ?)", [(f, f * 10.0) for f in range(100, 100 + RUNS // 5)])
+    connection.executemany("INSERT INTO oms.sites VALUES (?, ?)", SITES.items())
+    yield connection
+    connection.close()
+
+
+def make_spec(**mapper):
+    return ResourceToDbMappingSpec(**{
+        "resource": {
+            "resource_name": "run",
+            "version": "1.0.0",
+            "fields": [
+                {"name": "run_number", "type": "integer", "isKey": True},
+                {"name": "fill_number", "type": "integer"},
+                {"name": "energy", "type": "double"},
+                {"name": "name", "type": "string"},
+                {"name": "beam_energy", "type": "double"},
+                {"name": "site_name", "type": "string"},
+            ],
+        },
+        "resourceToDbMapper": {
+            "resource_name": "run",
+            "masterTable": "runs",
+            "dbSchema": "oms",
+            "fields": [
+                {"attNamedb": name, "attNameResource": name} for name in ("run_number", "fill_number", "energy", "name")
+            ],
+            "additionalTables": [
+                {
+                    "namedb": "fills", "dbSchema": "oms", "relation": "leftJoin", "relationTable": "runs",
+                    "relationKeys": [{"tableKey": "fill_number"}], "uniqueKeys": True,
+                    "fields": [{"attNamedb": "beam_energy", "attNameResource": "beam_energy"}],
+                },
+                {
+                    "namedb": "sites", "dbSchema": "oms", "relation": "innerJoin", "relationTable": "runs",
+                    "relationKeys": [{"tableKey": "site_id"}],
+                    "fields": [{"attNamedb": "site_name", "attNameResource": "site_name"}],
+                },
+            ],
+            "defaultSort": {"fields": ["run_number"], "order": "asc"},
+            "pagination": "enabled",
+            "rowCounting": "disabled",
+            **mapper,
+        },
+    })
+
+
+def sited():
+    """The runs the inner join of `sites` keeps, as (run_number, fill_number, energy, site_id, name) rows."""
+    return [row for row in map(run_row, range(RUNS)) if row[3] in SITES]
+
+
+def fetch(db, compiler, spec, request):
+    compiled = compiler.compile(spec, request)
+    return compiled, db.execute(compiled.sql, compiled.bind(request)).fetchall()
+
+
+@pytest.mark.parametrize("size", [0, 1, 3, 5, 17, 600])
+def test_in_lists_are_padded_to_a_few_arities(db, size):
+    spec = make_spec()
+    compiler = QueryCompiler(SQLITE)
+    numbers = random.Random(size).sample(range(-1000, 1000), size)
+    request = QueryRequest(fields=("run_number",), filters=(Filter("run_number", "in", numbers),))
+    compiled, rows = fetch(db, compiler, spec, request)
+
+    assert compiled.sql.count(":rrml_f0_") == in_list_arity(size)
+    assert [run_number for run_number, in rows] == sorted(row[0] for row in sited() if row[0] in numbers)
+    if size > 512:
+        assert " OR " in compiled.sql  # split in chunks of the largest arity
+    if size:
+        # another list padded to the same arity shares the statement
+        other = QueryRequest(fields=("run_number",), filters=(Filter("run_number", "in", numbers[:-1] or [7]),))
+        assert (compiler.compile(spec, other) is compiled) == (in_list_arity(max(size - 1, 1)) == in_list_arity(size))
+
+
+def test_unused_left_join_is_pruned_and_inner_join_kept(db):
+    spec = make_spec(rowCounting="enabled")
+    compiler = QueryCompiler(SQLITE)
+
+    compiled, rows = fetch(db, compiler, spec, QueryRequest(fields=("name",)))
+    assert "oms.fills" not in compiled.sql and "INNER JOIN oms.sites" in compiled.sql
+    assert rows == [(row[0], row[4]) for row in sited()]
+
+    compiled, rows = fetch(db, compiler, spec, QueryRequest(fields=("beam_energy", "site_name")))
+    assert "LEFT JOIN oms.fills" in compiled.sql
+    assert rows == [(row[0], row[1] * 10.0, SITES[row[3]]) for row in sited()]
+
+    request = QueryRequest(filters=(Filter("beam_energy", "gte", 1050.0),))
+    count = compiler.compile_count(spec, request)
+    assert "oms.fills" in count.sql and "oms.sites" in count.sql and "ORDER BY" not in count.sql
+    total = count_rows(spec, request, compiler, lambda sql, params: db.execute(sql, params).fetchone()[0])
+    assert total == RowCount(len([row for row in sited() if row[1] >= 105]))
+
+
+def test_fieldset_parameter_is_parsed_and_keeps_the_keys(db):
+    spec = make_spec()
+    compiler = QueryCompiler(SQLITE)
+    request = QueryRequest(fields=" name, name,,energy ")
+    assert request.fields == ("name", "energy")
+    compiled, rows = fetch(db, compiler, spec, request)
+    assert compiled.columns == ("run_number", "energy", "name")
+    assert rows == [(row[0], row[2], row[4]) for row in sited()]
+    assert compiler.compile(spec, QueryRequest(fields=["name", "energy"])) is compiled
+    assert QueryRequest(fields="").fields is None
+
+
+def test_null_checks_are_compiled_without_a_bound_value(db):
+    spec = make_spec()
+    compiler = QueryCompiler(SQLITE)
+    compiled, rows = fetch(db, compiler, spec, QueryRequest(fields=("energy",), filters=(Filter("energy", "is"),)))
+    assert "energy IS NULL" in compiled.sql
+    assert [run_number for run_number, _ in rows] == [row[0] for row in sited() if row[2] is None]
+    with pytest.raises(SqlCompileError):
+        compiler.compile(spec, QueryRequest(filters=(Filter("energy", "isnot", 3.0),)))
+
+
+def ordered(order, nulls):
+    """The sited runs in keyset order: energy with its NULL placement, then run_number in the same direction."""
+    descending = order == "desc"
+    nulls_first = nulls == "first" if nulls else descending
+    present = sorted((row for row in sited() if row[2] is not None), key=lambda row: (row[2], row[0]),
+                     reverse=descending)
+    missing = sorted((row for row in sited() if row[2] is None), key=lambda row: row[0], reverse=descending)
+    rows = missing + present if nulls_first else present + missing
+    return [row[0] for row in rows]
+
+
+@pytest.mark.parametrize("nulls", [None, "first", "last"])
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_keyset_pages_follow_nullable_sort_keys(db, order, nulls):
+    sort = {"fields": ["energy"], "order": order, **({"nulls": nulls} if nulls else {})}
+    spec = make_spec(defaultSort=sort, pagination="keyset", rowCounting="window")
+    compiler = QueryCompiler(SQLITE)
+
+    seen, cursor, counts = [], None, set()
+    while True:
+        request = QueryRequest(fields=("energy",), limit=4, cursor=cursor)
+        compiled, rows = fetch(db, compiler, spec, request)
+        if compiled.window_count:
+            counts.add(count_from_window(compiled, rows, request))
+            rows = [row[:-1] for row in rows]
+        seen.extend(run_number for run_number, _ in rows)
+        cursor = compiled.next_cursor(dict(zip(compiled.columns, rows[-1]))) if len(rows) == 4 else None
+        if cursor is None:
+            break
+    assert seen == ordered(order, nulls)
+    assert counts == {RowCount(len(sited()))}  # only the first page carries the window count
+
+
+def test_a_request_sort_ignores_the_nulls_of_the_default_sort(db):
+    spec = make_spec(defaultSort={"fields": ["energy"], "order": "asc", "nulls": "first"}, pagination="keyset")
+    compiler = QueryCompiler(SQLITE)
+    request = QueryRequest(fields=("energy",), sort=(("energy", "desc"),), limit=100)
+    compiled, rows = fetch(db, compiler, spec, request)
+    assert [run_number for run_number, _ in rows] == ordered("desc", None)
+    assert "ORDER BY energy DESC NULLS FIRST, run_number DESC NULLS FIRST" in compiled.sql
+
+
+def test_window_count_comes_with_every_row_of_the_page(db):
+    spec = make_spec(rowCounting="window")
+    compiler = QueryCompiler(SQLITE)
+    request = QueryRequest(fields=("name",), filters=(Filter("fill_number", "lt", 104),), offset=2, limit=5)
+    compiled, rows = fetch(db, compiler, spec, request)
+    total = len([row for row in sited() if row[1] < 104])
+    assert len(rows) == 5 and {row[-1] for row in rows} == {total}
+    assert count_from_window(compiled, rows, request) == RowCount(total)
+
+
+@pytest.mark.parametrize("limit, exact", [(5, False), (1000, True)])
+def test_estimate_count_stops_at_its_limit(db, limit, exact):
+    spec = make_spec(rowCounting="estimate", rowCountingOptions={"limit": limit})
+    compiler = QueryCompiler(SQLITE)
+    total = count_rows(spec, QueryRequest(limit=10), compiler,
+                       lambda sql, params: db.execute(sql, params).fetchone()[0])
+    assert total == RowCount(min(limit, len(sited())), exact=exact)
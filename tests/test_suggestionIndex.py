@@ -0,0 +1,34 @@
+"""The q-gram filtered index must suggest exactly what difflib.get_close_matches does."""
+import random
+from difflib import get_close_matches
+
+import pytest
+
+from pydantic_models.suggestionIndex import SuggestionIndex
+
+
+def random_word(rng, alphabet):
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 14)))
+
+
+@pytest.mark.parametrize("cutoff", [0.0, 0.3, 0.6, 0.75, 0.8, 0.9, 1.0])
+@pytest.mark.parametrize("alphabet", ["ab", "abc", "abcdef_"])
+def test_suggestions_match_get_close_matches(alphabet, cutoff):
+    rng = random.Random(f"{alphabet}-{cutoff}")
+    for _ in range(8):
+        words = [random_word(rng, alphabet) for _ in range(rng.randint(1, 60))]
+        index = SuggestionIndex(words, cutoff)
+        for _ in range(20):
+            query = random_word(rng, alphabet)
+            if rng.random() < 0.5:  # a typo of a known word
+                word = rng.choice(words)
+                query = word[:len(word) // 2] + query[:2] + word[len(word) // 2 + 1:]
+            expected = next(iter(get_close_matches(query, set(words), n=1, cutoff=cutoff)), None)
+            assert index.suggest(query) == expected, (query, words)
+
+
+def test_attribute_name_typos():
+    index = SuggestionIndex(["fill_number", "start_time", "end_time", "delivered_lumi", "era_name"])
+    assert index.suggest("fil_number") == "fill_number"
+    assert index.suggest("strat_time") == "start_time"
+    assert index.suggest("luminosity") is None